@@ -1,13 +1,17 @@
 import azure.functions as func
-import json
 import logging
-from shared_code.db_operations import CosmosOperator
+from shared_code.auth import require_auth
+from shared_code.async_db_operations import AsyncCosmosOperator
+from shared_code.db_operations import ConcurrencyConflictError
+from shared_code.responses import json_response
+from shared_code.serialization import get_json_body
 from datetime import datetime
 
+@require_auth
 async def main(req: func.HttpRequest) -> func.HttpResponse:
     try:
         try:
-            req_body = req.get_json()
+            req_body = get_json_body(req)
             print("req_body = ", req_body)
             email = req_body.get('email')
             inventory_item = req_body.get('inventoryItem')
@@ -23,34 +27,23 @@ async def main(req: func.HttpRequest) -> func.HttpResponse:
 
             logging.info(f"Processing add inventory request for email: {email}")
         except ValueError:
-            return func.HttpResponse(
-                json.dumps({"error": "Invalid request body"}),
-                mimetype="application/json",
+            return json_response(
+                req,
+                {"error": "Invalid request body"},
                 status_code=400
             )
 
         if not all([email, inventory_item, item_type, inventory_category, inventory_count_by]):
-            return func.HttpResponse(
-                json.dumps({"error": "Missing required fields"}),
-                mimetype="application/json",
+            return json_response(
+                req,
+                {"error": "Missing required fields"},
                 status_code=400
             )
 
-        db = CosmosOperator()
-        container = db.get_container("InvoicesDB", "Inventory")
-
-        try:
-            user_doc = container.read_item(item=email, partition_key=email)
-        except Exception as e:
-            user_doc = {
-                "id": email,
-                "userId": email,
-                "items": [],
-                "last_updated": ""
-            }
+        db = AsyncCosmosOperator()
+        repository = db.get_inventory_repository()
 
         current_date = datetime.utcnow().isoformat()
-        batch_number = len(user_doc.get('items', [])) + 1
 
         new_item = {
             "Inventory Item Name": inventory_item,
@@ -63,35 +56,36 @@ async def main(req: func.HttpRequest) -> func.HttpResponse:
             "Inventory Unit of Measure": unit_of_measure,
             "Locations": [{"name": loc.get("name", ""), "status": loc.get("status", "active")} for loc in locations],
             "Image": image,
-            "timestamp": current_date,
-            "batchNumber": batch_number
+            "timestamp": current_date
         }
 
-        if 'items' not in user_doc:
-            user_doc['items'] = []
-
-        user_doc['items'].append(new_item)
-        user_doc['last_updated'] = current_date
+        new_item = await repository.add_item(email, new_item)
 
-        result = container.upsert_item(body=user_doc)
-
-        return func.HttpResponse(
-            json.dumps({
+        return json_response(
+            req,
+            {
                 "status": "success",
                 "message": "Inventory item added successfully",
                 "data": new_item
-            }),
-            mimetype="application/json",
+            },
             status_code=201
         )
 
+    except ConcurrencyConflictError as e:
+        logging.warning(f"Write conflict: {str(e)}")
+        return json_response(
+            req,
+            {"error": "The document was modified concurrently, please retry"},
+            status_code=409
+        )
+
     except Exception as e:
         logging.error(f"Error adding inventory item: {str(e)}")
-        return func.HttpResponse(
-            json.dumps({
+        return json_response(
+            req,
+            {
                 "error": "Failed to add inventory item",
                 "details": str(e)
-            }),
-            mimetype="application/json",
+            },
             status_code=500
         ) 
\ No newline at end of file
@@ -1,13 +1,17 @@
 import azure.functions as func
-import json
 import logging
-from shared_code.db_operations import CosmosOperator
+from shared_code.auth import require_auth
+from shared_code.async_db_operations import AsyncCosmosOperator
+from shared_code.db_operations import ConcurrencyConflictError
+from shared_code.responses import json_response
+from shared_code.serialization import get_json_body
 from datetime import datetime
 
+@require_auth
 async def main(req: func.HttpRequest) -> func.HttpResponse:
     try:
         try:
-            req_body = req.get_json()
+            req_body = get_json_body(req)
             email = req_body.get('email')
             item_name = req_body.get('itemName')
             recipes = req_body.get('recipes', [])
@@ -18,89 +22,94 @@ async def main(req: func.HttpRequest) -> func.HttpResponse:
 
             logging.info(f"Processing add menu request for email: {email}")
         except ValueError:
-            return func.HttpResponse(
-                json.dumps({"error": "Invalid request body"}),
-                mimetype="application/json",
+            return json_response(
+                req,
+                {"error": "Invalid request body"},
                 status_code=400
             )
 
         if not all([email, item_name, category, size, menu_price]):
-            return func.HttpResponse(
-                json.dumps({"error": "Missing required fields"}),
-                mimetype="application/json",
+            return json_response(
+                req,
+                {"error": "Missing required fields"},
                 status_code=400
             )
 
-        db = CosmosOperator()
+        db = AsyncCosmosOperator()
         container = db.get_menu_container()
 
-        try:
-            user_doc = container.read_item(item=email, partition_key=email)
-        except Exception as e:
-            user_doc = {
-                "id": email,
-                "type": "user",
-                "recipe_count": 0,
-                "recipes": {},
-                "last_updated": ""
-            }
-
-        recipe_count = user_doc.get('recipe_count', 0) + 1
-        recipe_id = f"{email}_inventory-items-{email}_{recipe_count}"
+        recipe_key = f"inventory-items-{email}"
         current_date = datetime.utcnow().isoformat()
 
-        new_recipe = {
-            "id": recipe_id,
-            "sequence_number": recipe_count,
-            "name": item_name,
-            "created_at": current_date,
-            "data": {
-                "recipe_name": item_name,
-                "servings": 0,
-                "items_per_serving": 1,
-                "serving_size": None,
-                "total_yield": None,
-                "ingredients": [],
-                "total_cost": 0,
-                "cost_per_serving": 0,
-                "Type": "Menu",
-                "Size_Name": size,
-                "category": category,
-                "Menu_Price": menu_price,
-                "Total_cost_percentage": 0,
-                "Gross_Profit": 0,
-                "Gross_Profit_percentage": 0,
-                "method": method
-            }
-        }
+        def add_recipe(user_doc):
+            recipe_count = user_doc.get('recipe_count', 0) + 1
+            recipe_id = f"{email}_inventory-items-{email}_{recipe_count}"
 
-        recipe_key = f"inventory-items-{email}"
-        if recipe_key not in user_doc.get('recipes', {}):
-            user_doc['recipes'][recipe_key] = []
+            new_recipe = {
+                "id": recipe_id,
+                "sequence_number": recipe_count,
+                "name": item_name,
+                "created_at": current_date,
+                "data": {
+                    "recipe_name": item_name,
+                    "servings": 0,
+                    "items_per_serving": 1,
+                    "serving_size": None,
+                    "total_yield": None,
+                    "ingredients": [],
+                    "total_cost": 0,
+                    "cost_per_serving": 0,
+                    "Type": "Menu",
+                    "Size_Name": size,
+                    "category": category,
+                    "Menu_Price": menu_price,
+                    "Total_cost_percentage": 0,
+                    "Gross_Profit": 0,
+                    "Gross_Profit_percentage": 0,
+                    "method": method
+                }
+            }
 
-        user_doc['recipes'][recipe_key].append(new_recipe)
-        user_doc['recipe_count'] = recipe_count
-        user_doc['last_updated'] = current_date
+            recipes = dict(user_doc.get('recipes') or {})
+            recipes[recipe_key] = recipes.get(recipe_key, []) + [new_recipe]
+            user_doc['recipes'] = recipes
+            user_doc['recipe_count'] = recipe_count
+            user_doc['last_updated'] = current_date
+            return new_recipe
 
-        result = container.upsert_item(body=user_doc)
+        result, new_recipe = await db.read_modify_write(container, email, add_recipe, default=lambda: {
+            "id": email,
+            "type": "user",
+            "recipe_count": 0,
+            "recipes": {},
+            "last_updated": ""
+        })
 
-        return func.HttpResponse(
-            json.dumps({
+        return json_response(
+            req,
+            {
                 "status": "success",
                 "message": "Menu item added successfully",
                 "data": new_recipe
-            }),
-            mimetype="application/json",
+            },
             status_code=201
         )
 
+    except ConcurrencyConflictError as e:
+        logging.warning(f"Write conflict: {str(e)}")
+        return json_response(
+            req,
+            {"error": "The document was modified concurrently, please retry"},
+            status_code=409
+        )
+
     except Exception as e:
         logging.error(f"Error adding menu item: {str(e)}")
-        return func.HttpResponse(
-            json.dumps({
+        return json_response(
+            req,
+            {
                 "error": "Failed to add menu item",
                 "details": str(e)
-            }),
-            mimetype="application/json",
+            },
             status_code=500
         )
\ No newline at end of file
@@ -0,0 +1,35 @@
+"""
+Per-request cost of token verification.
+
+Run from the repository root:
+    python -m benchmarks.bench_auth
+
+Compares a full HS256 signature check with a hit in the verified-claims
+cache, and times the whole require_auth check on a request.
+"""
+import timeit
+from benchmarks.harness import make_request
+from shared_code.auth import authenticate, issue_access_token, token_cache, verify_access_token
+
+ITERATIONS = 20000
+
+def main():
+    token = issue_access_token("bench@culvana.com")
+    request = make_request({"email": "bench@culvana.com"})
+
+    def cold():
+        token_cache.clear()
+        verify_access_token(token)
+
+    cases = [
+        ("signature check", cold),
+        ("cached claims", lambda: verify_access_token(token)),
+        ("require_auth", lambda: authenticate(request))
+    ]
+    for name, case in cases:
+        seconds = min(timeit.repeat(case, number=ITERATIONS, repeat=5))
+        print(f"{name:>16}: {seconds / ITERATIONS * 1e6:7.2f} us")
+    print(token_cache.get_stats())
+
+if __name__ == "__main__":
+    main()
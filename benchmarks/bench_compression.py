@@ -0,0 +1,100 @@
+"""
+Bytes saved and CPU spent compressing get-invoices responses.
+
+Run from the repository root:
+    python -m benchmarks.bench_compression [--invoices 200] [--items 30]
+
+Builds realistic invoice documents (every line item repeats the same long
+keys, such as "Measurement Of Each Item" and "Quantity In a Case"), formats
+them the way get-invoices does, and compresses the JSON body with gzip at
+levels 1, 6 and 9, plus brotli when it is installed. Also times the full
+json_response path with and without Accept-Encoding.
+"""
+import argparse
+import importlib
+import random
+import time
+from types import SimpleNamespace
+from shared_code import responses
+from shared_code.json_stream import iter_json_chunks
+
+get_invoices = importlib.import_module("get-invoices")
+
+SUPPLIERS = ["Sysco", "US Foods", "Restaurant Depot", "Gordon Food Service"]
+CATEGORIES = ["Produce", "Dairy", "Meat", "Dry Goods", "Frozen", "Beverages"]
+UNITS = ["lb", "oz", "each", "gal", "case"]
+
+def make_invoice(rng, index, items):
+    lines = []
+    for position in range(items):
+        case_price = round(rng.uniform(5, 250), 2)
+        quantity = rng.randint(1, 12)
+        lines.append({
+            "Item Number": f"{rng.randint(100000, 999999)}",
+            "Item Name": f"{rng.choice(CATEGORIES)} item {rng.randint(1, 400)}",
+            "Product Category": rng.choice(CATEGORIES),
+            "Quantity In a Case": rng.choice([1, 4, 6, 12, 24]),
+            "Measurement Of Each Item": rng.choice([1, 5, 10, 16, 32]),
+            "Measured In": rng.choice(UNITS),
+            "Quantity Shipped": quantity,
+            "Extended Price": round(case_price * quantity, 2),
+            "Total Units Ordered": quantity,
+            "Case Price": case_price,
+            "Cost of a Unit": round(case_price / 12, 4),
+            "Cost of Each Item": round(case_price / 6, 4),
+            "page_number": position // 20 + 1,
+            "item_index": position
+        })
+    return get_invoices.format_invoice_response({
+        "Supplier Name": rng.choice(SUPPLIERS),
+        "Sold to Address": "123 Main St, Springfield",
+        "Order Date": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "Invoice Number": f"INV-{index:06d}",
+        "Total": round(sum(line["Extended Price"] for line in lines), 2),
+        "status": "processed",
+        "Items": lines
+    })
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--invoices", type=int, default=200)
+    parser.add_argument("--items", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    payload = {"invoices": [make_invoice(rng, i, args.items) for i in range(args.invoices)]}
+    raw = b"".join(iter_json_chunks(payload))
+    print(f"{args.invoices} invoices x {args.items} items: {len(raw) / 1024:,.0f} KiB uncompressed")
+
+    codings = [("gzip", level) for level in (1, 6, 9)]
+    if responses.brotli is not None:
+        codings += [("br", quality) for quality in (1, 5, 11)]
+    else:
+        print("brotli not installed; skipping br")
+
+    for encoding, level in codings:
+        seconds, body = timed(lambda: responses.compress_chunks(iter([raw]), encoding, level), args.repeat)
+        print(
+            f"{encoding:>4} {level:>2}: {len(body) / 1024:8,.0f} KiB "
+            f"({100 * (1 - len(body) / len(raw)):5.1f}% saved) {seconds * 1000:8.2f} ms"
+        )
+
+    for label, header in (("identity", None), ("gzip", "gzip"), ("br, gzip", "br, gzip")):
+        req = SimpleNamespace(headers={"Accept-Encoding": header} if header else {})
+        seconds, response = timed(lambda: responses.json_response(req, payload), args.repeat)
+        print(
+            f"json_response [{label:>8}]: {len(response.get_body()) / 1024:8,.0f} KiB "
+            f"{seconds * 1000:8.2f} ms"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Cost of an unchanged poll with and without If-None-Match.
+
+Run from the repository root:
+    python -m benchmarks.bench_conditional_get
+
+Seeds one user with 200 invoices, 5,000 inventory items, 200 recipes and a
+menu, then polls each read endpoint. "full" sends no validator; "304"
+sends the ETag from the previous response. The document cache is cleared
+before every request, as when a poll lands on a cold instance, so the
+conditional request has to ask Cosmos for the current _etag. The fake
+container charges ~1 RU per KB for point reads and a flat ~2.9 RU for the
+_etag projection. Finally the inventory is changed and the old ETag must
+no longer match.
+"""
+import random
+from benchmarks.bench_compression import make_invoice
+from benchmarks.bench_serialization import make_inventory
+from benchmarks.harness import FakeContainers, fake_async_operator, load_handler, make_request, run_timed
+from shared_code.auth import issue_access_token
+from shared_code.document_cache import document_cache
+
+EMAIL = "bench@culvana.com"
+ENDPOINTS = ("get-invoices", "get-inventories", "get-recipes", "get-menus")
+
+def seed(containers):
+    rng = random.Random(3)
+    containers.get("InvoicesDB", "Invoices").seed({
+        "id": EMAIL,
+        "userId": EMAIL,
+        "invoices": [make_invoice(rng, i, 30) for i in range(200)]
+    })
+    inventory = make_inventory(rng, 5000)["items"]
+    containers.get("InvoicesDB", "Inventory").seed({"id": EMAIL, "userId": EMAIL, "items": inventory})
+    recipe = lambda r: {"data": {
+        "Type": "Recipe",
+        "recipe_name": f"Recipe {r}",
+        "total_yield": 1,
+        "servings": 4,
+        "items_per_serving": 1,
+        "total_cost": 12.5,
+        "ingredients": [
+            {"ingredient": inventory[(r * 7 + i) % len(inventory)]["Inventory Item Name"], "total_cost": 1.5}
+            for i in range(12)
+        ]
+    }}
+    recipes = {"id": EMAIL, "userId": EMAIL, "recipes": {f"inventory-items-{EMAIL}": [recipe(r) for r in range(200)]}}
+    containers.get("InvoicesDB", "Recipes").seed(recipes)
+    containers.get("InvoicesDB", "Menu").seed(dict(recipes))
+
+def conditional_request(route, etag):
+    headers = {"Authorization": f"Bearer {issue_access_token(EMAIL)}", "If-None-Match": etag}
+    return make_request({"email": EMAIL}, route=route, headers=headers)
+
+def total_charge(containers):
+    return sum(container.total_charge for container in containers.containers.values())
+
+def main():
+    containers = FakeContainers()
+    seed(containers)
+    handlers = {}
+    for name in ENDPOINTS:
+        handlers[name] = load_handler(name)
+        handlers[name].AsyncCosmosOperator = fake_async_operator(containers)
+
+    print(f"{'endpoint':>16} {'mode':>5} {'status':>6} {'bytes':>10} {'RU':>8} {'ms':>8}")
+    etags = {}
+    for name, handler in handlers.items():
+        first = make_request({"email": EMAIL}, route=name)
+        for mode in ("full", "304"):
+            request = first if mode == "full" else conditional_request(name, etags[name])
+
+            async def cold_request():
+                document_cache.clear()
+                return await handler.main(request)
+
+            charge_before = total_charge(containers)
+            seconds, response = run_timed(cold_request, repeat=3)
+            charge = (total_charge(containers) - charge_before) / 3
+            if mode == "full":
+                etags[name] = response.headers["ETag"]
+            assert response.status_code == (200 if mode == "full" else 304), response.status_code
+            print(f"{name:>16} {mode:>5} {response.status_code:>6} {len(response.get_body()):>10,} "
+                  f"{charge:>8.1f} {seconds * 1000:>8.2f}")
+
+    inventory = containers.get("InvoicesDB", "Inventory")
+    document = inventory.read_item(EMAIL, EMAIL)
+    document["items"][0]["Case Price"] = 1.0
+    inventory.upsert_item(document)
+    for name in ("get-inventories", "get-recipes"):
+        request = conditional_request(name, etags[name])
+        document_cache.clear()
+        _, response = run_timed(lambda: handlers[name].main(request), repeat=1)
+        assert response.status_code == 200 and response.headers["ETag"] != etags[name]
+    print("after an inventory change, get-inventories and get-recipes return 200 with a new ETag")
+
+if __name__ == "__main__":
+    main()
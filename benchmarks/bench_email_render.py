@@ -0,0 +1,76 @@
+"""
+Per-send CPU cost of building an OTP message.
+
+Run from the repository root:
+    python -m benchmarks.bench_email_render
+
+"before" reproduces the old path: an f-string body, a fresh header block
+and the whole message dict formatted into an INFO log record. "after"
+renders the pre-parsed template into a message that shares the cached
+header block. Logging goes to a handler that drops records after
+formatting, so the cost of formatting is counted but nothing is printed.
+"""
+import logging
+import timeit
+from shared_code.email_service import EmailService, build_otp_content
+
+ITERATIONS = 20000
+SENDER = "noreply@culvana.com"
+RECIPIENT = "bench@culvana.com"
+
+class _FormatAndDrop(logging.Handler):
+    def emit(self, record):
+        self.format(record)
+
+def before(otp):
+    plain_text = f"Your verification code is: {otp}\nThis code will expire in 10 minutes."
+    html_content = f"""
+                <html>
+                <body style="font-family: Arial, sans-serif;">
+                    <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+                        <h2 style="color: #333;">Your Verification Code</h2>
+                        <p>Your verification code is: <strong style="font-size: 18px;">{otp}</strong></p>
+                        <p>This code will expire in 10 minutes.</p>
+                        <hr style="border: 1px solid #eee; margin: 20px 0;">
+                        <p style="color: #666; font-size: 12px;">
+                            This is an automated message, please do not reply.
+                        </p>
+                    </div>
+                </body>
+                </html>
+            """
+    message = {
+        "senderAddress": SENDER,
+        "content": {"subject": "Your Verification Code", "plainText": plain_text, "html": html_content},
+        "recipients": {"to": [{"address": RECIPIENT}]},
+        "headers": {
+            "X-Priority": "1",
+            "X-MSMail-Priority": "High",
+            "Importance": "high",
+            "X-Microsoft-AntiSpam": "BCL:0",
+            "X-Microsoft-AntiSpam-Message-Info": "None",
+            "List-Unsubscribe": f"<mailto:unsubscribe@{SENDER.split('@')[1]}>"
+        }
+    }
+    logging.info(f"Sending message structure: {message}")
+    return message
+
+def main():
+    root = logging.getLogger()
+    root.handlers[:] = [_FormatAndDrop()]
+    root.setLevel(logging.INFO)
+    service = EmailService(email_client=object())
+
+    def after(otp):
+        subject, plain_text, html_content = build_otp_content(otp)
+        message = service.create_email_message(RECIPIENT, subject, plain_text, html_content)
+        logging.debug("Sending %r to %s", subject, RECIPIENT)
+        return message
+
+    assert before("123456")["content"]["plainText"] == after("123456")["content"]["plainText"]
+    for name, build in (("before", before), ("after", after)):
+        seconds = min(timeit.repeat(lambda: build("123456"), number=ITERATIONS, repeat=5))
+        print(f"{name:>6}: {seconds / ITERATIONS * 1e6:7.2f} us per message")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+get-inventories with and without a `fields` selection on a 5,000-item inventory.
+
+Run from the repository root:
+    python -m benchmarks.bench_field_projection
+
+Compares the full 21-field response with a three-field selection in both
+storage layouts. The fake container charges ~1 RU per KB for point reads
+and ~2.9 RU plus ~1 RU per KB returned for single-partition projections.
+That is an approximation: Cosmos still loads a document to project it, so
+check real savings against x-ms-request-charge on a live account. The
+document cache is cleared before every request.
+"""
+import asyncio
+import json
+import os
+import random
+from benchmarks.bench_serialization import make_inventory
+from benchmarks.harness import FakeContainers, fake_async_operator, load_handler, make_request, run_timed
+from shared_code.document_cache import document_cache
+from shared_code.inventory_repository import STORAGE_MODE_DOCUMENT, STORAGE_MODE_PER_ITEM
+
+EMAIL = "bench@culvana.com"
+ITEMS = 5000
+SELECTION = ["Item Name", "Case Price", "Category"]
+
+def main():
+    containers = FakeContainers()
+    inventory = containers.get("InvoicesDB", "Inventory")
+    inventory.seed({"id": EMAIL, "userId": EMAIL, "items": make_inventory(random.Random(5), ITEMS)["items"]})
+    handler = load_handler("get-inventories")
+    handler.AsyncCosmosOperator = fake_async_operator(containers)
+
+    print(f"{'layout':>9} {'fields':>8} {'bytes':>11} {'RU':>9} {'ms':>8}")
+    for layout in (STORAGE_MODE_DOCUMENT, STORAGE_MODE_PER_ITEM):
+        os.environ['INVENTORY_STORAGE_MODE'] = layout
+        if layout == STORAGE_MODE_PER_ITEM:
+            repository = handler.AsyncCosmosOperator().get_inventory_repository()
+            asyncio.run(repository.migrate_user(EMAIL))
+
+        for label, fields in (("all", None), ("3", SELECTION)):
+            body = {"email": EMAIL, "fields": fields} if fields else {"email": EMAIL}
+            request = make_request(body, route="get-inventories")
+
+            async def cold_request():
+                document_cache.clear()
+                return await handler.main(request)
+
+            charge_before = inventory.total_charge
+            seconds, response = run_timed(cold_request, repeat=3)
+            charge = (inventory.total_charge - charge_before) / 3
+            payload = json.loads(response.get_body())
+            assert response.status_code == 200 and payload["itemCount"] == ITEMS
+            assert len(payload["inventory"][0]) == (len(SELECTION) if fields else 21)
+            print(f"{layout:>9} {label:>8} {len(response.get_body()):>11,} {charge:>9.1f} {seconds * 1000:>8.2f}")
+
+    bad = asyncio.run(handler.main(make_request({"email": EMAIL, "fields": ["id"]}, route="get-inventories")))
+    assert bad.status_code == 400
+    print(f"unknown field rejected: {json.loads(bad.get_body())['error']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+get-recipes cost as a function of recipe/ingredient count.
+
+Run from the repository root:
+    python -m benchmarks.bench_get_recipes
+
+Inventory reads should stay at 1 per request regardless of how many
+ingredients the recipes reference. The document cache is cleared before
+every request so each one pays its reads.
+"""
+import json
+from benchmarks.harness import FakeContainers, fake_async_operator, load_handler, make_request, run_timed
+from shared_code.document_cache import document_cache
+
+EMAIL = "bench@culvana.com"
+INVENTORY_SIZE = 500
+
+def seed(containers, recipe_count, ingredients_per_recipe):
+    inventory = containers.get("InvoicesDB", "Inventory")
+    inventory.seed({
+        "id": EMAIL,
+        "userId": EMAIL,
+        "items": [
+            {
+                "Inventory Item Name": f"Ingredient {i}",
+                "Supplier Name": "Sysco",
+                "Item Number": str(i),
+                "Measured In": "lb",
+                "Location": "Walk-in"
+            }
+            for i in range(INVENTORY_SIZE)
+        ]
+    })
+    recipes = containers.get("InvoicesDB", "Recipes")
+    recipes.seed({
+        "id": EMAIL,
+        "recipes": {
+            f"inventory-items-{EMAIL}": [
+                {
+                    "data": {
+                        "Type": "Recipe",
+                        "recipe_name": f"Recipe {r}",
+                        "total_yield": 1,
+                        "servings": 4,
+                        "items_per_serving": 1,
+                        "ingredients": [
+                            {"ingredient": f"INGREDIENT {(r + i) % INVENTORY_SIZE}", "total_cost": 1.5}
+                            for i in range(ingredients_per_recipe)
+                        ]
+                    }
+                }
+                for r in range(recipe_count)
+            ]
+        }
+    })
+    return inventory
+
+def main():
+    handler = load_handler("get-recipes")
+    print(f"{'recipes':>8} {'ingr/recipe':>12} {'ingredients':>12} {'inv reads':>10} {'ms':>10}")
+    for recipe_count, ingredients_per_recipe in [(10, 5), (50, 10), (200, 15), (200, 40)]:
+        containers = FakeContainers()
+        inventory = seed(containers, recipe_count, ingredients_per_recipe)
+        handler.AsyncCosmosOperator = fake_async_operator(containers)
+        request = make_request({"email": EMAIL}, route="get-recipes")
+
+        async def cold_request():
+            document_cache.clear()
+            return await handler.main(request)
+
+        seconds, response = run_timed(cold_request, repeat=3)
+        body = json.loads(response.get_body())
+        assert response.status_code == 200 and len(body["recipes"]) == recipe_count
+        reads_per_request = inventory.operation_counts.get("read_item", 0) // 3
+        print(f"{recipe_count:>8} {ingredients_per_recipe:>12} {recipe_count * ingredients_per_recipe:>12} "
+              f"{reads_per_request:>10} {seconds * 1000:>10.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+search-inventories against downloading the whole inventory and filtering it.
+
+Run from the repository root:
+    python -m benchmarks.bench_inventory_search [--items 5000]
+
+"download" is get-inventories followed by a client-side linear filter.
+"search (build)" clears the index cache first, so it pays for reading
+the inventory and building the index. "search (warm)" reuses the
+index for the same document version, so it only checks the _etag.
+Every query's results are checked against a brute-force filter.
+"""
+import argparse
+import json
+import random
+from benchmarks.harness import FakeContainers, fake_async_operator, load_handler, make_request, run_timed
+from shared_code.inventory_index import inventory_indexes, is_active, item_locations
+
+EMAIL = "bench@culvana.com"
+CATEGORIES = ["Produce", "Dairy", "Meat", "Dry Goods", "Frozen", "Beverages", "Bakery", "Seafood"]
+SUPPLIERS = ["Sysco", "US Foods", "Restaurant Depot", "Gordon Food Service", "Local Farm"]
+LOCATIONS = ["Walk-in", "Freezer", "Dry Storage", "Bar"]
+WORDS = ["apple", "avocado", "bacon", "basil", "beef", "butter", "carrot", "cheddar", "chicken", "cream",
+         "flour", "garlic", "lemon", "milk", "onion", "pepper", "potato", "rice", "salmon", "tomato"]
+
+QUERIES = {
+    "category": {"category": "Produce"},
+    "category+active": {"category": "Dairy", "active": True},
+    "supplier+location": {"supplier": ["Sysco", "US Foods"], "location": "Freezer"},
+    "prefix": {"prefix": "chi"},
+    "prefix+sort price": {"prefix": "b", "sort": "price", "order": "desc"},
+    "all, sorted by name": {"sort": "name", "limit": 200}
+}
+
+def make_items(count):
+    rng = random.Random(9)
+    return [
+        {
+            "Inventory Item Name": f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} {i}",
+            "Item Number": str(100000 + i),
+            "Supplier Name": rng.choice(SUPPLIERS),
+            "Category": rng.choice(CATEGORIES),
+            "Location": rng.choice(LOCATIONS),
+            "Active": "No" if rng.random() < 0.1 else "Yes",
+            "Case Price": round(rng.uniform(5, 250), 2),
+            "Measured In": "lb",
+            "timestamp": "2024-05-01T12:00:00"
+        }
+        for i in range(count)
+    ]
+
+def client_filter(items, query):
+    """What a client does with the downloaded inventory"""
+    def values(name):
+        value = query.get(name)
+        return None if value is None else [v.lower() for v in (value if isinstance(value, list) else [value])]
+
+    categories, suppliers, locations = values("category"), values("supplier"), values("location")
+    prefix = (query.get("prefix") or "").lower()
+    return [
+        item for item in items
+        if (categories is None or item["Category"].lower() in categories)
+        and (suppliers is None or item["Supplier Name"].lower() in suppliers)
+        and (locations is None or any(name.lower() in locations for name in item_locations(item)))
+        and (query.get("active") is None or is_active(item) == query["active"])
+        and item["Inventory Item Name"].lower().startswith(prefix)
+    ]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=5000)
+    args = parser.parse_args()
+
+    containers = FakeContainers()
+    items = make_items(args.items)
+    containers.get("InvoicesDB", "Inventory").seed({"id": EMAIL, "userId": EMAIL, "items": items})
+    download = load_handler("get-inventories")
+    search = load_handler("search-inventories")
+    download.AsyncCosmosOperator = search.AsyncCosmosOperator = fake_async_operator(containers)
+
+    download_request = make_request({"email": EMAIL}, route="get-inventories")
+
+    async def download_and_filter(query):
+        response = await download.main(download_request)
+        return client_filter(json.loads(response.get_body())["inventory"], query)
+
+    async def build_then_search(request):
+        inventory_indexes.clear()
+        return await search.main(request)
+
+    print(f"{'query':>20} {'matches':>8} {'download ms':>12} {'search (build) ms':>18} {'search (warm) ms':>17}")
+    for label, query in QUERIES.items():
+        request = make_request({"email": EMAIL, **query}, route="search-inventories")
+        download_seconds, expected = run_timed(lambda: download_and_filter(query), repeat=3)
+        build_seconds, _ = run_timed(lambda: build_then_search(request), repeat=3)
+        warm_seconds, response = run_timed(lambda: search.main(request), repeat=5)
+
+        body = json.loads(response.get_body())
+        assert response.status_code == 200 and body["total"] == len(expected), (label, body.get("total"), len(expected))
+        if "sort" not in query:
+            limit = query.get("limit", 50)
+            assert [i["Item Number"] for i in body["inventory"]] == [i["Item Number"] for i in expected[:limit]]
+        print(f"{label:>20} {body['total']:>8} {download_seconds * 1000:>12.2f} "
+              f"{build_seconds * 1000:>18.2f} {warm_seconds * 1000:>17.2f}")
+    print(f"index cache: {inventory_indexes.get_stats()}")
+
+if __name__ == "__main__":
+    main()
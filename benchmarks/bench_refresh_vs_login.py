@@ -0,0 +1,83 @@
+"""
+Load comparison of re-authenticating with login vs refresh.
+
+Run from the repository root:
+    python -m benchmarks.bench_refresh_vs_login [--requests 40] [--clients 4]
+
+Each client re-authenticates repeatedly, either by posting its password to
+login or by exchanging its current refresh token at refresh. Reports wall
+time, process CPU time per request and Cosmos operations per request
+against fake containers. The password hash uses the configured
+PASSWORD_HASH_ROUNDS, so login pays the real bcrypt cost.
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.harness import FakeContainers, fake_operator, load_handler, make_request
+from shared_code.password_hasher import get_password_hasher
+
+PASSWORD = "correct horse battery staple"
+
+# measure the endpoints themselves, not the per-email login limit
+os.environ.setdefault('RATE_LIMIT_LOGIN_EMAIL', '1000000/60')
+
+def seed_users(containers, clients):
+    users = containers.get("culvana-db", "users")
+    password_hash = get_password_hasher().hash_password(PASSWORD)
+    emails = [f"client{i}@culvana.com" for i in range(clients)]
+    for email in emails:
+        users.seed({"id": email, "email": email, "passwordHash": password_hash, "verified": True})
+    return users, emails
+
+def run(name, clients, per_client, authenticate):
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        cpu_started = time.process_time()
+        started = time.perf_counter()
+        statuses = list(pool.map(lambda i: [authenticate(i) for _ in range(per_client)], range(clients)))
+        elapsed = time.perf_counter() - started
+        cpu = time.process_time() - cpu_started
+    total = clients * per_client
+    assert all(status == 200 for client in statuses for status in client), statuses
+    return name, total, elapsed, cpu
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=40)
+    parser.add_argument('--clients', type=int, default=4)
+    args = parser.parse_args()
+    per_client = max(1, args.requests // args.clients)
+
+    containers = FakeContainers()
+    users, emails = seed_users(containers, args.clients)
+    operator = fake_operator(containers)
+    login = load_handler("login")
+    refresh = load_handler("refresh")
+    login.CosmosOperator = operator
+    refresh.CosmosOperator = operator
+
+    refresh_tokens = {}
+
+    def do_login(client):
+        response = login.main(make_request({"email": emails[client], "password": PASSWORD}, headers={}))
+        if response.status_code == 200:
+            refresh_tokens[client] = json.loads(response.get_body())["refreshToken"]
+        return response.status_code
+
+    def do_refresh(client):
+        response = refresh.main(make_request({"refreshToken": refresh_tokens[client]}, headers={}))
+        if response.status_code == 200:
+            refresh_tokens[client] = json.loads(response.get_body())["refreshToken"]
+        return response.status_code
+
+    print(f"{'endpoint':>8} {'requests':>8} {'req/s':>8} {'cpu ms/req':>11} {'cosmos ops/req':>15}")
+    for name, authenticate in (("login", do_login), ("refresh", do_refresh)):
+        users.operation_counts.clear()
+        name, total, elapsed, cpu = run(name, args.clients, per_client, authenticate)
+        operations = sum(count for operation, count in users.operation_counts.items()
+                         if operation != 'precondition_failed')
+        print(f"{name:>8} {total:>8} {total / elapsed:>8.1f} {cpu / total * 1000:>11.2f} {operations / total:>15.1f}")
+
+if __name__ == "__main__":
+    main()
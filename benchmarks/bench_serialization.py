@@ -0,0 +1,116 @@
+"""
+Encode/decode throughput of each JSON backend on response-shaped documents.
+
+Run from the repository root:
+    python -m benchmarks.bench_serialization
+
+Builds an invoice page (get-invoices shape), an inventory list
+(get-inventories shape) and a recipe list (get-recipes shape), then
+encodes and decodes each with every available backend in
+shared_code.serialization. Both backends must produce equivalent JSON,
+though float exponents are spelled differently (1e+16 vs 1e16).
+"""
+import datetime
+import decimal
+import importlib
+import json
+import random
+import time
+from benchmarks.bench_compression import make_invoice
+from shared_code import serialization
+
+get_inventories = importlib.import_module("get-inventories")
+
+REPEAT = 5
+
+def make_inventory(rng, count):
+    return {"items": [
+        get_inventories.format_inventory_response({
+            "Supplier Name": rng.choice(["Sysco", "US Foods"]),
+            "Inventory Item Name": f"Ingredient {i}",
+            "Inventory Unit of Measure": "lb",
+            "Item Name": f"Ingredient {i} 10 lb case",
+            "Item Number": str(100000 + i),
+            "Quantity In a Case": 4,
+            "Measurement Of Each Item": 10,
+            "Measured In": "lb",
+            "Case Price": round(rng.uniform(5, 250), 2),
+            "Cost of a Unit": round(rng.uniform(0.1, 9), 4),
+            "Category": "Produce",
+            "Location": "Walk-in",
+            "Active": "Yes",
+            "timestamp": datetime.datetime(2024, 5, 1, 12, 30, i % 60).isoformat(),
+            "batchNumber": f"batch-{i}"
+        })
+        for i in range(count)
+    ]}
+
+def make_recipes(rng, count, ingredients):
+    return {"recipes": [
+        {
+            "recipe_name": f"Recipe {r}",
+            "total_yield": 1,
+            "servings": 4,
+            "ingredients": [
+                {
+                    "ingredient": f"INGREDIENT {rng.randint(0, 500)}",
+                    "quantity": rng.randint(1, 8),
+                    "unit": "oz",
+                    "total_cost": round(rng.uniform(0.1, 5), 2)
+                }
+                for _ in range(ingredients)
+            ]
+        }
+        for r in range(count)
+    ]}
+
+def best_of(fn):
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    rng = random.Random(11)
+    documents = {
+        "invoices": {"invoices": [make_invoice(rng, i, 30) for i in range(200)]},
+        "inventory": make_inventory(rng, 5000),
+        "recipes": make_recipes(rng, 500, 12),
+    }
+    backends = [serialization.StdlibBackend()]
+    if serialization.orjson is not None:
+        backends.append(serialization.OrjsonBackend())
+    else:
+        print("orjson not installed; only the stdlib backend is measured")
+
+    mixed = {
+        "at": datetime.datetime(2024, 5, 1, 12, 30), "price": decimal.Decimal("12.50"), "count": decimal.Decimal("3"),
+        "missing": float("nan"), "big": 2 ** 70
+    }
+    outputs = {backend.name: backend.dumps(mixed) for backend in backends}
+    assert len({repr(backends[0].loads(data)) for data in outputs.values()}) == 1, outputs
+    baseline = json.dumps(serialization.without_non_finite(mixed), default=serialization.to_json_compatible)
+    assert outputs[serialization.BACKEND_STDLIB] == baseline.encode('utf-8'), "stdlib backend drifted from json.dumps"
+    print(f"datetime/Decimal/NaN/big int encoding: {outputs[backends[0].name].decode()}")
+
+    print(f"{'document':>10} {'backend':>8} {'KiB':>7} {'encode ms':>10} {'MB/s':>7} {'decode ms':>10} {'MB/s':>7}")
+    for label, document in documents.items():
+        encoded = {}
+        for backend in backends:
+            data = backend.dumps(document)
+            encoded[backend.name] = data
+            encode = best_of(lambda: backend.dumps(document))
+            decode = best_of(lambda: backend.loads(data))
+            megabytes = len(data) / 1e6
+            print(
+                f"{label:>10} {backend.name:>8} {len(data) / 1024:7,.0f} "
+                f"{encode * 1000:10.2f} {megabytes / encode:7.0f} "
+                f"{decode * 1000:10.2f} {megabytes / decode:7.0f}"
+            )
+        decoded = [backends[0].loads(data) for data in encoded.values()]
+        assert all(value == decoded[0] for value in decoded), f"backends disagree on {label}"
+
+if __name__ == "__main__":
+    main()
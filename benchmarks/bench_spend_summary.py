@@ -0,0 +1,103 @@
+"""
+Spend rollups over 100k invoice line items: client-side sums vs get-spend-summary.
+
+Run from the repository root:
+    python -m benchmarks.bench_spend_summary [--invoices 2000] [--items 50]
+
+"download" is what dashboards do today: fetch get-invoices and sum
+Extended Price by supplier/category/month in a Python loop.
+"python groupby" is the same loop on the server, with no transfer.
+For get-spend-summary:
+- "flatten" and "numpy rollup" time building the columns and one
+  rollup in process, with no I/O
+- "cold" clears the column cache, so it pays for the read and the
+  flattening. Most of its time is the fake container deep-copying the
+  document, which stands in for transferring and parsing it
+- "new rollup" reuses the columns with parameters not asked for before
+- "memoized" repeats a rollup for the same document version
+Totals are checked against the Python loop.
+"""
+import argparse
+import json
+import random
+from collections import defaultdict
+from benchmarks.bench_compression import make_invoice
+from benchmarks.harness import FakeContainers, fake_async_operator, load_handler, make_request, run_timed
+from shared_code.document_cache import document_cache
+from shared_code.spend_analytics import LineItemColumns, order_month, parse_amount, spend_columns
+
+EMAIL = "bench@culvana.com"
+GROUP_BY = ["supplier", "category", "month"]
+
+def python_rollup(invoices):
+    totals = defaultdict(float)
+    for invoice in invoices:
+        month = order_month(invoice.get("Order Date"))
+        for item in invoice.get("Items") or []:
+            totals[(invoice.get("Supplier Name"), item.get("Product Category"), month)] += parse_amount(item.get("Extended Price"))
+    return totals
+
+async def _async(function, *args):
+    return function(*args)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--invoices", type=int, default=2000)
+    parser.add_argument("--items", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(21)
+    invoices = [make_invoice(rng, i, args.items) for i in range(args.invoices)]
+    containers = FakeContainers()
+    containers.get("InvoicesDB", "Invoices").seed({"id": EMAIL, "userId": EMAIL, "invoices": invoices})
+    get_invoices = load_handler("get-invoices")
+    summary = load_handler("get-spend-summary")
+    get_invoices.AsyncCosmosOperator = summary.AsyncCosmosOperator = fake_async_operator(containers)
+    print(f"{args.invoices:,} invoices, {args.invoices * args.items:,} line items")
+
+    download_request = make_request({"email": EMAIL}, route="get-invoices")
+
+    async def download_and_sum():
+        response = await get_invoices.main(download_request)
+        return python_rollup(json.loads(response.get_body())["data"]["invoices"])
+
+    async def server_python():
+        return python_rollup(invoices)
+
+    def summary_request(**body):
+        return make_request({"email": EMAIL, "groupBy": GROUP_BY, **body}, route="get-spend-summary")
+
+    request = summary_request()
+
+    async def cold():
+        spend_columns.clear()
+        document_cache.clear()
+        return await summary.main(request)
+
+    months = iter([f"2024-{month:02d}" for month in range(1, 13)] * 10)
+
+    async def new_rollup():
+        return await summary.main(summary_request(fromMonth=next(months)))
+
+    async def memoized():
+        return await summary.main(request)
+
+    timings = {}
+    timings["download"], expected = run_timed(download_and_sum, repeat=3)
+    timings["python groupby"], _ = run_timed(server_python, repeat=3)
+    timings["flatten"], columns = run_timed(lambda: _async(LineItemColumns, invoices), repeat=3)
+    timings["numpy rollup"], _ = run_timed(lambda: _async(LineItemColumns.rollup, columns, GROUP_BY, "2024-01"), repeat=1)
+    timings["cold"], response = run_timed(cold, repeat=3)
+    timings["new rollup"], _ = run_timed(new_rollup, repeat=5)
+    timings["memoized"], _ = run_timed(memoized, repeat=5)
+
+    body = json.loads(response.get_body())
+    assert response.status_code == 200 and len(body["rows"]) == len(expected)
+    for row in body["rows"]:
+        assert abs(row["total"] - expected[(row["supplier"], row["category"], row["month"])]) < 0.01
+    print(f"{len(body['rows'])} supplier x category x month groups, total {body['totals']['total']:,.2f}")
+    for label, seconds in timings.items():
+        print(f"{label:>15}: {seconds * 1000:9.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Pick a bcrypt cost factor for this hardware and check pool back-pressure.
+
+Run from the repository root:
+    python -m benchmarks.calibrate_password_hashing [--target-ms 250] [--burst 64]
+
+Times one hash at each cost factor and recommends the highest one whose
+hash stays under the target; set PASSWORD_HASH_ROUNDS to it. Then fires a
+burst of concurrent logins at a PasswordHasher using the recommended cost
+to show that requests beyond the queue limit are rejected in microseconds
+instead of waiting behind the CPU.
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+from shared_code.password_hasher import HasherSaturatedError, PasswordHasher
+
+PASSWORD = "correct horse battery staple"
+
+def time_rounds(rounds, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        bcrypt.hashpw(PASSWORD.encode('utf-8'), bcrypt.gensalt(rounds))
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def burst(hasher, stored_hash, requests):
+    def login(_):
+        started = time.perf_counter()
+        try:
+            hasher.verify_password(PASSWORD, stored_hash)
+            outcome = "ok"
+        except HasherSaturatedError:
+            outcome = "503"
+        return outcome, time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=requests) as clients:
+        return list(clients.map(login, range(requests)))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--target-ms', type=float, default=250)
+    parser.add_argument('--burst', type=int, default=64)
+    args = parser.parse_args()
+
+    recommended = 10
+    print(f"{'rounds':>6} {'ms/hash':>8}")
+    for rounds in range(10, 15):
+        milliseconds = time_rounds(rounds) * 1000
+        print(f"{rounds:>6} {milliseconds:>8.1f}")
+        if milliseconds <= args.target_ms:
+            recommended = rounds
+        else:
+            break
+    print(f"recommended PASSWORD_HASH_ROUNDS={recommended} (target {args.target_ms:.0f} ms)")
+
+    hasher = PasswordHasher(rounds=recommended)
+    stored_hash = hasher.hash_password(PASSWORD)
+    results = burst(hasher, stored_hash, args.burst)
+    accepted = [seconds for outcome, seconds in results if outcome == "ok"]
+    rejected = [seconds for outcome, seconds in results if outcome == "503"]
+    print(f"burst of {args.burst} logins, {hasher.workers} workers, max pending {hasher.max_pending}:")
+    if accepted:
+        print(f"  accepted {len(accepted):>3}  slowest {max(accepted) * 1000:8.1f} ms")
+    if rejected:
+        print(f"  rejected {len(rejected):>3}  slowest {max(rejected) * 1000:8.3f} ms")
+    assert len(accepted) >= min(args.burst, hasher.max_pending)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""
+In-memory stand-ins for Cosmos container clients, used by the benchmarks to
+exercise the handlers and shared_code without a live account.
+"""
+import asyncio
+import copy
+import itertools
+import json
+import random
+import re
+import threading
+from azure.core import MatchConditions
+from azure.cosmos.exceptions import (
+    CosmosAccessConditionFailedError,
+    CosmosHttpResponseError,
+    CosmosResourceExistsError,
+    CosmosResourceNotFoundError
+)
+
+_etag_counter = itertools.count(1)
+
+def estimate_charge(document, write=False) -> float:
+    """Rough RU model: ~1 RU per KB read, ~5.5 RU per KB written"""
+    size_kb = max(len(json.dumps(document, default=str)) / 1024, 1) if document else 1
+    return round(size_kb * (5.5 if write else 1.0), 2)
+
+def apply_patch_operation(document, operation):
+    """Apply one Cosmos patch operation (set/add/replace/remove/incr) in place"""
+    parts = [
+        part.replace('~1', '/').replace('~0', '~')
+        for part in operation['path'].split('/')[1:]
+    ]
+    parent = document
+    for part in parts[:-1]:
+        parent = parent[int(part)] if isinstance(parent, list) else parent[part]
+    last = parts[-1]
+    op = operation['op']
+    if isinstance(parent, list):
+        if op == 'add':
+            parent.insert(len(parent) if last == '-' else int(last), operation['value'])
+        elif op == 'remove':
+            del parent[int(last)]
+        elif op == 'incr':
+            parent[int(last)] += operation['value']
+        else:
+            parent[int(last)] = operation['value']
+    elif op == 'remove':
+        del parent[last]
+    elif op == 'incr':
+        parent[last] = parent.get(last, 0) + operation['value']
+    else:
+        parent[last] = operation['value']
+
+class _FakeConnection:
+    def __init__(self):
+        self.last_response_headers = {}
+
+class FakeContainer:
+    """
+    Thread-safe dict-backed container. Documents are keyed by (partition key, id)
+    and every read returns a deep copy, so callers see the same isolation as
+    with the real service.
+    """
+    def __init__(self, container_id="fake", partition_key_path="userId"):
+        self.id = container_id
+        self.partition_key_path = partition_key_path
+        self.client_connection = _FakeConnection()
+        self.operation_counts = {}
+        self.total_charge = 0.0
+        self._documents = {}
+        self._lock = threading.Lock()
+
+    def _count(self, operation, charge):
+        self.operation_counts[operation] = self.operation_counts.get(operation, 0) + 1
+        self.total_charge += charge
+        self.client_connection.last_response_headers = {'x-ms-request-charge': str(charge)}
+
+    def _key(self, body, partition_key=None):
+        if partition_key is None:
+            partition_key = body.get(self.partition_key_path, body['id'])
+        return (partition_key, body['id'])
+
+    def _store(self, key, body):
+        stored = copy.deepcopy(body)
+        stored['_etag'] = f'"{next(_etag_counter)}"'
+        self._documents[key] = stored
+        return copy.deepcopy(stored)
+
+    def _check_etag(self, key, etag, match_condition):
+        if etag is None or match_condition != MatchConditions.IfNotModified:
+            return
+        current = self._documents.get(key)
+        if current is None or current.get('_etag') != etag:
+            self.operation_counts['precondition_failed'] = self.operation_counts.get('precondition_failed', 0) + 1
+            raise CosmosAccessConditionFailedError(status_code=412, message="Precondition failed")
+
+    def seed(self, body, partition_key=None):
+        with self._lock:
+            return self._store(self._key(body, partition_key), body)
+
+    def read_item(self, item, partition_key, etag=None, match_condition=None, **kwargs):
+        with self._lock:
+            document = self._documents.get((partition_key, item))
+            if document is None:
+                self._count('read_item', 1)
+                raise CosmosResourceNotFoundError(status_code=404, message="Entity not found")
+            if match_condition == MatchConditions.IfModified and document.get('_etag') == etag:
+                self._count('read_item', 1)
+                return None
+            self._count('read_item', estimate_charge(document))
+            return copy.deepcopy(document)
+
+    def create_item(self, body, **kwargs):
+        with self._lock:
+            key = self._key(body)
+            if key in self._documents:
+                raise CosmosResourceExistsError(status_code=409, message="Entity already exists")
+            self._count('create_item', estimate_charge(body, write=True))
+            return self._store(key, body)
+
+    def upsert_item(self, body, etag=None, match_condition=None, **kwargs):
+        with self._lock:
+            key = self._key(body)
+            self._check_etag(key, etag, match_condition)
+            self._count('upsert_item', estimate_charge(body, write=True))
+            return self._store(key, body)
+
+    def replace_item(self, item, body, etag=None, match_condition=None, **kwargs):
+        with self._lock:
+            key = self._key(body)
+            if key not in self._documents:
+                raise CosmosResourceNotFoundError(status_code=404, message="Entity not found")
+            self._check_etag(key, etag, match_condition)
+            self._count('replace_item', estimate_charge(body, write=True))
+            return self._store(key, body)
+
+    def patch_item(self, item, partition_key, patch_operations, etag=None, match_condition=None, **kwargs):
+        with self._lock:
+            key = (partition_key, item)
+            if key not in self._documents:
+                raise CosmosResourceNotFoundError(status_code=404, message="Entity not found")
+            self._check_etag(key, etag, match_condition)
+            document = copy.deepcopy(self._documents[key])
+            for operation in patch_operations:
+                try:
+                    apply_patch_operation(document, operation)
+                except (KeyError, IndexError, TypeError):
+                    raise CosmosHttpResponseError(status_code=400, message=f"Invalid patch path {operation['path']}")
+            self._count('patch_item', estimate_charge(patch_operations, write=True))
+            return self._store(key, document)
+
+    def delete_item(self, item, partition_key, **kwargs):
+        with self._lock:
+            if self._documents.pop((partition_key, item), None) is None:
+                raise CosmosResourceNotFoundError(status_code=404, message="Entity not found")
+            self._count('delete_item', 1)
+
+    def query_items(self, query, parameters=None, partition_key=None, **kwargs):
+        """
+        Supports AND-ed equality filters of the form "c.<field> = @param" or
+        'c["<field>"] = @param', an optional trailing "ORDER BY c.<field>",
+        "SELECT VALUE COUNT(1)", single-field projections "SELECT VALUE
+        c.<field>", object projections "SELECT VALUE {...}" and "SELECT
+        c.<field>, ..., ARRAY(SELECT VALUE {...} FROM i IN c.<array>) AS
+        <name>". JOINs are not evaluated.
+        Queries are charged at ~10x a point read of the same documents to model
+        fan-out; single-partition projections at ~2.9 RU plus ~1 RU per KB
+        returned.
+        """
+        values = {p['name']: p['value'] for p in parameters or []}
+        query, _, order_by = query.partition(' ORDER BY ')
+        filters = []
+        for clause in query.split(' WHERE ', 1)[-1].split(' AND ') if ' WHERE ' in query else []:
+            field, _, param = clause.strip().partition(' = ')
+            if field.startswith('c["') and param in values:
+                filters.append((json.loads(field[2:-1]), values[param]))
+            elif field.startswith('c.') and param in values:
+                filters.append((field[2:], values[param]))
+        project = _compile_projection(query.rsplit(' FROM c', 1)[0])
+        with self._lock:
+            matched = [
+                document for (pk, _), document in self._documents.items()
+                if (partition_key is None or pk == partition_key)
+                and all(document.get(field) == value for field, value in filters)
+            ]
+            if order_by.strip().startswith('c.'):
+                field = order_by.strip()[2:]
+                matched.sort(key=lambda document: document.get(field))
+            if project and partition_key is not None:
+                results = [project(document) for document in matched]
+                self._count('query_items', round(2.9 + len(json.dumps(results, default=str)) / 1024, 2))
+            else:
+                fan_out = 1 if partition_key is not None else 10
+                self._count('query_items', sum(estimate_charge(d) for d in matched) * fan_out or 3)
+                results = [project(document) for document in matched] if project else matched
+            results = copy.deepcopy(results)
+        if query.startswith('SELECT VALUE COUNT(1)'):
+            results = [len(results)]
+        return iter(results)
+
+_OBJECT_PROPERTY = re.compile(r'"((?:[^"\\]|\\.)*)":\s*(\w+)\["((?:[^"\\]|\\.)*)"\]')
+_ARRAY_SUBQUERY = re.compile(r'ARRAY\(SELECT VALUE (\{.*?\}) FROM (\w+) IN c\.(\w+)\) AS (\w+)')
+
+def _object_projection(text):
+    properties = [(json.loads(f'"{name}"'), json.loads(f'"{field}"')) for name, _, field in _OBJECT_PROPERTY.findall(text)]
+    return lambda document: {name: document[field] for name, field in properties if field in document}
+
+def _compile_projection(select):
+    """Turn the SELECT clause of a supported query into a document -> result function"""
+    if select.startswith('SELECT VALUE c.'):
+        field = select[len('SELECT VALUE c.'):]
+        return lambda document: document.get(field)
+    if select.startswith('SELECT VALUE {'):
+        return _object_projection(select)
+    subquery = _ARRAY_SUBQUERY.search(select)
+    if select.startswith('SELECT c.') and subquery:
+        element, _, array, alias = subquery.groups()
+        project_element = _object_projection(element)
+        fields = [part.strip()[2:] for part in _ARRAY_SUBQUERY.sub('', select[len('SELECT '):]).split(',') if part.strip()]
+
+        def project(document):
+            result = {field: document[field] for field in fields if field in document}
+            result[alias] = [project_element(item) for item in document.get(array) or []]
+            return result
+        return project
+    return None
+
+class AsyncFakeContainer:
+    """
+    Async facade over FakeContainer matching the azure.cosmos.aio surface.
+    Every call awaits a random delay of up to latency seconds, so concurrent
+    callers interleave the way they would against the real service.
+    """
+    def __init__(self, container, latency=0.0):
+        self.container = container
+        self.latency = latency
+        self.id = container.id
+        self.client_connection = container.client_connection
+
+    @property
+    def operation_counts(self):
+        return self.container.operation_counts
+
+    async def _network(self):
+        await asyncio.sleep(random.uniform(0, self.latency) if self.latency else 0)
+
+    async def read_item(self, *args, **kwargs):
+        await self._network()
+        return self.container.read_item(*args, **kwargs)
+
+    async def create_item(self, *args, **kwargs):
+        await self._network()
+        return self.container.create_item(*args, **kwargs)
+
+    async def upsert_item(self, *args, **kwargs):
+        await self._network()
+        return self.container.upsert_item(*args, **kwargs)
+
+    async def replace_item(self, *args, **kwargs):
+        await self._network()
+        return self.container.replace_item(*args, **kwargs)
+
+    async def patch_item(self, *args, **kwargs):
+        await self._network()
+        return self.container.patch_item(*args, **kwargs)
+
+    async def delete_item(self, *args, **kwargs):
+        await self._network()
+        return self.container.delete_item(*args, **kwargs)
+
+    def query_items(self, *args, **kwargs):
+        async def iterate():
+            await self._network()
+            for item in self.container.query_items(*args, **kwargs):
+                yield item
+        return iterate()
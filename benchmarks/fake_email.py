@@ -0,0 +1,33 @@
+"""
+In-memory stand-in for the ACS email transport, used by the benchmarks to
+drive the email outbox without sending mail.
+"""
+import collections
+import random
+import threading
+import time
+
+class FakeEmailTransport:
+    """
+    Records every message it is asked to send. Each send sleeps for
+    `latency` seconds (the ACS accept round trip) and fails with
+    probability `failure_rate`.
+    """
+    def __init__(self, latency=0.0, failure_rate=0.0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.sent = collections.Counter()
+        self.last_content = {}
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def send(self, message):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            with self._lock:
+                self.failures += 1
+            raise RuntimeError("simulated ACS failure")
+        with self._lock:
+            self.sent[message['recipient']] += 1
+            self.last_content[message['recipient']] = message['content']
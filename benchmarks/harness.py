@@ -0,0 +1,87 @@
+"""
+Helpers for driving function handlers in-process against fake containers
+"""
+import asyncio
+import importlib.util
+import json
+import os
+import sys
+import time
+import azure.functions as func
+os.environ.setdefault('JWT_SECRET', 'benchmark-secret-not-for-production-use')
+from shared_code.async_db_operations import AsyncCosmosOperator
+from shared_code.auth import issue_access_token
+from shared_code.db_operations import CosmosOperator
+from benchmarks.fake_cosmos import AsyncFakeContainer, FakeContainer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def load_handler(function_name):
+    """Import <function_name>/__init__.py as a standalone module"""
+    path = os.path.join(ROOT, function_name, '__init__.py')
+    module_name = 'handler_' + function_name.replace('-', '_')
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+def make_request(body, route='', headers=None, method='POST', params=None):
+    """Build a request, signed in as the body's email unless headers are given"""
+    if headers is None and isinstance(body, dict) and body.get('email'):
+        headers = {'Authorization': f"Bearer {issue_access_token(body['email'])}"}
+    return func.HttpRequest(
+        method=method,
+        url=f'http://localhost/api/{route}',
+        headers=headers or {},
+        params=params or {},
+        body=json.dumps(body).encode('utf-8')
+    )
+
+class FakeContainers:
+    """Registry of fake containers keyed by (database, container)"""
+    def __init__(self):
+        self.containers = {}
+
+    def get(self, database_name, container_name):
+        key = (database_name, container_name)
+        if key not in self.containers:
+            self.containers[key] = FakeContainer(container_name)
+        return self.containers[key]
+
+def fake_async_operator(containers, latency=0.0):
+    """Return an AsyncCosmosOperator subclass bound to the given fake containers"""
+    class FakeAsyncCosmosOperator(AsyncCosmosOperator):
+        def __init__(self):
+            self.client = None
+            self.last_request_charge = 0.0
+            self.total_request_charge = 0.0
+
+        def get_container(self, database_name, container_name):
+            return AsyncFakeContainer(containers.get(database_name, container_name), latency)
+
+    return FakeAsyncCosmosOperator
+
+def fake_operator(containers):
+    """Return a CosmosOperator subclass bound to the given fake containers"""
+    class FakeCosmosOperator(CosmosOperator):
+        def __init__(self):
+            self.client = None
+            self.last_request_charge = 0.0
+            self.total_request_charge = 0.0
+
+        def get_container(self, database_name, container_name):
+            return containers.get(database_name, container_name)
+
+    return FakeCosmosOperator
+
+def run_timed(coroutine_factory, repeat=5):
+    """Run an async callable several times and return (best seconds, last result)"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = asyncio.run(coroutine_factory())
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
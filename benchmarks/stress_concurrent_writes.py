@@ -0,0 +1,117 @@
+"""
+Concurrency stress test for the mutating handlers against a fake container
+with simulated network latency.
+
+Run from the repository root:
+    python -m benchmarks.stress_concurrent_writes [--parallel 100]
+
+Fires N concurrent add-menu and add-inventory requests for the same user,
+then checks that every acknowledged (201) write survived. Requests that exhaust
+their retries get an explicit 409 for the client to retry; they are reported,
+not lost. A naive read-then-upsert loop over the same fake is run first to
+show the lost updates the ETag-conditioned writes prevent.
+"""
+import argparse
+import asyncio
+import json
+import time
+from benchmarks.fake_cosmos import AsyncFakeContainer
+from benchmarks.harness import FakeContainers, fake_async_operator, load_handler, make_request
+from shared_code.document_cache import document_cache
+
+EMAIL = "stress@culvana.com"
+LATENCY = 0.005
+
+async def naive_appends(parallel):
+    container = AsyncFakeContainer(FakeContainers().get("InvoicesDB", "Inventory"), LATENCY)
+    container.container.seed({"id": EMAIL, "userId": EMAIL, "items": []})
+
+    async def append(i):
+        document = await container.read_item(item=EMAIL, partition_key=EMAIL)
+        document['items'].append({"Inventory Item Name": f"naive {i}"})
+        await container.upsert_item(body=document)
+
+    await asyncio.gather(*(append(i) for i in range(parallel)))
+    document = await container.read_item(item=EMAIL, partition_key=EMAIL)
+    return len(document['items'])
+
+async def handler_writes(parallel):
+    containers = FakeContainers()
+    operator = fake_async_operator(containers, LATENCY)
+    add_menu = load_handler("add-menu")
+    add_inventory = load_handler("add-inventory")
+    add_menu.AsyncCosmosOperator = operator
+    add_inventory.AsyncCosmosOperator = operator
+
+    menu_requests = [
+        make_request({"email": EMAIL, "itemName": f"Menu {i}", "category": "Mains", "size": "L", "menuPrice": 12})
+        for i in range(parallel)
+    ]
+    inventory_requests = [
+        make_request({
+            "email": EMAIL,
+            "inventoryItem": f"Item {i}",
+            "itemType": "Food",
+            "inventroyCategory": "Produce",
+            "inventoryCountBy": "Case"
+        })
+        for i in range(parallel)
+    ]
+
+    started = time.perf_counter()
+    responses = await asyncio.gather(
+        *(add_menu.main(request) for request in menu_requests),
+        *(add_inventory.main(request) for request in inventory_requests)
+    )
+    elapsed = time.perf_counter() - started
+
+    menu_responses, inventory_responses = responses[:parallel], responses[parallel:]
+    conflicts = sum(1 for r in responses if r.status_code == 409)
+    failures = [json.loads(r.get_body()) for r in responses if r.status_code not in (201, 409)]
+    menu = containers.get("InvoicesDB", "Menu")
+    inventory = containers.get("InvoicesDB", "Inventory")
+    menu_doc = menu.read_item(EMAIL, EMAIL)
+    inventory_doc = inventory.read_item(EMAIL, EMAIL)
+    recipes = menu_doc['recipes'][f"inventory-items-{EMAIL}"]
+    return {
+        "elapsed": elapsed,
+        "failures": failures,
+        "conflicts": conflicts,
+        "menu_acknowledged": sum(1 for r in menu_responses if r.status_code == 201),
+        "inventory_acknowledged": sum(1 for r in inventory_responses if r.status_code == 201),
+        "recipe_count": menu_doc['recipe_count'],
+        "recipes": len(recipes),
+        "unique_recipe_ids": len({recipe['id'] for recipe in recipes}),
+        "items": len(inventory_doc['items']),
+        "unique_batch_numbers": len({item['batchNumber'] for item in inventory_doc['items']}),
+        "retries": menu.operation_counts.get('precondition_failed', 0)
+        + inventory.operation_counts.get('precondition_failed', 0)
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--parallel', type=int, default=100)
+    args = parser.parse_args()
+    parallel = args.parallel
+    document_cache.clear()
+
+    survived = asyncio.run(naive_appends(parallel))
+    print(f"naive read/upsert: {survived}/{parallel} appends survived ({parallel - survived} lost)")
+
+    result = asyncio.run(handler_writes(parallel))
+    print(f"handlers: {result['retries']} conflicts retried, {result['conflicts']} requests returned 409, "
+          f"{len(result['failures'])} failed, {result['elapsed'] * 1000:.0f} ms")
+    print(f"  add-menu:      acknowledged={result['menu_acknowledged']} recipe_count={result['recipe_count']} "
+          f"recipes={result['recipes']} unique ids={result['unique_recipe_ids']}")
+    print(f"  add-inventory: acknowledged={result['inventory_acknowledged']} items={result['items']} "
+          f"unique batchNumbers={result['unique_batch_numbers']}")
+    for failure in result['failures'][:5]:
+        print(f"  failure: {failure}")
+
+    assert not result['failures']
+    assert result['recipe_count'] == result['recipes'] == result['unique_recipe_ids'] == result['menu_acknowledged']
+    assert result['items'] == result['unique_batch_numbers'] == result['inventory_acknowledged']
+    print("no lost updates")
+
+if __name__ == "__main__":
+    main()
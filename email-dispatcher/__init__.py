@@ -0,0 +1,17 @@
+import azure.functions as func
+import logging
+from shared_code.email_outbox import get_email_outbox
+
+def main(timer: func.TimerRequest) -> None:
+    """
+    Drain the email outbox. Handlers kick a drain as they enqueue; this
+    timer picks up retries and anything a recycled worker left behind.
+    """
+    if timer.past_due:
+        logging.info('Email dispatcher timer is past due.')
+
+    try:
+        stats = get_email_outbox().drain()
+        logging.info(f"Email dispatcher run complete: {stats}")
+    except Exception as e:
+        logging.error(f"Email dispatcher error: {str(e)}")
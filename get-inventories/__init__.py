@@ -1,128 +1,105 @@
 import azure.functions as func
-import json
 import logging
-from shared_code.db_operations import CosmosOperator
-
-def format_inventory_response(item):
-    """Format invoice item for frontend inventory display"""
-    return {
-        "Supplier Name": item.get("Supplier Name", ""),
-        "Inventory Item Name": item.get("Inventory Item Name", ""),
-        "Inventory Unit of Measure": item.get("Inventory Unit of Measure", ""),
-        "Brand": item.get("Brand", ""),
-        "Item Name": item.get("Item Name", ""),
-        "Item Number": item.get("Item Number", ""),
-        "Quantity In a Case": item.get("Quantity In a Case", ""),
-        "Measurement Of Each Item": item.get("Measurement Of Each Item", ""),
-        "Measured In": item.get("Measured In", ""),
-        "Total Units": item.get("Total Units", ""),
-        "Case Price": item.get("Case Price", ""),
-        "Catch Weight": item.get("Catch Weight", ""),
-        "Priced By": item.get("Priced By", ""),
-        "Splitable": item.get("Splitable", ""),
-        "Split Price": item.get("Split Price", ""),
-        "Cost of a Unit": item.get("Cost of a Unit", ""),
-        "Category": item.get("Category", ""),
-        "Location": item.get("Location", ""),
-        "Active": item.get("Active", ""),
-        "timestamp": item.get("timestamp", ""),
-        "batchNumber": item.get("batchNumber", "")
-    }
+from shared_code.auth import require_auth
+from shared_code.async_db_operations import AsyncCosmosOperator
+from shared_code.inventory_format import INVENTORY_RESPONSE_FIELDS, format_inventory_response
+from shared_code.json_stream import StreamedArray
+from shared_code.projection import parse_fields
+from shared_code.responses import etag_matches, json_response, make_etag, not_modified_response
+from shared_code.serialization import get_json_body
 
+@require_auth
 async def main(req: func.HttpRequest) -> func.HttpResponse:
     try:
         try:
-            req_body = req.get_json()
+            req_body = get_json_body(req)
             email = req_body.get('email')
             print("EMAIL+++ ", email)
             logging.info(f"Processing inventory request for email: {email}")
         except ValueError:
-            return func.HttpResponse(
-                json.dumps({"error": "Please provide an email in the request body"}),
-                mimetype="application/json",
+            return json_response(
+                req,
+                {"error": "Please provide an email in the request body"},
                 status_code=400
             )
 
         if not email:
-            return func.HttpResponse(
-                json.dumps({"error": "Email is required"}),
-                mimetype="application/json",
+            return json_response(
+                req,
+                {"error": "Email is required"},
                 status_code=400
             )
 
-        db = CosmosOperator()
-        container = db.get_container("InvoicesDB", "Inventory")
-        
-        query = "SELECT * FROM c WHERE c.id = @emailParam"
-        parameters = [{"name": "@emailParam", "value": email}]
+        try:
+            fields = parse_fields(req_body.get('fields'), INVENTORY_RESPONSE_FIELDS)
+        except ValueError as e:
+            return json_response(
+                req,
+                {"error": str(e)},
+                status_code=400
+            )
+
+        db = AsyncCosmosOperator()
+        repository = db.get_inventory_repository()
+
+        if req.headers.get('If-None-Match'):
+            etag = make_etag(await repository.get_inventory_etag(email), fields)
+            if etag_matches(req, etag):
+                return not_modified_response(etag)
         
-        logging.info(f"Executing query: {query} with parameters: {parameters}")
-            
-        items = list(container.query_items(
-            query=query,
-            parameters=parameters,
-            enable_cross_partition_query=True
-        ))
-        print("items == ", items)
+        doc = await repository.get_inventory(email, fields)
         
-        logging.info(f"Found {len(items)} items in database")
+        logging.info(f"Inventory document {'found' if doc else 'not found'} ({db.last_request_charge} RU)")
         
-        if not items:
-            return func.HttpResponse(
-                json.dumps({
+        if not doc:
+            return json_response(
+                req,
+                {
                     "status": "success",
                     "inventory": [],
                     "supplier_name": None,
                     "timestamp": None,
                     "itemCount": 0
-                }),
-                mimetype="application/json",
+                },
                 status_code=200
             )
 
-        doc = items[0]
-        
         if not doc.get('items'):
-            return func.HttpResponse(
-                json.dumps({
+            return json_response(
+                req,
+                {
                     "status": "success",
                     "inventory": [],
                     "supplier_name": None,
                     "timestamp": None,
                     "itemCount": 0
-                }),
-                mimetype="application/json",
+                },
                 status_code=200
             )
 
-        formatted_items = [
-            format_inventory_response(item)
-            for item in doc.get('items', [])
-        ]
+        inventory_items = doc.get('items', [])
         
         response_data = {
             "status": "success",
-            "inventory": formatted_items,
+            "inventory": StreamedArray(
+                format_inventory_response(item, fields or INVENTORY_RESPONSE_FIELDS) for item in inventory_items
+            ),
             "supplier_name": doc.get('supplier_name'),
             "timestamp": doc.get('timestamp'),
-            "itemCount": len(formatted_items)
+            "itemCount": len(inventory_items)
         }
         
-        logging.info(f"Returning response with {len(formatted_items)} items")
+        logging.info(f"Returning response with {len(inventory_items)} items")
         
-        return func.HttpResponse(
-            json.dumps(response_data),
-            mimetype="application/json",
-            status_code=200
-        )
+        return json_response(req, response_data, etag=make_etag(doc.get('_etag'), fields))
         
     except Exception as e:
         logging.error(f"Error getting inventory: {str(e)}")
-        return func.HttpResponse(
-            json.dumps({
+        return json_response(
+            req,
+            {
                 "error": "Failed to fetch inventory",
                 "details": str(e)
-            }),
-            mimetype="application/json",
+            },
             status_code=500
         )
\ No newline at end of file
@@ -1,91 +1,255 @@
 import azure.functions as func
+import base64
+import binascii
 import json
 import logging
-from shared_code.db_operations import CosmosOperator
-
-def format_invoice_response(invoice_data):
-    """Format the invoice response with complete structure"""
-    return {
-        "Supplier Name": invoice_data.get('Supplier Name', ''),
-        "Sold to Address": invoice_data.get('Sold to Address', ''),
-        "Order Date": invoice_data.get('Order Date', ''),
-        "Ship Date": invoice_data.get('Ship Date', ''),
-        "Invoice Number": invoice_data.get('Invoice Number', ''),
-        "Shipping Address": invoice_data.get('Shipping Address', ''),
-        "Total": invoice_data.get('Total', 0),
-        "PO_NUMBER": invoice_data.get('PO_NUMBER', ''),
-        "location": invoice_data.get('location', ''),
-        "status": invoice_data.get('status', ''),
-        "Items": [format_invoice_item(item) for item in invoice_data.get('Items', [])]
-    }
+from shared_code.auth import require_auth
+from shared_code.async_db_operations import AsyncCosmosOperator
+from shared_code.json_stream import StreamedArray
+from shared_code.projection import object_projection, parse_fields
+from shared_code.responses import etag_matches, json_response, make_etag, not_modified_response
+from shared_code.serialization import get_json_body
+
+INVOICE_DEFAULTS = {
+    "Supplier Name": '',
+    "Sold to Address": '',
+    "Order Date": '',
+    "Ship Date": '',
+    "Invoice Number": '',
+    "Shipping Address": '',
+    "Total": 0,
+    "PO_NUMBER": '',
+    "location": '',
+    "status": ''
+}
+
+INVOICE_ITEM_DEFAULTS = {
+    "Item Number": '',
+    "Item Name": '',
+    "Product Category": '',
+    "Quantity In a Case": 0,
+    "Measurement Of Each Item": 0,
+    "Measured In": '',
+    "Quantity Shipped": 0,
+    "Extended Price": 0,
+    "Total Units Ordered": 0,
+    "Case Price": 0,
+    "Catch Weight": 'N/A',
+    "Priced By": 'per each',
+    "Splitable": 'NO',
+    "Split Price": 'N/A',
+    "Cost of a Unit": 0,
+    "Cost of Each Item": 0,
+    "Currency": 'USD',
+    "page_number": 1,
+    "item_index": 0
+}
+
+def format_invoice_response(invoice_data, fields=None):
+    """
+    Format the invoice response with complete structure; fields limits
+    the line item fields
+    """
+    invoice = {field: invoice_data.get(field, default) for field, default in INVOICE_DEFAULTS.items()}
+    invoice["Items"] = [format_invoice_item(item, fields) for item in invoice_data.get('Items', [])]
+    return invoice
 
-def format_invoice_item(item):
+def format_invoice_item(item, fields=None):
     """Format individual invoice items with complete structure"""
-    return {
-        "Item Number": item.get('Item Number', ''),
-        "Item Name": item.get('Item Name', ''),
-        "Product Category": item.get('Product Category', ''),
-        "Quantity In a Case": item.get('Quantity In a Case', 0),
-        "Measurement Of Each Item": item.get('Measurement Of Each Item', 0),
-        "Measured In": item.get('Measured In', ''),
-        "Quantity Shipped": item.get('Quantity Shipped', 0),
-        "Extended Price": item.get('Extended Price', 0),
-        "Total Units Ordered": item.get('Total Units Ordered', 0),
-        "Case Price": item.get('Case Price', 0),
-        "Catch Weight": item.get('Catch Weight', 'N/A'),
-        "Priced By": item.get('Priced By', 'per each'),
-        "Splitable": item.get('Splitable', 'NO'),
-        "Split Price": item.get('Split Price', 'N/A'),
-        "Cost of a Unit": item.get('Cost of a Unit', 0),
-        "Cost of Each Item": item.get('Cost of Each Item', 0),
-        "Currency": item.get('Currency', 'USD'),
-        "page_number": item.get('page_number', 1),
-        "item_index": item.get('item_index', 0)
+    return {field: item.get(field, INVOICE_ITEM_DEFAULTS[field]) for field in fields or INVOICE_ITEM_DEFAULTS}
+
+def invoice_projection(fields):
+    """
+    Cosmos select expression for an invoice (alias i) carrying only the
+    given line item fields
+    """
+    items = f"ARRAY(SELECT VALUE {object_projection('it', fields)} FROM it IN i.Items)"
+    return object_projection('i', INVOICE_DEFAULTS, extra={"Items": items})
+
+MAX_PAGE_SIZE = 100
+PAGE_FILTER_FIELDS = {
+    'supplier': 'i["Supplier Name"] = @supplier',
+    'fromDate': 'i["Order Date"] >= @fromDate',
+    'toDate': 'i["Order Date"] <= @toDate'
+}
+
+def encode_cursor(offset, filters):
+    """Encode the next page position as an opaque continuation token"""
+    payload = json.dumps({"offset": offset, "filters": filters}, sort_keys=True)
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor, filters):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        offset = int(payload['offset'])
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        raise ValueError("Invalid cursor")
+    if offset < 0 or payload.get('filters') != filters:
+        raise ValueError("Cursor does not match the requested filters")
+    return offset
+
+def parse_page_request(req_body):
+    """
+    Extract limit/cursor/filter parameters from the request body.
+    Returns None when the client did not ask for a paginated response.
+    Date filters compare "Order Date" as strings, so they expect ISO dates.
+    """
+    filters = {field: req_body[field] for field in PAGE_FILTER_FIELDS if req_body.get(field)}
+    limit = req_body.get('limit')
+    cursor = req_body.get('cursor')
+    if limit is None and cursor is None and not filters:
+        return None
+
+    try:
+        limit = int(limit) if limit is not None else MAX_PAGE_SIZE
+    except (TypeError, ValueError):
+        raise ValueError("limit must be an integer")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+    offset = decode_cursor(cursor, filters) if cursor else 0
+    return {"limit": limit, "offset": offset, "filters": filters}
+
+def build_invoice_page_query(document_id, email, page_request, fields=None):
+    """
+    Build a query that slices c.invoices of one document server side,
+    fetching one extra invoice to tell whether another page exists. Without
+    a page request every invoice is returned; with fields only those line
+    item fields are selected.
+    """
+    conditions = ["c.id = @id", "c.userId = @email"]
+    parameters = [{"name": "@id", "value": document_id}, {"name": "@email", "value": email}]
+    for field, value in (page_request['filters'] if page_request else {}).items():
+        conditions.append(PAGE_FILTER_FIELDS[field])
+        parameters.append({"name": f"@{field}", "value": value})
+
+    select = invoice_projection(fields) if fields else "i"
+    query = f"SELECT VALUE {select} FROM c JOIN i IN c.invoices WHERE {' AND '.join(conditions)}"
+    if page_request:
+        query += f" OFFSET {page_request['offset']} LIMIT {page_request['limit'] + 1}"
+    return query, parameters
+
+def page_etag(document_etag, page_request, fields=None):
+    page = None
+    if page_request:
+        page = (page_request['offset'], page_request['limit'], sorted(page_request['filters'].items()))
+    return make_etag(document_etag, page, fields)
+
+async def locate_invoice_document(db, container, email):
+    """
+    Find the user's invoice document without reading it: by id in the email
+    partition first, then by userId across partitions, since not every
+    invoice document is keyed by email
+    Returns:
+        (id, partition_key, _etag), with partition_key None when the document
+        was only found across partitions, or None if the user has no invoices
+    """
+    etag = await db.read_etag(container, email)
+    if etag is not None:
+        return email, email, etag
+    matches = await db.query_items(
+        container,
+        "SELECT c.id, c._etag FROM c WHERE c.userId = @email",
+        [{"name": "@email", "value": email}]
+    )
+    if not matches:
+        return None
+    return matches[0]['id'], None, matches[0].get('_etag')
+
+async def get_invoice_page(db, container, email, document, page_request, fields=None):
+    invoices = []
+    if document:
+        document_id, partition_key, _ = document
+        query, parameters = build_invoice_page_query(document_id, email, page_request, fields)
+        invoices = await db.query_items(container, query, parameters, partition_key=partition_key)
+
+    payload = {
+        "status": "success",
+        "data": {
+            "id": document[0] if document else email,
+            "userId": email
+        }
     }
+    if page_request:
+        limit = page_request['limit']
+        continuation_token = None
+        if len(invoices) > limit:
+            invoices = invoices[:limit]
+            continuation_token = encode_cursor(page_request['offset'] + limit, page_request['filters'])
+        payload["continuationToken"] = continuation_token
+
+    payload["data"]["invoices"] = StreamedArray(format_invoice_response(invoice, fields) for invoice in invoices)
+    return payload
 
+@require_auth
 async def main(req: func.HttpRequest) -> func.HttpResponse:
     try:
         try:
-            req_body = req.get_json()
+            req_body = get_json_body(req)
             email = req_body.get('email')
             print("email = ", email)
         except ValueError:
-            return func.HttpResponse(
-                json.dumps({"error": "Please provide an email in the request body"}),
-                mimetype="application/json",
+            return json_response(
+                req,
+                {"error": "Please provide an email in the request body"},
                 status_code=400
             )
 
         if not email:
-            return func.HttpResponse(
-                json.dumps({"error": "Email is required"}),
-                mimetype="application/json",
+            return json_response(
+                req,
+                {"error": "Email is required"},
                 status_code=400
             )
 
-        db = CosmosOperator()
+        try:
+            page_request = parse_page_request(req_body)
+            fields = parse_fields(req_body.get('fields'), INVOICE_ITEM_DEFAULTS)
+        except ValueError as e:
+            return json_response(
+                req,
+                {"error": str(e)},
+                status_code=400
+            )
+
+        db = AsyncCosmosOperator()
         container = db.get_container("InvoicesDB", "Invoices")
         
-        query = "SELECT * FROM c WHERE c.userId = @email"
-        parameters = [{"name": "@email", "value": email}]
+        if page_request or fields:
+            # read the version before the page so a page is never labelled newer than it is
+            document = await locate_invoice_document(db, container, email)
+            etag = page_etag(document[2] if document else None, page_request, fields)
+            if etag_matches(req, etag):
+                return not_modified_response(etag)
+            page = await get_invoice_page(db, container, email, document, page_request, fields)
+            return json_response(req, page, etag=etag)
+
+        if req.headers.get('If-None-Match'):
+            document = await locate_invoice_document(db, container, email)
+            etag = make_etag(document[2] if document else None)
+            if etag_matches(req, etag):
+                return not_modified_response(etag)
+        
+        user_doc = await db.read_item_cached(container, email)
+        if user_doc:
+            items = [user_doc]
+        else:
+            query = "SELECT * FROM c WHERE c.userId = @email"
+            parameters = [{"name": "@email", "value": email}]
             
-        items = list(container.query_items(
-            query=query,
-            parameters=parameters,
-            enable_cross_partition_query=True
-        ))
+            items = await db.query_items(container, query, parameters)
         
         if not items:
-            return func.HttpResponse(
-                json.dumps({
+            return json_response(
+                req,
+                {
                     "status": "success",
                     "data": {
                         "id": email,
                         "userId": email,
                         "invoices": []
                     }
-                }),
-                mimetype="application/json",
+                },
                 status_code=200
             )
         
@@ -93,25 +257,21 @@ async def main(req: func.HttpRequest) -> func.HttpResponse:
         formatted_response = {
             "id": user_doc.get('id', email),
             "userId": user_doc.get('userId', email),
-            "invoices": [format_invoice_response(invoice) for invoice in user_doc.get('invoices', [])]
+            "invoices": StreamedArray(format_invoice_response(invoice) for invoice in user_doc.get('invoices', []))
         }
         
-        return func.HttpResponse(
-            json.dumps({
-                "status": "success",
-                "data": formatted_response
-            }),
-            mimetype="application/json",
-            status_code=200
-        )
+        return json_response(req, {
+            "status": "success",
+            "data": formatted_response
+        }, etag=make_etag(user_doc.get('_etag')))
         
     except Exception as e:
         logging.error(f"Error getting invoices: {str(e)}")
-        return func.HttpResponse(
-            json.dumps({
+        return json_response(
+            req,
+            {
                 "error": "Failed to fetch invoices",
                 "details": str(e)
-            }),
-            mimetype="application/json",
+            },
             status_code=500
         )
\ No newline at end of file
@@ -1,7 +1,9 @@
 import azure.functions as func
-import json
 import logging
-from shared_code.db_operations import CosmosOperator
+from shared_code.auth import require_auth
+from shared_code.async_db_operations import AsyncCosmosOperator
+from shared_code.responses import etag_matches, json_response, make_etag, not_modified_response
+from shared_code.serialization import get_json_body
 
 def format_recipe_response(recipe):
    recipe_data = recipe['data']
@@ -14,45 +16,45 @@ def format_recipe_response(recipe):
        'total_cost': recipe_data['total_cost'],
    }
 
+@require_auth
 async def main(req: func.HttpRequest) -> func.HttpResponse:
    try:
        try:
-           req_body = req.get_json()
+           req_body = get_json_body(req)
            email = req_body.get('email')
            logging.info(f"Processing recipes request for email: {email}")
        except ValueError:
-           return func.HttpResponse(
-               json.dumps({"error": "Please provide an email in the request body"}),
-               mimetype="application/json",
+           return json_response(
+               req,
+               {"error": "Please provide an email in the request body"},
                status_code=400
            )
 
        if not email:
-           return func.HttpResponse(
-               json.dumps({"error": "Email is required"}),
-               mimetype="application/json",
+           return json_response(
+               req,
+               {"error": "Email is required"},
                status_code=400
            )
 
-       db = CosmosOperator()
+       db = AsyncCosmosOperator()
        container = db.get_container("InvoicesDB", "Menu")
+
+       if req.headers.get('If-None-Match'):
+           etag = make_etag(await db.read_etag(container, email))
+           if etag_matches(req, etag):
+               return not_modified_response(etag)
        
-       query = "SELECT * FROM c WHERE c.id = @email"
-       parameters = [{"name": "@email", "value": email}]
-           
-       items = list(container.query_items(
-           query=query,
-           parameters=parameters,
-           enable_cross_partition_query=True
-       ))
+       doc = await db.read_item_cached(container, email)
+       items = [doc] if doc else []
        
        if not items:
-           return func.HttpResponse(
-               json.dumps({
+           return json_response(
+               req,
+               {
                    "status": "success",
                    "menus": []
-               }),
-               mimetype="application/json",
+               },
                status_code=200
            )
     
@@ -65,22 +67,23 @@ async def main(req: func.HttpRequest) -> func.HttpResponse:
                         logging.info(f"Processing recipe: {recipe.get('data', {}).get('recipe_name')}")
                         menus.append(format_recipe_response(recipe))
        
-       return func.HttpResponse(
-           json.dumps({
+       return json_response(
+           req,
+           {
                "status": "success", 
                "menus": menus
-           }),
-           mimetype="application/json",
-           status_code=200
+           },
+           status_code=200,
+           etag=make_etag(doc['_etag'])
        )
        
    except Exception as e:
        logging.error(f"Error getting recipes: {str(e)}")
-       return func.HttpResponse(
-           json.dumps({
+       return json_response(
+           req,
+           {
                "error": "Failed to fetch recipes",
                "details": str(e)
-           }),
-           mimetype="application/json",
+           },
            status_code=500
        )
\ No newline at end of file
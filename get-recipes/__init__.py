@@ -1,47 +1,52 @@
 import azure.functions as func
-import json
+import asyncio
 import logging
-from shared_code.db_operations import CosmosOperator
+from shared_code.auth import require_auth
+from shared_code.async_db_operations import AsyncCosmosOperator
+from shared_code.json_stream import StreamedArray
+from shared_code.projection import parse_fields
+from shared_code.responses import etag_matches, json_response, make_etag, not_modified_response
+from shared_code.serialization import get_json_body
 
-def get_inventory_item(container, email, ingredient_name):
-    query = """
-    SELECT * FROM c 
-    WHERE c.id = @email 
-    AND ARRAY_LENGTH(c.items) > 0
+INVENTORY_DATA_FIELDS = (
+    'Supplier Name',
+    'Inventory Unit of Measure',
+    'Item Name',
+    'Item Number',
+    'Inventory Item Name',
+    'Quantity In a Case',
+    'Measurement Of Each Item',
+    'Measured In',
+    'Priced By',
+    'Location'
+)
+
+def inventory_lookup_fields(fields):
+    """Inventory fields to read: the requested ones plus the name recipes are matched on"""
+    return list(dict.fromkeys(['Inventory Item Name', *fields]))
+
+def build_inventory_index(inventory_items, fields=INVENTORY_DATA_FIELDS):
     """
-    parameters = [{"name": "@email", "value": email}]
-    
-    items = list(container.query_items(
-        query=query,
-        parameters=parameters,
-        enable_cross_partition_query=True
-    ))
-    
-    if items:
-        inventory_items = items[0].get('items', [])
-        for item in inventory_items:
-            if item.get('Inventory Item Name', '').lower() == ingredient_name.lower():
-                return {
-                    'Supplier Name': item.get('Supplier Name'),
-                    'Inventory Unit of Measure': item.get('Inventory Unit of Measure'),
-                    'Item Name': item.get('Item Name'),
-                    'Item Number': item.get('Item Number'),
-                    'Inventory Item Name': item.get('Inventory Item Name'),
-                    'Quantity In a Case': item.get('Quantity In a Case'),
-                    'Measurement Of Each Item': item.get('Measurement Of Each Item'),
-                    'Measured In': item.get('Measured In'),
-                    'Priced By': item.get('Priced By'),
-                    'Location': item.get('Location')
-                }
-    return None
+    Build a case-insensitive ingredient name -> inventory data index in one pass.
+    The first item with a given name wins, matching the previous linear scan.
+    """
+    index = {}
+    for item in inventory_items:
+        name = (item.get('Inventory Item Name') or '').lower()
+        if name not in index:
+            index[name] = {field: item.get(field) for field in fields}
+    return index
+
+def get_inventory_item(inventory_index, ingredient_name):
+    return inventory_index.get((ingredient_name or '').lower())
 
-def format_recipe_response(recipe, inventory_container, email):
+def format_recipe_response(recipe, inventory_index):
     recipe_data = recipe['data']
     total_recipe_cost = 0
     
     enhanced_ingredients = []
     for ingredient in recipe_data['ingredients']:
-        inventory_item = get_inventory_item(inventory_container, email, ingredient.get('ingredient', ''))
+        inventory_item = get_inventory_item(inventory_index, ingredient.get('ingredient', ''))
 
         ingredient_cost = ingredient.get('total_cost', 0)
         total_recipe_cost += ingredient_cost
@@ -52,7 +57,6 @@ def format_recipe_response(recipe, inventory_container, email):
         }
         
         enhanced_ingredients.append(enhanced_ingredient)
-    print("enhanced_ingredients ==== ", enhanced_ingredients)
     return {
         'Recipe Name': recipe_data['recipe_name'],
         'Yields': recipe_data['total_yield'],
@@ -62,74 +66,90 @@ def format_recipe_response(recipe, inventory_container, email):
         'total_recipe_cost': total_recipe_cost,
     }
 
+def iter_recipes(items, email, inventory_index):
+    recipe_key = f'inventory-items-{email}'
+    for item in items:
+        if recipe_key in item.get('recipes', {}):
+            for recipe in item['recipes'][recipe_key]:
+                if recipe.get('data', {}).get('Type') == "Recipe":
+                    logging.info(f"Processing recipe: {recipe.get('data', {}).get('recipe_name')}")
+                    yield format_recipe_response(recipe, inventory_index)
+
+def recipes_etag(recipes_etag, inventory_etag, fields=None):
+    """Recipes are enriched from the inventory, so both versions shape the body"""
+    return make_etag(recipes_etag, inventory_etag, fields)
+
+@require_auth
 async def main(req: func.HttpRequest) -> func.HttpResponse:
     try:
         try:
-            req_body = req.get_json()
+            req_body = get_json_body(req)
             email = req_body.get('email')
             logging.info(f"Processing recipes request for email: {email}")
         except ValueError:
-            return func.HttpResponse(
-                json.dumps({"error": "Please provide an email in the request body"}),
-                mimetype="application/json",
+            return json_response(
+                req,
+                {"error": "Please provide an email in the request body"},
                 status_code=400
             )
             
         if not email:
-            return func.HttpResponse(
-                json.dumps({"error": "Email is required"}),
-                mimetype="application/json",
+            return json_response(
+                req,
+                {"error": "Email is required"},
                 status_code=400
             )
 
-        db = CosmosOperator()
+        try:
+            fields = parse_fields(req_body.get('fields'), INVENTORY_DATA_FIELDS)
+        except ValueError as e:
+            return json_response(
+                req,
+                {"error": str(e)},
+                status_code=400
+            )
+
+        db = AsyncCosmosOperator()
         recipes_container = db.get_container("InvoicesDB", "Recipes")
-        inventory_container = db.get_container("InvoicesDB", "Inventory")
+        repository = db.get_inventory_repository()
+
+        if req.headers.get('If-None-Match'):
+            etag = recipes_etag(*await asyncio.gather(
+                db.read_etag(recipes_container, email),
+                repository.get_inventory_etag(email)
+            ), fields)
+            if etag_matches(req, etag):
+                return not_modified_response(etag)
         
-        query = "SELECT * FROM c WHERE c.id = @email"
-        parameters = [{"name": "@email", "value": email}]
-            
-        items = list(recipes_container.query_items(
-            query=query,
-            parameters=parameters,
-            enable_cross_partition_query=True
-        ))
+        doc = await db.read_item_cached(recipes_container, email)
+        items = [doc] if doc else []
         
         if not items:
-            return func.HttpResponse(
-                json.dumps({
+            return json_response(
+                req,
+                {
                     "status": "success",
                     "recipes": []
-                }),
-                mimetype="application/json",
+                },
                 status_code=200
             )
         
-        recipes = []
-        for item in items:
-            recipe_key = f'inventory-items-{email}'
-            if recipe_key in item.get('recipes', {}):
-                for recipe in item['recipes'][recipe_key]:
-                    if recipe.get('data', {}).get('Type') == "Recipe":
-                        logging.info(f"Processing recipe: {recipe.get('data', {}).get('recipe_name')}")
-                        recipes.append(format_recipe_response(recipe, inventory_container, email))
-                        
-        return func.HttpResponse(
-            json.dumps({
-                "status": "success", 
-                "recipes": recipes
-            }),
-            mimetype="application/json",
-            status_code=200
-        )
+        inventory_doc = await repository.get_inventory(email, inventory_lookup_fields(fields) if fields else None)
+        inventory_items = inventory_doc.get('items', []) if inventory_doc else []
+        inventory_index = build_inventory_index(inventory_items, fields or INVENTORY_DATA_FIELDS)
+        
+        return json_response(req, {
+            "status": "success", 
+            "recipes": StreamedArray(iter_recipes(items, email, inventory_index))
+        }, etag=recipes_etag(doc.get('_etag'), inventory_doc.get('_etag') if inventory_doc else None, fields))
         
     except Exception as e:
         logging.error(f"Error getting recipes: {str(e)}")
-        return func.HttpResponse(
-            json.dumps({
+        return json_response(
+            req,
+            {
                 "error": "Failed to fetch recipes",
                 "details": str(e)
-            }),
-            mimetype="application/json",
+            },
             status_code=500
         )
\ No newline at end of file
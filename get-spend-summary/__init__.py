@@ -0,0 +1,109 @@
+import azure.functions as func
+import logging
+import re
+from shared_code.auth import require_auth
+from shared_code.async_db_operations import AsyncCosmosOperator
+from shared_code.responses import etag_matches, json_response, make_etag, not_modified_response
+from shared_code.serialization import get_json_body
+from shared_code.spend_analytics import GROUP_DIMENSIONS, spend_columns
+
+MONTH_PATTERN = re.compile(r"^\d{4}-\d{2}$")
+
+def parse_summary_request(req_body):
+    """
+    groupBy: any of supplier, category, month (a list or comma-separated,
+    default supplier); fromMonth/toMonth: inclusive YYYY-MM bounds
+    """
+    group_by = req_body.get('groupBy') or ['supplier']
+    if isinstance(group_by, str):
+        group_by = [name.strip() for name in group_by.split(',') if name.strip()]
+    if not isinstance(group_by, list) or not group_by or any(name not in GROUP_DIMENSIONS for name in group_by):
+        raise ValueError(f"groupBy must list one or more of {', '.join(GROUP_DIMENSIONS)}")
+    group_by = list(dict.fromkeys(group_by))
+
+    months = {}
+    for field in ('fromMonth', 'toMonth'):
+        value = req_body.get(field)
+        if value is not None and not (isinstance(value, str) and MONTH_PATTERN.match(value)):
+            raise ValueError(f"{field} must be formatted YYYY-MM")
+        months[field] = value
+    return group_by, months['fromMonth'], months['toMonth']
+
+async def load_columns(db, container, email):
+    """
+    The user's line item columns, rebuilt only when the invoice document's _etag has moved
+    """
+    columns = spend_columns.get(email, await db.read_etag(container, email))
+    if columns is None:
+        doc = await db.read_item_cached(container, email)
+        if doc is None:
+            return None
+        columns = spend_columns.build(email, doc)
+    return columns
+
+@require_auth
+async def main(req: func.HttpRequest) -> func.HttpResponse:
+    try:
+        try:
+            req_body = get_json_body(req)
+            email = req_body.get('email')
+            logging.info(f"Processing spend summary request for email: {email}")
+        except ValueError:
+            return json_response(
+                req,
+                {"error": "Please provide an email in the request body"},
+                status_code=400
+            )
+
+        if not email:
+            return json_response(
+                req,
+                {"error": "Email is required"},
+                status_code=400
+            )
+
+        try:
+            group_by, from_month, to_month = parse_summary_request(req_body)
+        except ValueError as e:
+            return json_response(
+                req,
+                {"error": str(e)},
+                status_code=400
+            )
+
+        db = AsyncCosmosOperator()
+        container = db.get_container("InvoicesDB", "Invoices")
+        columns = await load_columns(db, container, email)
+        if columns is None:
+            return json_response(
+                req,
+                {
+                    "status": "success",
+                    "groupBy": group_by,
+                    "rows": [],
+                    "totals": {"total": 0, "count": 0, "average": 0, "skipped": 0}
+                },
+                status_code=200
+            )
+
+        etag = make_etag(columns.etag, group_by, from_month, to_month) if columns.etag else None
+        if etag_matches(req, etag):
+            return not_modified_response(etag)
+
+        summary = columns.rollup(group_by, from_month, to_month)
+        return json_response(req, {
+            "status": "success",
+            "groupBy": group_by,
+            **summary
+        }, etag=etag)
+
+    except Exception as e:
+        logging.error(f"Error building spend summary: {str(e)}")
+        return json_response(
+            req,
+            {
+                "error": "Failed to build spend summary",
+                "details": str(e)
+            },
+            status_code=500
+        )
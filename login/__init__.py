@@ -1,81 +1,95 @@
 import azure.functions as func
 import logging
-import os
-import json
-import bcrypt
-import jwt
-from datetime import datetime, timedelta
+from datetime import datetime
+from shared_code.auth import issue_access_token
 from shared_code.db_operations import CosmosOperator
+from shared_code.password_hasher import HasherSaturatedError, RETRY_AFTER_SECONDS, get_password_hasher
+from shared_code.rate_limiter import rate_limited
+from shared_code.refresh_tokens import issue_refresh_token
+from shared_code.responses import json_response
+from shared_code.serialization import get_json_body
 
-JWT_SECRET = os.environ['JWT_SECRET']
-REGULAR_TOKEN_EXPIRY = timedelta(hours=24)
-REMEMBER_ME_EXPIRY = timedelta(days=30)
-
-def generate_token(user_id, remember_me=False):
-   expiry = datetime.utcnow() + (REMEMBER_ME_EXPIRY if remember_me else REGULAR_TOKEN_EXPIRY)
-   return jwt.encode({
-       'user_id': user_id,
-       'exp': expiry,
-       'iat': datetime.utcnow()
-   }, JWT_SECRET, algorithm='HS256')
-
+@rate_limited("login")
 def main(req: func.HttpRequest) -> func.HttpResponse:
    logging.info('Processing login request.')
    
    try:
-       req_body = req.get_json()
+       try:
+           req_body = get_json_body(req)
+       except ValueError:
+           req_body = None
+       if not isinstance(req_body, dict):
+           return json_response(
+               req,
+               {"error": {"message": "Request body must be a JSON object"}},
+               status_code=400
+           )
        email = req_body.get('email')
        password = req_body.get('password')
        remember_me = req_body.get('remember_me', False)
        
        if not email or not password:
-           return func.HttpResponse(
-               json.dumps({"error": {"message": "Email and password are required"}}),
-               status_code=400,
-               mimetype="application/json"
+           return json_response(
+               req,
+               {"error": {"message": "Email and password are required"}},
+               status_code=400
            )
 
        db = CosmosOperator()
        user = db.get_user_by_email(email)
 
        if not user:
-           return func.HttpResponse(
-               json.dumps({"error": {"message": "Invalid email or password"}}),
-               status_code=401,
-               mimetype="application/json"
+           return json_response(
+               req,
+               {"error": {"message": "Invalid email or password"}},
+               status_code=401
            )
 
+       hasher = get_password_hasher()
        stored_password = user.get('passwordHash')
-       if not stored_password or not bcrypt.checkpw(password.encode('utf-8'), stored_password.encode('utf-8')):
-           return func.HttpResponse(
-               json.dumps({"error": {"message": "Invalid email or password"}}),
-               status_code=401,
-               mimetype="application/json"
+       try:
+           if not hasher.verify_password(password, stored_password):
+               return json_response(
+                   req,
+                   {"error": {"message": "Invalid email or password"}},
+                   status_code=401
+               )
+           new_hash = hasher.rehash_if_needed(password, stored_password)
+       except HasherSaturatedError:
+           return json_response(
+               req,
+               {"error": {"message": "Too many login attempts in progress, please retry"}},
+               status_code=503,
+               headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
            )
 
-       token = generate_token(user['id'], remember_me)
+       token = issue_access_token(user['id'], remember_me)
 
-       user['lastLogin'] = datetime.utcnow().isoformat()
+       # the refresh family, lastLogin and any rehash go out as one patch
+       fields = {"lastLogin": datetime.utcnow().isoformat()}
+       if new_hash:
+           fields["passwordHash"] = new_hash
        container = db.get_culvana_container("users")
-       container.upsert_item(user)
+       refresh_token = issue_refresh_token(db, container, user, fields)
 
-       return func.HttpResponse(
-           json.dumps({
+       return json_response(
+           req,
+           {
                "status": "success",
                "message": "Login successful",
                "token": token,
+               "refreshToken": refresh_token,
                "user": {
                    "email": user['email'],
                    "verified": user['verified']
                }
-           }),
-           status_code=200,
-           mimetype="application/json"
+           },
+           status_code=200
        )
    except Exception as e:
        logging.error(f"Login error: {str(e)}")
-       return func.HttpResponse(
-           json.dumps({"error": {"message": "An unexpected error occurred"}}),
-           status_code=500,
-           mimetype="application/json"
+       return json_response(
+           req,
+           {"error": {"message": "An unexpected error occurred"}},
+           status_code=500
        )
\ No newline at end of file
@@ -0,0 +1,69 @@
+import azure.functions as func
+import logging
+from shared_code.auth import AuthenticationError, issue_access_token
+from shared_code.db_operations import CosmosOperator, ConcurrencyConflictError
+from shared_code.rate_limiter import rate_limited
+from shared_code.refresh_tokens import rotate_refresh_token
+from shared_code.responses import json_response
+from shared_code.serialization import get_json_body
+
+@rate_limited("refresh")
+def main(req: func.HttpRequest) -> func.HttpResponse:
+    logging.info('Processing token refresh request.')
+
+    try:
+        try:
+            req_body = get_json_body(req)
+        except ValueError:
+            req_body = None
+        if not isinstance(req_body, dict):
+            return json_response(
+                req,
+                {"error": {"message": "Request body must be a JSON object"}},
+                status_code=400
+            )
+        refresh_token = req_body.get('refreshToken')
+
+        if not refresh_token:
+            return json_response(
+                req,
+                {"error": {"message": "Refresh token is required"}},
+                status_code=400
+            )
+
+        db = CosmosOperator()
+        container = db.get_culvana_container("users")
+
+        try:
+            user, new_refresh_token = rotate_refresh_token(db, container, refresh_token)
+        except AuthenticationError as e:
+            return json_response(
+                req,
+                {"error": {"message": str(e)}},
+                status_code=401
+            )
+
+        return json_response(
+            req,
+            {
+                "status": "success",
+                "token": issue_access_token(user['id']),
+                "refreshToken": new_refresh_token
+            },
+            status_code=200
+        )
+
+    except ConcurrencyConflictError as e:
+        logging.error(f"Token refresh conflict: {str(e)}")
+        return json_response(
+            req,
+            {"error": {"message": "Refresh token is being used concurrently, please retry"}},
+            status_code=409
+        )
+    except Exception as e:
+        logging.error(f"Token refresh error: {str(e)}")
+        return json_response(
+            req,
+            {"error": {"message": "An unexpected error occurred"}},
+            status_code=500
+        )
@@ -1,45 +1,103 @@
 import azure.functions as func
 import logging
-import json
-from shared_code.email_service import EmailService
+from shared_code.email_outbox import enqueue_otp_email
 from shared_code.db_operations import CosmosOperator
 from shared_code.otp_utils import generate_otp, create_otp_hash
+from shared_code.rate_limiter import rate_limited
+from shared_code.registration_tokens import (
+   AttemptLedger,
+   InvalidRegistrationToken,
+   LEDGER_CONSUMED,
+   LEDGER_LOCKED,
+   open_registration_token,
+   reseal_registration_token
+)
+from shared_code.responses import json_response
+from shared_code.serialization import get_json_body
 from datetime import datetime, timedelta
 
+def resend_with_token(req, registration_token, email):
+   """
+   Token mode: reseal the registration with a fresh code and record the new
+   token in the attempt ledger, which retires the earlier ones
+   """
+   try:
+       registration = open_registration_token(registration_token)
+   except InvalidRegistrationToken as e:
+       return json_response(
+           req,
+           {"error": {"message": str(e)}},
+           status_code=400
+       )
+
+   if registration['e'].lower() != email.lower():
+       return json_response(
+           req,
+           {"error": {"message": "Registration token does not match email"}},
+           status_code=400
+       )
+
+   otp = generate_otp()
+   new_token, resealed = reseal_registration_token(registration, otp)
+   db = CosmosOperator()
+   ledger = AttemptLedger(db, db.get_culvana_container("registration_attempts"))
+   outcome = ledger.reseal(resealed)
+   if outcome == LEDGER_CONSUMED:
+       return json_response(
+           req,
+           {"error": {"message": "Registration has already been verified"}},
+           status_code=400
+       )
+   if outcome == LEDGER_LOCKED:
+       return json_response(
+           req,
+           {"error": {"message": "Too many failed attempts, please sign up again"}},
+           status_code=400
+       )
+   enqueue_otp_email(registration['e'], otp)
+
+   return json_response(
+       req,
+       {
+           "status": "success",
+           "message": "New verification code sent successfully",
+           "email": email,
+           "registrationToken": new_token
+       },
+       status_code=200
+   )
+
+@rate_limited("resend_otp")
 def main(req: func.HttpRequest) -> func.HttpResponse:
    logging.info('Processing resend OTP request.')
    
    try:
-       req_body = req.get_json()
+       req_body = get_json_body(req)
        email = req_body.get('email')
        
        if not email:
-           return func.HttpResponse(
-               json.dumps({"error": {"message": "Email is required"}}),
-               status_code=400,
-               mimetype="application/json"
+           return json_response(
+               req,
+               {"error": {"message": "Email is required"}},
+               status_code=400
            )
 
+       registration_token = req_body.get('registrationToken')
+       if registration_token:
+           return resend_with_token(req, registration_token, email)
+
        db = CosmosOperator()
        
        temp_container = db.get_culvana_container("temp_registrations")
-       query = "SELECT * FROM c WHERE c.email = @email"
-       parameters = [{"name": "@email", "value": email}]
-       
-       items = list(temp_container.query_items(
-           query=query,
-           parameters=parameters,
-           enable_cross_partition_query=True
-       ))
+       registration = db.read_item(temp_container, email)
        
-       if not items:
-           return func.HttpResponse(
-               json.dumps({"error": {"message": "No pending registration found"}}),
-               status_code=404,
-               mimetype="application/json"
+       if not registration:
+           return json_response(
+               req,
+               {"error": {"message": "No pending registration found"}},
+               status_code=404
            )
 
-       registration = items[0]
 
        otp = generate_otp()
        otp_hash = create_otp_hash(otp)
@@ -53,28 +111,30 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
        
        temp_container.upsert_item(registration)
 
-       email_service = EmailService()
-       if not email_service.send_otp_email(email, otp):
-           return func.HttpResponse(
-               json.dumps({"error": {"message": "Failed to send verification code"}}),
-               status_code=500,
-               mimetype="application/json"
+       try:
+           enqueue_otp_email(email, otp)
+       except Exception as e:
+           logging.error(f"Failed to queue verification code: {str(e)}")
+           return json_response(
+               req,
+               {"error": {"message": "Failed to send verification code"}},
+               status_code=500
            )
 
-       return func.HttpResponse(
-           json.dumps({
+       return json_response(
+           req,
+           {
                "status": "success",
                "message": "New verification code sent successfully",
                "email": email
-           }),
-           status_code=200,
-           mimetype="application/json"
+           },
+           status_code=200
        )
 
    except Exception as e:
        logging.error(f"Resend OTP error: {str(e)}")
-       return func.HttpResponse(
-           json.dumps({"error": {"message": "An unexpected error occurred"}}),
-           status_code=500,
-           mimetype="application/json"
+       return json_response(
+           req,
+           {"error": {"message": "An unexpected error occurred"}},
+           status_code=500
        )
\ No newline at end of file
@@ -0,0 +1,157 @@
+import azure.functions as func
+import logging
+from shared_code.auth import require_auth
+from shared_code.async_db_operations import AsyncCosmosOperator
+from shared_code.inventory_format import INVENTORY_RESPONSE_FIELDS, format_inventory_response
+from shared_code.inventory_index import SORT_FIELDS, inventory_indexes
+from shared_code.projection import parse_fields
+from shared_code.responses import etag_matches, json_response, make_etag, not_modified_response
+from shared_code.serialization import get_json_body
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+FACET_FILTERS = ('category', 'supplier', 'location')
+
+def parse_search_request(req_body):
+    """
+    Validate the search parameters: category/supplier/location (a value or
+    a list of values, case-insensitive), active, prefix (of the item name),
+    sort, order, limit and offset
+    """
+    filters = {}
+    for facet in FACET_FILTERS:
+        value = req_body.get(facet)
+        if value in (None, '', []):
+            continue
+        values = value if isinstance(value, list) else [value]
+        if not all(isinstance(v, str) for v in values):
+            raise ValueError(f"{facet} must be a string or a list of strings")
+        filters[facet] = values
+
+    active = req_body.get('active')
+    if active is not None and not isinstance(active, bool):
+        raise ValueError("active must be true or false")
+
+    prefix = req_body.get('prefix')
+    if prefix is not None and not isinstance(prefix, str):
+        raise ValueError("prefix must be a string")
+
+    sort = req_body.get('sort')
+    if sort is not None and sort not in SORT_FIELDS:
+        raise ValueError(f"sort must be one of {', '.join(SORT_FIELDS)}")
+    order = req_body.get('order', 'asc')
+    if order not in ('asc', 'desc'):
+        raise ValueError("order must be asc or desc")
+
+    try:
+        limit = int(req_body.get('limit', DEFAULT_PAGE_SIZE))
+        offset = int(req_body.get('offset', 0))
+    except (TypeError, ValueError):
+        raise ValueError("limit and offset must be integers")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    if offset < 0:
+        raise ValueError("offset must not be negative")
+
+    return {
+        "filters": filters,
+        "active": active,
+        "prefix": prefix or None,
+        "sort": sort,
+        "descending": order == 'desc',
+        "limit": limit,
+        "offset": offset
+    }
+
+async def load_index(repository, email):
+    """
+    The user's InventoryIndex, rebuilt only when the inventory's _etag has moved
+    """
+    index = inventory_indexes.get(email, await repository.get_inventory_etag(email))
+    if index is None:
+        doc = await repository.get_inventory(email)
+        if doc is None:
+            return None
+        index = inventory_indexes.build(email, doc)
+    return index
+
+@require_auth
+async def main(req: func.HttpRequest) -> func.HttpResponse:
+    try:
+        try:
+            req_body = get_json_body(req)
+            email = req_body.get('email')
+            logging.info(f"Processing inventory search for email: {email}")
+        except ValueError:
+            return json_response(
+                req,
+                {"error": "Please provide an email in the request body"},
+                status_code=400
+            )
+
+        if not email:
+            return json_response(
+                req,
+                {"error": "Email is required"},
+                status_code=400
+            )
+
+        try:
+            search = parse_search_request(req_body)
+            fields = parse_fields(req_body.get('fields'), INVENTORY_RESPONSE_FIELDS)
+        except ValueError as e:
+            return json_response(
+                req,
+                {"error": str(e)},
+                status_code=400
+            )
+
+        db = AsyncCosmosOperator()
+        repository = db.get_inventory_repository()
+        index = await load_index(repository, email)
+        if index is None:
+            return json_response(
+                req,
+                {
+                    "status": "success",
+                    "inventory": [],
+                    "total": 0,
+                    "nextOffset": None
+                },
+                status_code=200
+            )
+
+        etag = make_etag(index.etag, sorted(search.items()), fields) if index.etag else None
+        if etag_matches(req, etag):
+            return not_modified_response(etag)
+
+        matches = index.search(
+            search['filters'],
+            active=search['active'],
+            prefix=search['prefix'],
+            sort=search['sort'],
+            descending=search['descending']
+        )
+        offset, limit = search['offset'], search['limit']
+        page = matches[offset:offset + limit]
+
+        return json_response(req, {
+            "status": "success",
+            "inventory": [
+                format_inventory_response(index.items[position], fields or INVENTORY_RESPONSE_FIELDS)
+                for position in page
+            ],
+            "total": len(matches),
+            "nextOffset": offset + limit if offset + limit < len(matches) else None
+        }, etag=etag)
+
+    except Exception as e:
+        logging.error(f"Error searching inventory: {str(e)}")
+        return json_response(
+            req,
+            {
+                "error": "Failed to search inventory",
+                "details": str(e)
+            },
+            status_code=500
+        )
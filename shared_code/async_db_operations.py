@@ -0,0 +1,355 @@
+from azure.cosmos.aio import CosmosClient
+from azure.cosmos.exceptions import CosmosResourceNotFoundError
+import asyncio
+import logging
+from shared_code.db_operations import (
+    MAX_WRITE_ATTEMPTS,
+    WRITE_CONFLICT_ERRORS,
+    ClientPool,
+    cached_read_plan,
+    conflict_delay,
+    conflict_error,
+    get_request_charge,
+    if_modified,
+    if_not_modified,
+    plan_changes,
+    settle_revalidation,
+    start_draft
+)
+from shared_code.document_cache import document_cache
+from shared_code.inventory_repository import InventoryRepository
+
+_pool = ClientPool(CosmosClient.from_connection_string)
+_setup_lock = None
+_ready_client = None
+
+def get_async_cosmos_client():
+    """
+    Return the process-wide async CosmosClient, creating it on first use.
+    Creation does not await, so the lock is never held across a suspension point.
+    """
+    return _pool.get_client()
+
+async def setup_async_client(client):
+    """
+    Run the client's one-time setup (account endpoints and session
+    consistency, what `async with client` would do) before its first
+    request. Concurrent first requests share a single setup.
+    """
+    global _setup_lock, _ready_client
+    if client is None or client is _ready_client:
+        return
+    if _setup_lock is None:
+        _setup_lock = asyncio.Lock()
+    async with _setup_lock:
+        if client is not _ready_client:
+            await client.__aenter__()
+            _ready_client = client
+
+def get_pooled_async_container(database_name, container_name):
+    """
+    Return a memoized async container client for the given database/container pair
+    """
+    return _pool.get_container(database_name, container_name)
+
+def get_async_pool_stats():
+    """
+    Return a snapshot of the async client pool counters
+    """
+    return _pool.get_stats()
+
+async def close_async_pool():
+    """
+    Close the pooled async client and drop cached containers
+    """
+    global _ready_client
+    client = _pool.reset()
+    _ready_client = None
+    if client is not None:
+        await client.close()
+
+class AsyncCosmosOperator:
+    """
+    Non-blocking counterpart of CosmosOperator for the async handlers
+    """
+    def __init__(self):
+        self.client = get_async_cosmos_client()
+        self.last_request_charge = 0.0
+        self.total_request_charge = 0.0
+
+    def get_container(self, database_name, container_name):
+        return get_pooled_async_container(database_name, container_name)
+
+    def get_pool_stats(self):
+        return get_async_pool_stats()
+
+    async def read_item(self, container, item_id: str, partition_key=None):
+        """
+        Point-read a document by id within its partition
+        Args:
+            container: Async container client to read from
+            item_id: The document id
+            partition_key: Partition key value, defaults to the id
+        Returns:
+            The document, or None if it does not exist
+        """
+        if partition_key is None:
+            partition_key = item_id
+        await setup_async_client(self.client)
+        try:
+            item = await container.read_item(item=item_id, partition_key=partition_key)
+        except CosmosResourceNotFoundError:
+            item = None
+        self._record_charge(container, "read_item")
+        return item
+
+    async def read_item_cached(self, container, item_id: str, partition_key=None):
+        """
+        Read-through variant of read_item backed by the shared document cache.
+        Stale entries are revalidated with If-None-Match on their _etag.
+        The returned document is shared and must not be mutated.
+        """
+        document, etag = cached_read_plan(container, item_id)
+        if document is None:
+            item = await self.read_item(container, item_id, partition_key)
+            if item is not None:
+                document_cache.store(container.id, item_id, item)
+            return item
+        if etag is None:
+            return document
+
+        if partition_key is None:
+            partition_key = item_id
+        await setup_async_client(self.client)
+        try:
+            item = await container.read_item(item=item_id, partition_key=partition_key, **if_modified(etag))
+        except CosmosResourceNotFoundError:
+            document_cache.invalidate(container.id, item_id)
+            return None
+        finally:
+            self._record_charge(container, "read_item")
+        return settle_revalidation(container, item_id, document, item)
+
+    async def read_etag(self, container, item_id: str, partition_key=None):
+        """
+        Current _etag of a document, transferring as little as possible: a
+        cached copy is revalidated (a 304 from Cosmos when unchanged), and
+        otherwise only the _etag is selected
+        Returns:
+            The _etag, or None if the document does not exist
+        """
+        if document_cache.contains(container.id, item_id):
+            document = await self.read_item_cached(container, item_id, partition_key)
+            return document.get('_etag') if document else None
+        if partition_key is None:
+            partition_key = item_id
+        etags = await self.query_items(
+            container,
+            "SELECT VALUE c._etag FROM c WHERE c.id = @id",
+            [{"name": "@id", "value": item_id}],
+            partition_key=partition_key
+        )
+        return etags[0] if etags else None
+
+    async def upsert_item(self, container, body):
+        """
+        Upsert a document and drop any cached copy of it
+        """
+        await setup_async_client(self.client)
+        try:
+            result = await container.upsert_item(body=body)
+        finally:
+            document_cache.invalidate(container.id, body['id'])
+        self._record_charge(container, "upsert_item")
+        return result
+
+    async def replace_item(self, container, item_id: str, body):
+        """
+        Replace a document and drop any cached copy of it
+        """
+        await setup_async_client(self.client)
+        try:
+            result = await container.replace_item(item=item_id, body=body)
+        finally:
+            document_cache.invalidate(container.id, item_id)
+        self._record_charge(container, "replace_item")
+        return result
+
+    async def patch_item(self, container, item_id: str, operations, partition_key=None):
+        """
+        Apply partial-document patch operations and drop any cached copy.
+        An empty operation list skips the round trip.
+        Returns:
+            The patched document, or None if nothing was written
+        """
+        if not operations:
+            return None
+        if partition_key is None:
+            partition_key = item_id
+        await setup_async_client(self.client)
+        try:
+            result = await container.patch_item(
+                item=item_id,
+                partition_key=partition_key,
+                patch_operations=operations
+            )
+        finally:
+            document_cache.invalidate(container.id, item_id)
+        self._record_charge(container, "patch_item")
+        return result
+
+    async def save_changes(self, container, original, updated, partition_key=None):
+        """
+        Persist the difference between two versions of a document, as a
+        patch when it fits in one request and as a full upsert otherwise
+        Returns:
+            The written document, or None if the versions are identical
+        """
+        operations, as_patch = plan_changes(original, updated)
+        if not operations:
+            return None
+        if as_patch:
+            return await self.patch_item(container, updated['id'], operations, partition_key)
+        return await self.upsert_item(container, updated)
+
+    async def write_conditional(self, container, original, updated, partition_key=None):
+        """
+        Persist updated over original only if the stored document still has
+        original's _etag, as a patch when the diff fits in one request.
+        Raises:
+            CosmosAccessConditionFailedError: the document changed since it was read
+        """
+        operations, as_patch = plan_changes(original, updated)
+        if not operations:
+            return original
+        if partition_key is None:
+            partition_key = updated['id']
+        await setup_async_client(self.client)
+        try:
+            if as_patch:
+                result = await container.patch_item(
+                    item=updated['id'],
+                    partition_key=partition_key,
+                    patch_operations=operations,
+                    **if_not_modified(original)
+                )
+            else:
+                result = await container.replace_item(item=updated['id'], body=updated, **if_not_modified(original))
+        finally:
+            document_cache.invalidate(container.id, updated['id'])
+            self._record_charge(container, "write_conditional")
+        return result
+
+    async def read_modify_write(self, container, item_id: str, mutate, partition_key=None,
+                          default=None, max_attempts: int = MAX_WRITE_ATTEMPTS):
+        """
+        Optimistic read-modify-write of one document.
+
+        mutate(draft) receives a shallow copy of the current document and
+        must replace, not modify in place, any nested value it changes; its
+        return value is handed back to the caller. The write is conditioned
+        on the _etag that was read and the whole cycle is retried with
+        jittered backoff when another writer got there first.
+        Args:
+            default: Factory for the document to start from when none exists.
+                Without it a missing document returns (None, None).
+        Returns:
+            (written document, value returned by mutate)
+        Raises:
+            ConcurrencyConflictError: every attempt lost the race
+        """
+        for attempt in range(max_attempts):
+            current = await self.read_item(container, item_id, partition_key)
+            draft = start_draft(current, default)
+            if draft is None:
+                return None, None
+            outcome = mutate(draft)
+            try:
+                if current is None:
+                    written = await container.create_item(body=draft)
+                    document_cache.invalidate(container.id, item_id)
+                    self._record_charge(container, "create_item")
+                else:
+                    written = await self.write_conditional(container, current, draft, partition_key)
+                return written, outcome
+            except WRITE_CONFLICT_ERRORS:
+                await asyncio.sleep(conflict_delay(container, item_id, attempt, max_attempts))
+        raise conflict_error(container, item_id, max_attempts)
+
+    async def delete_item(self, container, item_id: str, partition_key=None) -> bool:
+        """
+        Delete a document and drop any cached copy of it
+        Returns:
+            False if the document did not exist
+        """
+        if partition_key is None:
+            partition_key = item_id
+        await setup_async_client(self.client)
+        try:
+            await container.delete_item(item=item_id, partition_key=partition_key)
+        except CosmosResourceNotFoundError:
+            return False
+        finally:
+            document_cache.invalidate(container.id, item_id)
+            self._record_charge(container, "delete_item")
+        return True
+
+    def get_cache_stats(self):
+        return document_cache.get_stats()
+
+    async def query_items(self, container, query: str, parameters=None, partition_key=None):
+        """
+        Run a query and collect the results into a list
+        """
+        kwargs = {"query": query, "parameters": parameters}
+        if partition_key is not None:
+            kwargs["partition_key"] = partition_key
+        await setup_async_client(self.client)
+        items = [item async for item in container.query_items(**kwargs)]
+        self._record_charge(container, "query_items")
+        return items
+
+    def _record_charge(self, container, operation: str):
+        try:
+            charge = get_request_charge(container)
+        except Exception:
+            return
+        self.last_request_charge = charge
+        self.total_request_charge += charge
+        logging.debug(f"Cosmos {operation} on {container.id} consumed {charge} RU")
+
+    def get_culvana_container(self, container_name="users"):
+        return self.get_container("culvana-db", container_name)
+
+    def get_invoice_container(self):
+        return self.get_container("InvoicesDB", "Invoices")
+
+    def get_recipe_container(self):
+        return self.get_container("InvoicesDB", "Recipes")
+
+    def get_menu_container(self):
+        return self.get_container("InvoicesDB", "Menu")
+
+    def get_inventory_container(self):
+        return self.get_container("InvoicesDB", "Inventory")
+
+    def get_inventory_repository(self, storage_mode=None):
+        return InventoryRepository(self, self.get_inventory_container(), storage_mode)
+
+    async def check_user_exists(self, email: str) -> bool:
+        return await self.get_user_by_email(email) is not None
+
+    async def get_user_by_email(self, email: str):
+        container = self.get_culvana_container("users")
+        return await self.read_item(container, email)
+
+    async def get_user_invoices(self, email: str):
+        container = self.get_invoice_container()
+        query = "SELECT * FROM c WHERE c.userId = @email"
+        parameters = [{"name": "@email", "value": email}]
+        return await self.query_items(container, query, parameters)
+
+    async def get_user_recipes(self, email: str):
+        container = self.get_recipe_container()
+        item = await self.read_item(container, email)
+        return [item] if item else []
@@ -0,0 +1,160 @@
+import azure.functions as func
+import functools
+import hashlib
+import inspect
+import jwt
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any
+from shared_code.responses import json_response
+from shared_code.serialization import get_json_body
+
+JWT_ALGORITHM = 'HS256'
+REGULAR_TOKEN_EXPIRY = timedelta(hours=24)
+REMEMBER_ME_EXPIRY = timedelta(days=30)
+
+class AuthenticationError(Exception):
+    pass
+
+def get_jwt_secret() -> str:
+    return os.environ['JWT_SECRET']
+
+def issue_access_token(user_id: str, remember_me: bool = False) -> str:
+    """
+    Mint the access token returned by login and verify-signup
+    """
+    now = datetime.utcnow()
+    return jwt.encode({
+        'user_id': user_id,
+        'exp': now + (REMEMBER_ME_EXPIRY if remember_me else REGULAR_TOKEN_EXPIRY),
+        'iat': now
+    }, get_jwt_secret(), algorithm=JWT_ALGORITHM)
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU of decoded claims keyed by token digest. An entry is only
+    served until the token's exp, so caching never extends a token's life.
+    """
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: bytes, now: float) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            claims = self._entries.get(key)
+            if claims is None or claims['exp'] <= now:
+                if claims is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return claims
+
+    def put(self, key: bytes, claims: Dict[str, Any]):
+        with self._lock:
+            self._entries[key] = claims
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+token_cache = VerifiedTokenCache(int(os.environ.get('AUTH_TOKEN_CACHE_SIZE', 1024)))
+
+def verify_access_token(token: str) -> Dict[str, Any]:
+    """
+    Returns:
+        The token's claims
+    Raises:
+        AuthenticationError: the token is malformed, forged or expired
+    """
+    key = hashlib.sha256(token.encode('utf-8')).digest()
+    now = time.time()
+    claims = token_cache.get(key, now)
+    if claims is not None:
+        return claims
+    try:
+        claims = jwt.decode(
+            token, get_jwt_secret(), algorithms=[JWT_ALGORITHM],
+            options={"require": ["exp", "user_id"]}
+        )
+    except jwt.ExpiredSignatureError:
+        raise AuthenticationError("Token has expired")
+    except jwt.InvalidTokenError:
+        raise AuthenticationError("Invalid token")
+    token_cache.put(key, claims)
+    return claims
+
+def get_bearer_token(req: func.HttpRequest) -> Optional[str]:
+    header = req.headers.get('Authorization') or ''
+    scheme, _, token = header.partition(' ')
+    if scheme.lower() != 'bearer' or not token.strip():
+        return None
+    return token.strip()
+
+def _auth_error(req: func.HttpRequest, message: str, status_code: int) -> func.HttpResponse:
+    return json_response(
+        req,
+        {"error": {"message": message}},
+        status_code=status_code,
+        headers={"WWW-Authenticate": "Bearer"} if status_code == 401 else None
+    )
+
+def authenticate(req: func.HttpRequest):
+    """
+    Check the request's bearer token and that any email in the body or
+    query string belongs to the token's user
+    Returns:
+        (claims, None) on success, (None, error response) otherwise
+    """
+    token = get_bearer_token(req)
+    if token is None:
+        return None, _auth_error(req, "Authorization token is required", 401)
+    try:
+        claims = verify_access_token(token)
+    except AuthenticationError as e:
+        return None, _auth_error(req, str(e), 401)
+
+    try:
+        body = get_json_body(req)
+    except ValueError:
+        body = None
+    requested = (body.get('email') if isinstance(body, dict) else None) or req.params.get('email')
+    if requested and str(requested).lower() != str(claims['user_id']).lower():
+        return None, _auth_error(req, "Not allowed to access another user's data", 403)
+    return claims, None
+
+def require_auth(handler):
+    """
+    Decorator for HTTP handlers (sync or async) that rejects requests
+    without a valid bearer token for the user they act on
+    """
+    if inspect.iscoroutinefunction(handler):
+        @functools.wraps(handler)
+        async def async_wrapper(req: func.HttpRequest, *args, **kwargs):
+            _, error = authenticate(req)
+            if error is not None:
+                return error
+            return await handler(req, *args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(handler)
+    def wrapper(req: func.HttpRequest, *args, **kwargs):
+        _, error = authenticate(req)
+        if error is not None:
+            return error
+        return handler(req, *args, **kwargs)
+    return wrapper
@@ -1,15 +1,437 @@
 from azure.cosmos import CosmosClient
+from azure.core import MatchConditions
+from azure.cosmos.exceptions import (
+    CosmosAccessConditionFailedError,
+    CosmosResourceExistsError,
+    CosmosResourceNotFoundError
+)
+import logging
 import os
+import random
+import threading
+import time
 from datetime import datetime
+from shared_code.document_cache import document_cache
+from shared_code.patch_operations import diff_operations, fits_single_patch
+
+class ClientPool:
+    """
+    A process-wide Cosmos client and memoized container clients, reused by
+    every invocation handled by this worker. client_factory(connection_string)
+    must not await, so the lock is never held across a suspension point.
+    """
+    def __init__(self, client_factory):
+        self.client_factory = client_factory
+        self._lock = threading.Lock()
+        self._client = None
+        self._client_created_at = None
+        self._containers = {}
+        self._stats = {
+            "client_hits": 0,
+            "client_creations": 0,
+            "container_hits": 0,
+            "container_creations": 0
+        }
+
+    def get_client(self):
+        """
+        Return the pooled client, creating it on first use
+        """
+        client = self._client
+        if client is not None:
+            self._stats["client_hits"] += 1
+            return client
+
+        with self._lock:
+            if self._client is None:
+                connection_string = os.environ['AzureCosmosDBConnectionString']
+                self._client = self.client_factory(connection_string)
+                self._client_created_at = time.monotonic()
+                self._stats["client_creations"] += 1
+            else:
+                self._stats["client_hits"] += 1
+            return self._client
+
+    def get_container(self, database_name, container_name):
+        """
+        Return a memoized container client for the given database/container pair
+        """
+        key = (database_name, container_name)
+        container = self._containers.get(key)
+        if container is not None:
+            self._stats["container_hits"] += 1
+            return container
+
+        client = self.get_client()
+        with self._lock:
+            container = self._containers.get(key)
+            if container is None:
+                database = client.get_database_client(database_name)
+                container = database.get_container_client(container_name)
+                self._containers[key] = container
+                self._stats["container_creations"] += 1
+            else:
+                self._stats["container_hits"] += 1
+            return container
+
+    def get_stats(self):
+        """
+        Return a snapshot of the pool counters
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["cached_containers"] = len(self._containers)
+            stats["client_age_seconds"] = (
+                time.monotonic() - self._client_created_at if self._client_created_at is not None else None
+            )
+        return stats
+
+    def reset(self):
+        """
+        Drop the pooled client and cached containers
+        Returns:
+            The dropped client, for the caller to close, or None
+        """
+        with self._lock:
+            client = self._client
+            self._client = None
+            self._client_created_at = None
+            self._containers.clear()
+        return client
+
+_pool = ClientPool(CosmosClient.from_connection_string)
+
+def get_cosmos_client():
+    """
+    Return the process-wide CosmosClient, creating it on first use.
+    The client is reused by every invocation handled by this worker.
+    """
+    return _pool.get_client()
+
+def get_pooled_container(database_name, container_name):
+    """
+    Return a memoized container client for the given database/container pair
+    """
+    return _pool.get_container(database_name, container_name)
+
+def get_pool_stats():
+    """
+    Return a snapshot of the client pool counters
+    """
+    return _pool.get_stats()
+
+def reset_pool():
+    """
+    Drop the pooled client and cached containers, e.g. after a connection string rotation
+    """
+    _pool.reset()
+
+MAX_WRITE_ATTEMPTS = 8
+RETRY_BASE_DELAY_SECONDS = 0.02
+RETRY_MAX_DELAY_SECONDS = 1.0
+WRITE_CONFLICT_ERRORS = (CosmosAccessConditionFailedError, CosmosResourceExistsError)
+
+class ConcurrencyConflictError(Exception):
+    """Raised when a conditional write keeps losing to concurrent writers"""
+    pass
+
+def retry_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff for the given 0-based attempt"""
+    return random.uniform(0, min(RETRY_MAX_DELAY_SECONDS, RETRY_BASE_DELAY_SECONDS * (2 ** attempt)))
+
+def conflict_delay(container, item_id: str, attempt: int, max_attempts: int) -> float:
+    """
+    Log a lost conditional write and return how long to wait before the next attempt
+    """
+    logging.info(f"Write conflict on {container.id}/{item_id}, attempt {attempt + 1} of {max_attempts}")
+    return retry_delay(attempt)
+
+def conflict_error(container, item_id: str, max_attempts: int) -> ConcurrencyConflictError:
+    return ConcurrencyConflictError(f"Gave up writing {container.id}/{item_id} after {max_attempts} attempts")
+
+def start_draft(current, default):
+    """
+    The document a read-modify-write cycle mutates: a shallow copy of the
+    current document, a fresh one from default when none exists, or None
+    when there is nothing to write
+    """
+    if current is not None:
+        return dict(current)
+    return default() if default is not None else None
+
+def plan_changes(original, updated):
+    """
+    Choose how to persist updated over original
+    Returns:
+        (patch operations, whether they fit in one patch request); the
+        operations are empty when the versions are identical
+    """
+    operations = diff_operations(original, updated)
+    return operations, fits_single_patch(operations)
+
+def if_not_modified(document):
+    """Request options conditioning a write on the document's _etag"""
+    return {"etag": document['_etag'], "match_condition": MatchConditions.IfNotModified}
+
+def if_modified(etag):
+    """Request options for a read that returns nothing when the etag still matches"""
+    return {"etag": etag, "match_condition": MatchConditions.IfModified}
+
+def cached_read_plan(container, item_id: str):
+    """
+    Decide how read_item_cached serves a document
+    Returns:
+        (cached document, etag to revalidate with): (None, None) when the
+        document has to be read, (document, None) when the cached copy is
+        fresh and (document, etag) when it must be revalidated first
+    """
+    cached = document_cache.lookup(container.id, item_id)
+    if cached is None:
+        return None, None
+    document, etag, fresh = cached
+    if fresh:
+        return document, None
+    if not etag:
+        document_cache.invalidate(container.id, item_id)
+        return None, None
+    return document, etag
+
+def settle_revalidation(container, item_id: str, document, item):
+    """
+    Update the cache after a conditional read of a cached document;
+    item is empty when the server answered 304 Not Modified
+    """
+    if not item:
+        return document_cache.mark_unchanged(container.id, item_id) or document
+    document_cache.store(container.id, item_id, item)
+    return item
+
+def get_request_charge(container) -> float:
+    """
+    Return the RU charge reported for the last operation on the container
+    """
+    headers = container.client_connection.last_response_headers or {}
+    return float(headers.get('x-ms-request-charge', 0) or 0)
 
 class CosmosOperator:
     def __init__(self):
-        self.connection_string = os.environ['AzureCosmosDBConnectionString']
-        self.client = CosmosClient.from_connection_string(self.connection_string)
+        self.client = get_cosmos_client()
+        self.last_request_charge = 0.0
+        self.total_request_charge = 0.0
         
     def get_container(self, database_name, container_name):
-        database = self.client.get_database_client(database_name)
-        return database.get_container_client(container_name)
+        return get_pooled_container(database_name, container_name)
+
+    def get_pool_stats(self):
+        return get_pool_stats()
+
+    def read_item(self, container, item_id: str, partition_key=None):
+        """
+        Point-read a document by id within its partition
+        Args:
+            container: Container client to read from
+            item_id: The document id
+            partition_key: Partition key value, defaults to the id
+        Returns:
+            The document, or None if it does not exist
+        """
+        if partition_key is None:
+            partition_key = item_id
+        try:
+            item = container.read_item(item=item_id, partition_key=partition_key)
+        except CosmosResourceNotFoundError:
+            item = None
+        self._record_charge(container, "read_item")
+        return item
+
+    def read_item_cached(self, container, item_id: str, partition_key=None):
+        """
+        Read-through variant of read_item backed by the shared document cache.
+        Stale entries are revalidated with If-None-Match on their _etag.
+        The returned document is shared and must not be mutated.
+        """
+        document, etag = cached_read_plan(container, item_id)
+        if document is None:
+            item = self.read_item(container, item_id, partition_key)
+            if item is not None:
+                document_cache.store(container.id, item_id, item)
+            return item
+        if etag is None:
+            return document
+
+        if partition_key is None:
+            partition_key = item_id
+        try:
+            item = container.read_item(item=item_id, partition_key=partition_key, **if_modified(etag))
+        except CosmosResourceNotFoundError:
+            document_cache.invalidate(container.id, item_id)
+            return None
+        finally:
+            self._record_charge(container, "read_item")
+        return settle_revalidation(container, item_id, document, item)
+
+    def upsert_item(self, container, body):
+        """
+        Upsert a document and drop any cached copy of it
+        """
+        try:
+            result = container.upsert_item(body=body)
+        finally:
+            document_cache.invalidate(container.id, body['id'])
+        self._record_charge(container, "upsert_item")
+        return result
+
+    def replace_item(self, container, item_id: str, body):
+        """
+        Replace a document and drop any cached copy of it
+        """
+        try:
+            result = container.replace_item(item=item_id, body=body)
+        finally:
+            document_cache.invalidate(container.id, item_id)
+        self._record_charge(container, "replace_item")
+        return result
+
+    def patch_item(self, container, item_id: str, operations, partition_key=None):
+        """
+        Apply partial-document patch operations and drop any cached copy.
+        An empty operation list skips the round trip.
+        Returns:
+            The patched document, or None if nothing was written
+        """
+        if not operations:
+            return None
+        if partition_key is None:
+            partition_key = item_id
+        try:
+            result = container.patch_item(
+                item=item_id,
+                partition_key=partition_key,
+                patch_operations=operations
+            )
+        finally:
+            document_cache.invalidate(container.id, item_id)
+        self._record_charge(container, "patch_item")
+        return result
+
+    def save_changes(self, container, original, updated, partition_key=None):
+        """
+        Persist the difference between two versions of a document, as a
+        patch when it fits in one request and as a full upsert otherwise
+        Returns:
+            The written document, or None if the versions are identical
+        """
+        operations, as_patch = plan_changes(original, updated)
+        if not operations:
+            return None
+        if as_patch:
+            return self.patch_item(container, updated['id'], operations, partition_key)
+        return self.upsert_item(container, updated)
+
+    def write_conditional(self, container, original, updated, partition_key=None):
+        """
+        Persist updated over original only if the stored document still has
+        original's _etag, as a patch when the diff fits in one request.
+        Raises:
+            CosmosAccessConditionFailedError: the document changed since it was read
+        """
+        operations, as_patch = plan_changes(original, updated)
+        if not operations:
+            return original
+        if partition_key is None:
+            partition_key = updated['id']
+        try:
+            if as_patch:
+                result = container.patch_item(
+                    item=updated['id'],
+                    partition_key=partition_key,
+                    patch_operations=operations,
+                    **if_not_modified(original)
+                )
+            else:
+                result = container.replace_item(item=updated['id'], body=updated, **if_not_modified(original))
+        finally:
+            document_cache.invalidate(container.id, updated['id'])
+            self._record_charge(container, "write_conditional")
+        return result
+
+    def read_modify_write(self, container, item_id: str, mutate, partition_key=None,
+                          default=None, max_attempts: int = MAX_WRITE_ATTEMPTS):
+        """
+        Optimistic read-modify-write of one document.
+
+        mutate(draft) receives a shallow copy of the current document and
+        must replace, not modify in place, any nested value it changes; its
+        return value is handed back to the caller. The write is conditioned
+        on the _etag that was read and the whole cycle is retried with
+        jittered backoff when another writer got there first.
+        Args:
+            default: Factory for the document to start from when none exists.
+                Without it a missing document returns (None, None).
+        Returns:
+            (written document, value returned by mutate)
+        Raises:
+            ConcurrencyConflictError: every attempt lost the race
+        """
+        for attempt in range(max_attempts):
+            current = self.read_item(container, item_id, partition_key)
+            draft = start_draft(current, default)
+            if draft is None:
+                return None, None
+            outcome = mutate(draft)
+            try:
+                if current is None:
+                    written = container.create_item(body=draft)
+                    document_cache.invalidate(container.id, item_id)
+                    self._record_charge(container, "create_item")
+                else:
+                    written = self.write_conditional(container, current, draft, partition_key)
+                return written, outcome
+            except WRITE_CONFLICT_ERRORS:
+                time.sleep(conflict_delay(container, item_id, attempt, max_attempts))
+        raise conflict_error(container, item_id, max_attempts)
+
+    def delete_item(self, container, item_id: str, partition_key=None) -> bool:
+        """
+        Delete a document and drop any cached copy of it
+        Returns:
+            False if the document did not exist
+        """
+        if partition_key is None:
+            partition_key = item_id
+        try:
+            container.delete_item(item=item_id, partition_key=partition_key)
+        except CosmosResourceNotFoundError:
+            return False
+        finally:
+            document_cache.invalidate(container.id, item_id)
+            self._record_charge(container, "delete_item")
+        return True
+
+    def get_cache_stats(self):
+        return document_cache.get_stats()
+
+    def query_items(self, container, query: str, parameters=None, partition_key=None):
+        """
+        Run a query and collect the results into a list
+        """
+        kwargs = {"query": query, "parameters": parameters}
+        if partition_key is not None:
+            kwargs["partition_key"] = partition_key
+        else:
+            kwargs["enable_cross_partition_query"] = True
+        items = list(container.query_items(**kwargs))
+        self._record_charge(container, "query_items")
+        return items
+
+    def _record_charge(self, container, operation: str):
+        try:
+            charge = get_request_charge(container)
+        except Exception:
+            return
+        self.last_request_charge = charge
+        self.total_request_charge += charge
+        logging.debug(f"Cosmos {operation} on {container.id} consumed {charge} RU")
 
     def get_culvana_container(self, container_name="users"):
         return self.get_container("culvana-db", container_name)
@@ -24,28 +446,11 @@ class CosmosOperator:
         return self.get_container("InvoicesDB", "Menu")
 
     def check_user_exists(self, email: str) -> bool:
-        container = self.get_culvana_container("users")
-        query = "SELECT * FROM c WHERE c.email = @email"
-        parameters = [{"name": "@email", "value": email}]
-        
-        items = list(container.query_items(
-            query=query,
-            parameters=parameters,
-            enable_cross_partition_query=True
-        ))
-        return len(items) > 0
+        return self.get_user_by_email(email) is not None
 
     def get_user_by_email(self, email: str):
         container = self.get_culvana_container("users")
-        query = "SELECT * FROM c WHERE c.email = @email"
-        parameters = [{"name": "@email", "value": email}]
-        
-        items = list(container.query_items(
-            query=query,
-            parameters=parameters,
-            enable_cross_partition_query=True
-        ))
-        return items[0] if items else None
+        return self.read_item(container, email)
 
     def get_user_invoices(self, email: str):
         container = self.get_invoice_container()
@@ -61,12 +466,5 @@ class CosmosOperator:
 
     def get_user_recipes(self, email: str):
         container = self.get_recipe_container()
-        query = "SELECT * FROM c WHERE c.id = @email"
-        parameters = [{"name": "@email", "value": email}]
-        
-        items = list(container.query_items(
-            query=query,
-            parameters=parameters,
-            enable_cross_partition_query=True
-        ))
-        return items
\ No newline at end of file
+        item = self.read_item(container, email)
+        return [item] if item else []
@@ -0,0 +1,97 @@
+from collections import OrderedDict
+import os
+import threading
+import time
+from typing import Optional, Dict, Any
+
+class DocumentCache:
+    """
+    In-process LRU of per-user documents keyed by (container id, document id).
+
+    Entries younger than ttl_seconds are served without a round trip. Older
+    entries are kept until evicted and revalidated with a conditional read on
+    their stored _etag, so an unchanged document is never transferred or
+    parsed twice. Cached documents are shared between callers and must be
+    treated as read-only.
+    """
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 5.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "revalidations": 0,
+            "revalidated_unchanged": 0,
+            "invalidations": 0,
+            "evictions": 0
+        }
+
+    def lookup(self, container_id: str, item_id: str):
+        """
+        Returns:
+            (document, etag, fresh) for a cached entry, or None on a miss
+        """
+        key = (container_id, item_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            document, stored_at = entry
+            if time.monotonic() - stored_at < self.ttl_seconds:
+                self._stats["hits"] += 1
+                return document, document.get('_etag'), True
+            self._stats["revalidations"] += 1
+            return document, document.get('_etag'), False
+
+    def contains(self, container_id: str, item_id: str) -> bool:
+        with self._lock:
+            return (container_id, item_id) in self._entries
+
+    def store(self, container_id: str, item_id: str, document: Dict[str, Any]):
+        key = (container_id, item_id)
+        with self._lock:
+            self._entries[key] = (document, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def mark_unchanged(self, container_id: str, item_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Refresh an entry after the server answered 304 Not Modified
+        """
+        key = (container_id, item_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries[key] = (entry[0], time.monotonic())
+            self._stats["revalidated_unchanged"] += 1
+            return entry[0]
+
+    def invalidate(self, container_id: str, item_id: str):
+        with self._lock:
+            if self._entries.pop((container_id, item_id), None) is not None:
+                self._stats["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        return stats
+
+document_cache = DocumentCache(
+    max_entries=int(os.environ.get('DOCUMENT_CACHE_MAX_ENTRIES', 256)),
+    ttl_seconds=float(os.environ.get('DOCUMENT_CACHE_TTL_SECONDS', 5))
+)
+
+def get_document_cache_stats() -> Dict[str, Any]:
+    return document_cache.get_stats()
@@ -0,0 +1,404 @@
+import hashlib
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Dict, Any, List
+from azure.cosmos.exceptions import CosmosAccessConditionFailedError
+
+STATUS_PENDING = "pending"
+STATUS_SENDING = "sending"
+STATUS_SENT = "sent"
+STATUS_FAILED = "failed"
+
+KIND_OTP = "otp"
+KIND_CUSTOM = "custom"
+
+DEFAULT_COOLDOWN_SECONDS = float(os.environ.get('EMAIL_OUTBOX_COOLDOWN_SECONDS', 30))
+OTP_COOLDOWN_SECONDS = float(os.environ.get('EMAIL_OUTBOX_OTP_COOLDOWN_SECONDS', 5))
+DEFAULT_BATCH_SIZE = int(os.environ.get('EMAIL_OUTBOX_BATCH_SIZE', 50))
+DEFAULT_CONCURRENCY = int(os.environ.get('EMAIL_OUTBOX_CONCURRENCY', 8))
+DEFAULT_MAX_ATTEMPTS = int(os.environ.get('EMAIL_OUTBOX_MAX_ATTEMPTS', 5))
+LEASE_SECONDS = 120
+RETRY_BASE_DELAY_SECONDS = 5.0
+RETRY_MAX_DELAY_SECONDS = 300.0
+
+def outbox_message_id(recipient: str, kind: str) -> str:
+    """
+    One outbox document per recipient and kind, so repeated enqueues for
+    the same recipient collapse into a single pending delivery
+    """
+    return "outbox-" + hashlib.sha256(f"{kind}:{recipient.lower()}".encode('utf-8')).hexdigest()[:32]
+
+def outbox_retry_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff for the given 1-based delivery attempt"""
+    return random.uniform(0, min(RETRY_MAX_DELAY_SECONDS, RETRY_BASE_DELAY_SECONDS * (2 ** attempt)))
+
+def message_cooldown(kind: str, cooldown_seconds: float) -> float:
+    """
+    Minimum gap between two deliveries of the same kind to one recipient.
+    A new code invalidates the one already delivered, so codes use the
+    shorter OTP_COOLDOWN_SECONDS: long enough for a burst of resends to
+    collapse into one delivery of the latest code, short enough that the
+    user is not left holding only a dead code.
+    """
+    if kind == KIND_OTP:
+        return min(cooldown_seconds, OTP_COOLDOWN_SECONDS)
+    return cooldown_seconds
+
+def merge_enqueue(existing: Optional[Dict[str, Any]], recipient: str, kind: str,
+                  content: Dict[str, str], now: float, cooldown_seconds: float) -> Dict[str, Any]:
+    """
+    Fold a new message into the recipient's outbox document. The latest
+    content wins, and delivery is held back until the kind's cooldown
+    since the last send has passed.
+    """
+    cooldown_seconds = message_cooldown(kind, cooldown_seconds)
+    message = dict(existing) if existing else {
+        "id": outbox_message_id(recipient, kind),
+        "recipient": recipient,
+        "kind": kind,
+        "version": 0,
+        "lastSentAt": None,
+        "collapsed": 0
+    }
+    if existing and existing.get('status') in (STATUS_PENDING, STATUS_SENDING):
+        message['collapsed'] = existing.get('collapsed', 0) + 1
+    last_sent = message.get('lastSentAt')
+    message.update({
+        "content": content,
+        "status": STATUS_PENDING,
+        "version": message.get('version', 0) + 1,
+        "attempts": 0,
+        "lastError": None,
+        "enqueuedAt": now,
+        "notBefore": max(now, last_sent + cooldown_seconds) if last_sent else now
+    })
+    return message
+
+def claim_message(message: Dict[str, Any], now: float, lease_seconds: float = LEASE_SECONDS) -> Dict[str, Any]:
+    return {**message, "status": STATUS_SENDING, "leaseUntil": now + lease_seconds}
+
+def settle_message(current: Dict[str, Any], claimed: Dict[str, Any], error: Optional[str], now: float,
+                   cooldown_seconds: float, max_attempts: int) -> Dict[str, Any]:
+    """
+    Record the outcome of delivering the claimed version of a message.
+    If the message was re-enqueued while it was being sent, the newer
+    content stays pending and only the kind's cooldown is pushed out.
+    """
+    cooldown_seconds = message_cooldown(current.get('kind'), cooldown_seconds)
+    updated = dict(current)
+    superseded = current.get('version') != claimed.get('version')
+    if error is None:
+        updated['lastSentAt'] = now
+        if superseded:
+            updated['notBefore'] = max(current.get('notBefore', now), now + cooldown_seconds)
+        else:
+            # delivered codes are not kept around
+            updated.update({"status": STATUS_SENT, "content": None, "collapsed": 0, "leaseUntil": None})
+        return updated
+
+    if superseded:
+        return updated
+    attempts = current.get('attempts', 0) + 1
+    updated.update({"attempts": attempts, "lastError": error, "leaseUntil": None})
+    if attempts >= max_attempts:
+        updated.update({"status": STATUS_FAILED, "content": None})
+    else:
+        updated.update({"status": STATUS_PENDING, "notBefore": now + outbox_retry_delay(attempts)})
+    return updated
+
+def is_due(message: Dict[str, Any], now: float) -> bool:
+    if message.get('status') == STATUS_PENDING:
+        return message.get('notBefore', 0) <= now
+    # a dispatcher that died mid-send leaves its claim to expire
+    return message.get('status') == STATUS_SENDING and (message.get('leaseUntil') or 0) <= now
+
+class SQLiteOutboxStore:
+    """
+    Outbox in a local SQLite file (or ":memory:"), for tests, benchmarks
+    and running the functions host locally
+    """
+    def __init__(self, path: str = ":memory:", cooldown_seconds: float = DEFAULT_COOLDOWN_SECONDS):
+        self.cooldown_seconds = cooldown_seconds
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, not_before REAL NOT NULL, "
+            "lease_until REAL, body TEXT NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, not_before)")
+
+    def _read(self, message_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection.execute("SELECT body FROM outbox WHERE id = ?", (message_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _write(self, message: Dict[str, Any]):
+        self._connection.execute(
+            "INSERT OR REPLACE INTO outbox (id, status, not_before, lease_until, body) VALUES (?, ?, ?, ?, ?)",
+            (message['id'], message['status'], message.get('notBefore', 0),
+             message.get('leaseUntil'), json.dumps(message))
+        )
+
+    def enqueue(self, recipient: str, kind: str, content: Dict[str, str]) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                message = merge_enqueue(
+                    self._read(outbox_message_id(recipient, kind)), recipient, kind,
+                    content, now, self.cooldown_seconds
+                )
+                self._write(message)
+                self._connection.execute("COMMIT")
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+        return message
+
+    def claim_due(self, limit: int) -> List[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._connection.execute(
+                    "SELECT body FROM outbox WHERE (status = ? AND not_before <= ?) "
+                    "OR (status = ? AND lease_until <= ?) ORDER BY not_before LIMIT ?",
+                    (STATUS_PENDING, now, STATUS_SENDING, now, limit)
+                ).fetchall()
+                claimed = [claim_message(json.loads(row[0]), now) for row in rows]
+                for message in claimed:
+                    self._write(message)
+                self._connection.execute("COMMIT")
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+        return claimed
+
+    def settle(self, claimed: Dict[str, Any], error: Optional[str], max_attempts: int) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                current = self._read(claimed['id'])
+                settled = None
+                if current is not None:
+                    settled = settle_message(current, claimed, error, now, self.cooldown_seconds, max_attempts)
+                    self._write(settled)
+                self._connection.execute("COMMIT")
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+        return settled
+
+    def get_message(self, recipient: str, kind: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._read(outbox_message_id(recipient, kind))
+
+    def count_by_status(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._connection.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall()
+        return dict(rows)
+
+class CosmosOutboxStore:
+    """
+    Outbox in a Cosmos container partitioned by /recipient. Enqueue and
+    settle are ETag-conditioned read-modify-writes; claims are conditional
+    writes, so two dispatchers never send the same version twice.
+    """
+    def __init__(self, db, container, cooldown_seconds: float = DEFAULT_COOLDOWN_SECONDS):
+        self.db = db
+        self.container = container
+        self.cooldown_seconds = cooldown_seconds
+
+    def enqueue(self, recipient: str, kind: str, content: Dict[str, str]) -> Dict[str, Any]:
+        now = time.time()
+        merged = {}
+
+        def merge(draft):
+            merged.update(merge_enqueue(
+                draft if draft.get('id') else None, recipient, kind, content, now, self.cooldown_seconds
+            ))
+            draft.update(merged)
+
+        self.db.read_modify_write(
+            self.container, outbox_message_id(recipient, kind), merge, recipient, default=dict
+        )
+        return merged
+
+    def claim_due(self, limit: int) -> List[Dict[str, Any]]:
+        now = time.time()
+        query = (
+            f"SELECT TOP {int(limit)} * FROM c WHERE (c.status = @pending AND c.notBefore <= @now) "
+            "OR (c.status = @sending AND c.leaseUntil <= @now)"
+        )
+        parameters = [
+            {"name": "@pending", "value": STATUS_PENDING},
+            {"name": "@sending", "value": STATUS_SENDING},
+            {"name": "@now", "value": now}
+        ]
+        claimed = []
+        for message in self.db.query_items(self.container, query, parameters):
+            try:
+                self.db.write_conditional(
+                    self.container, message, claim_message(message, now), message['recipient']
+                )
+            except CosmosAccessConditionFailedError:
+                continue
+            claimed.append(claim_message(message, now))
+        return claimed
+
+    def settle(self, claimed: Dict[str, Any], error: Optional[str], max_attempts: int) -> Optional[Dict[str, Any]]:
+        now = time.time()
+
+        def settle(draft):
+            draft.update(settle_message(draft, claimed, error, now, self.cooldown_seconds, max_attempts))
+
+        settled, _ = self.db.read_modify_write(self.container, claimed['id'], settle, claimed['recipient'])
+        return settled
+
+    def get_message(self, recipient: str, kind: str) -> Optional[Dict[str, Any]]:
+        return self.db.read_item(self.container, outbox_message_id(recipient, kind), recipient)
+
+class EmailServiceTransport:
+    """
+    Delivers outbox messages through ACS. A message counts as sent once
+    ACS accepts it; final delivery is tracked by EmailService.
+    """
+    def __init__(self, email_service=None):
+        self._email_service = email_service
+
+    @property
+    def email_service(self):
+        if self._email_service is None:
+            from shared_code.email_service import get_email_service
+            self._email_service = get_email_service()
+        return self._email_service
+
+    def send(self, message: Dict[str, Any]):
+        content = message['content']
+        if not self.email_service.send_custom_email(
+            message['recipient'], content['subject'], content['plainText'], content['html']
+        ):
+            raise RuntimeError("ACS did not accept the message")
+
+class OutboxDispatcher:
+    """
+    Drains due outbox messages in batches, sending up to `concurrency`
+    messages at a time and rescheduling failures with backoff.
+    on_pending(delay) is called when a delivered message is left pending
+    for later (a retry, or a newer version held by the cooldown).
+    """
+    def __init__(self, store, transport, batch_size: int = DEFAULT_BATCH_SIZE,
+                 concurrency: int = DEFAULT_CONCURRENCY, max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                 on_pending: Optional[Callable[[float], None]] = None):
+        self.store = store
+        self.transport = transport
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.on_pending = on_pending
+
+    def _deliver(self, message: Dict[str, Any]) -> bool:
+        try:
+            self.transport.send(message)
+            error = None
+        except Exception as e:
+            logging.error(f"Outbox delivery to {message['recipient']} failed: {str(e)}")
+            error = str(e)
+        settled = self.store.settle(message, error, self.max_attempts)
+        if self.on_pending is not None and settled is not None and settled.get('status') == STATUS_PENDING:
+            self.on_pending(settled['notBefore'] - time.time())
+        return error is None
+
+    def drain(self, max_batches: Optional[int] = None) -> Dict[str, int]:
+        """
+        Send due messages until none are left (or max_batches is reached)
+        Returns:
+            Counts of claimed, sent and failed deliveries
+        """
+        stats = {"batches": 0, "claimed": 0, "sent": 0, "failed": 0}
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='email-outbox') as executor:
+            while max_batches is None or stats["batches"] < max_batches:
+                batch = self.store.claim_due(self.batch_size)
+                if not batch:
+                    break
+                stats["batches"] += 1
+                stats["claimed"] += len(batch)
+                for delivered in executor.map(self._deliver, batch):
+                    stats["sent" if delivered else "failed"] += 1
+        if stats["claimed"]:
+            logging.info(f"Email outbox drained: {stats}")
+        return stats
+
+_outbox_lock = threading.Lock()
+_outbox = None
+_kick_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='email-outbox-kick')
+_kick_pending = threading.Event()
+
+def create_outbox_store():
+    """
+    Build the configured store: EMAIL_OUTBOX_STORE=cosmos (default) or sqlite
+    """
+    if os.environ.get('EMAIL_OUTBOX_STORE', 'cosmos') == 'sqlite':
+        return SQLiteOutboxStore(os.environ.get('EMAIL_OUTBOX_SQLITE_PATH', 'email_outbox.db'))
+    from shared_code.db_operations import CosmosOperator
+    db = CosmosOperator()
+    return CosmosOutboxStore(db, db.get_culvana_container("email_outbox"))
+
+def get_email_outbox() -> OutboxDispatcher:
+    """
+    Return the process-wide outbox dispatcher, creating it on first use
+    """
+    global _outbox
+    if _outbox is None:
+        with _outbox_lock:
+            if _outbox is None:
+                _outbox = OutboxDispatcher(create_outbox_store(), EmailServiceTransport(), on_pending=kick_dispatcher)
+    return _outbox
+
+def enqueue_email(recipient: str, subject: str, plain_text: str, html_content: str,
+                  kind: str = KIND_CUSTOM) -> Dict[str, Any]:
+    content = {"subject": subject, "plainText": plain_text, "html": html_content}
+    message = get_email_outbox().store.enqueue(recipient, kind, content)
+    # a message held by the cooldown is drained when it falls due, so later resends collapse into it
+    kick_dispatcher(message['notBefore'] - time.time())
+    return message
+
+def enqueue_otp_email(recipient: str, otp: str) -> Dict[str, Any]:
+    """
+    Queue a verification code for delivery. Repeated calls for the same
+    recipient collapse into one delivery of the latest code.
+    """
+    from shared_code.email_service import build_otp_content
+    subject, plain_text, html_content = build_otp_content(otp)
+    return enqueue_email(recipient, subject, plain_text, html_content, kind=KIND_OTP)
+
+def kick_dispatcher(delay: float = 0.0):
+    """
+    Drain the outbox in the background, after `delay` seconds, so messages
+    go out as soon as they are due without waiting for the timer; a drain
+    already queued picks up new messages too
+    """
+    if delay > 0:
+        timer = threading.Timer(delay, kick_dispatcher)
+        timer.daemon = True
+        timer.start()
+        return
+    if _kick_pending.is_set():
+        return
+
+    def run():
+        _kick_pending.clear()
+        try:
+            get_email_outbox().drain()
+        except Exception as e:
+            logging.error(f"Email outbox drain failed: {str(e)}", exc_info=True)
+
+    _kick_pending.set()
+    _kick_executor.submit(run)
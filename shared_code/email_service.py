@@ -1,15 +1,59 @@
 from azure.communication.email import EmailClient
+from concurrent.futures import ThreadPoolExecutor
 import logging
 import os
-import time
-from typing import Optional, Dict, Any
+import threading
+from typing import Callable, Optional, Dict, Any
+from shared_code.email_templates import OTP_TEMPLATE, templates
+
+DELIVERY_TIMEOUT_SECONDS = 120
+
+# Delivery tracking runs here, off the request path, once ACS has accepted a message
+_delivery_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('EMAIL_DELIVERY_WORKERS', 4)),
+    thread_name_prefix='email-delivery'
+)
+
+def log_delivery_status(recipient_email: str, status: str, result: Optional[Any], error: Optional[Exception]):
+    """
+    Default delivery callback: record the final state of a send
+    """
+    if error is not None:
+        logging.error(f"Email delivery to {recipient_email} failed: {str(error)}")
+    elif status != "Succeeded":
+        logging.error(f"Email delivery to {recipient_email} finished with status {status}: {result}")
+    else:
+        message_id = result.get('id') if isinstance(result, dict) else getattr(result, 'message_id', None)
+        logging.info(f"Email delivered to {recipient_email} (message id: {message_id})")
+
+def build_otp_content(otp: str, expires_minutes: int = 10):
+    """
+    Render the verification code email
+    Returns:
+        (subject, plain text, html)
+    """
+    return templates.render(OTP_TEMPLATE, otp=otp, expires_minutes=expires_minutes)
+
+def wait_for_delivery_default() -> bool:
+    return os.environ.get('EMAIL_WAIT_FOR_DELIVERY', 'false').lower() == 'true'
 
 class EmailService:
-    def __init__(self):
+    def __init__(self, email_client=None):
         try:
-            connection_string = os.environ['AZURE_COMMUNICATION_SERVICES_CONNECTION_STRING']
             self.sender_address = os.environ.get('SENDER_EMAIL_ADDRESS', 'noreply@culvana.com')
-            self.email_client = EmailClient.from_connection_string(connection_string)
+            if email_client is None:
+                connection_string = os.environ['AZURE_COMMUNICATION_SERVICES_CONNECTION_STRING']
+                email_client = EmailClient.from_connection_string(connection_string)
+            self.email_client = email_client
+            # identical for every message, so built once and shared
+            self.headers = {
+                "X-Priority": "1",
+                "X-MSMail-Priority": "High",
+                "Importance": "high",
+                "X-Microsoft-AntiSpam": "BCL:0",
+                "X-Microsoft-AntiSpam-Message-Info": "None",
+                "List-Unsubscribe": f"<mailto:unsubscribe@{self.sender_address.split('@')[1]}>"
+            }
             logging.info(f"EmailService initialized with sender: {self.sender_address}")
             
             self.verify_domain_setup()
@@ -48,27 +92,15 @@ class EmailService:
             "recipients": {
                 "to": [{"address": recipient_email}]
             },
-            "headers": {
-                "X-Priority": "1",
-                "X-MSMail-Priority": "High",
-                "Importance": "high",
-                "X-Microsoft-AntiSpam": "BCL:0",
-                "X-Microsoft-AntiSpam-Message-Info": "None",
-                "List-Unsubscribe": f"<mailto:unsubscribe@{self.sender_address.split('@')[1]}>"
-            }
+            "headers": self.headers
         }
 
     def monitor_send_operation(self, poller) -> Optional[Any]:
         """
-        Monitor the email sending operation
+        Block until the email sending operation finishes
         """
         try:
-            while not poller.done():
-                time.sleep(2)
-                status = poller.status()
-                logging.info(f"Email sending status: {status}")
-            
-            result = poller.result()
+            result = poller.result(timeout=DELIVERY_TIMEOUT_SECONDS)
             logging.info(f"Email send result: {result}")
             
             if hasattr(result, 'message_id'):
@@ -80,64 +112,92 @@ class EmailService:
             logging.error(f"Error monitoring send operation: {str(e)}", exc_info=True)
             return None
 
-    def send_otp_email(self, recipient_email: str, otp: str) -> bool:
+    def track_delivery(self, poller, recipient_email: str,
+                       on_complete: Callable = log_delivery_status):
+        """
+        Follow an accepted send to completion in the background and report
+        its final state to on_complete(recipient, status, result, error)
+        """
+        def wait():
+            result = None
+            error = None
+            try:
+                result = poller.result(timeout=DELIVERY_TIMEOUT_SECONDS)
+            except Exception as e:
+                error = e
+            status = result.get('status') if isinstance(result, dict) else poller.status()
+            try:
+                on_complete(recipient_email, status, result, error)
+            except Exception as e:
+                logging.error(f"Email delivery callback failed: {str(e)}", exc_info=True)
+
+        return _delivery_executor.submit(wait)
+
+    def send_message(self, message: Dict[str, Any], recipient_email: str,
+                     wait_for_delivery: Optional[bool] = None,
+                     on_complete: Callable = log_delivery_status) -> bool:
+        """
+        Submit a message to ACS.
+        By default this returns as soon as ACS has accepted the message and
+        delivery is tracked in the background; with wait_for_delivery=True it
+        blocks until the send operation completes.
+        Returns:
+            bool: True if the message was accepted (or delivered, when waiting)
+        """
+        if wait_for_delivery is None:
+            wait_for_delivery = wait_for_delivery_default()
+
+        poller = self.email_client.begin_send(message)
+
+        if wait_for_delivery:
+            return self.monitor_send_operation(poller) is not None
+
+        self.track_delivery(poller, recipient_email, on_complete)
+        return True
+
+    def send_otp_email(self, recipient_email: str, otp: str,
+                       wait_for_delivery: Optional[bool] = None,
+                       on_complete: Callable = log_delivery_status) -> bool:
         """
         Send OTP email using Azure Communication Services
         Args:
             recipient_email: The recipient's email address
             otp: The one-time password to send
+            wait_for_delivery: Block until delivery completes instead of
+                returning once ACS accepts the message
+            on_complete: Delivery status callback for background tracking
         Returns:
             bool: True if email was sent successfully, False otherwise
         """
-        try:
-            logging.info(f"Attempting to send OTP email to {recipient_email}")
-            
-            plain_text = f"Your verification code is: {otp}\nThis code will expire in 10 minutes."
-            html_content = f"""
-                <html>
-                <body style="font-family: Arial, sans-serif;">
-                    <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                        <h2 style="color: #333;">Your Verification Code</h2>
-                        <p>Your verification code is: <strong style="font-size: 18px;">{otp}</strong></p>
-                        <p>This code will expire in 10 minutes.</p>
-                        <hr style="border: 1px solid #eee; margin: 20px 0;">
-                        <p style="color: #666; font-size: 12px;">
-                            This is an automated message, please do not reply.
-                        </p>
-                    </div>
-                </body>
-                </html>
-            """
-
-            message = self.create_email_message(
-                recipient_email=recipient_email,
-                subject="Your Verification Code",
-                plain_text=plain_text,
-                html_content=html_content
-            )
+        return self.send_template_email(
+            recipient_email, OTP_TEMPLATE, wait_for_delivery, on_complete, otp=otp, expires_minutes=10
+        )
 
-            logging.info(f"Sending message structure: {message}")
-            
-            poller = self.email_client.begin_send(message)
-            
-            result = self.monitor_send_operation(poller)
-            
-            if result:
-                logging.info(f"Email successfully sent to {recipient_email}")
-                return True
-            else:
-                logging.error(f"Failed to send email to {recipient_email}")
-                return False
-            
-        except Exception as e:
-            logging.error(f"Failed to send OTP email: {str(e)}", exc_info=True)
-            logging.error(f"Full error details - Type: {type(e)}, Args: {e.args}")
-            logging.error(f"Sender address: {self.sender_address}")
-            logging.error(f"Recipient: {recipient_email}")
+    def send_template_email(self, recipient_email: str, template_name: str,
+                            wait_for_delivery: Optional[bool] = None,
+                            on_complete: Callable = log_delivery_status, **values) -> bool:
+        """
+        Render a registered template (otp, welcome, password_reset) and send it
+        Args:
+            recipient_email: The recipient's email address
+            template_name: Name of the template in shared_code.email_templates
+            values: Values for the template's placeholders
+        Returns:
+            bool: True if email was sent successfully, False otherwise
+        """
+        try:
+            subject, plain_text, html_content = templates.render(template_name, **values)
+        except KeyError as e:
+            logging.error(f"Cannot render email template {template_name}: unknown template or missing value {str(e)}")
             return False
+        return self.send_custom_email(
+            recipient_email, subject, plain_text, html_content, wait_for_delivery, on_complete
+        )
 
     def send_custom_email(self, recipient_email: str, subject: str, 
-                         plain_text: str, html_content: str) -> bool:
+                         plain_text: str, html_content: str,
+                         wait_for_delivery: Optional[bool] = None,
+                         on_complete: Callable = log_delivery_status) -> bool:
         """
         Send a custom email using Azure Communication Services
         Args:
@@ -145,11 +205,13 @@ class EmailService:
             subject: Email subject
             plain_text: Plain text version of the email
             html_content: HTML version of the email
+            wait_for_delivery: Block until delivery completes
+            on_complete: Delivery status callback for background tracking
         Returns:
             bool: True if email was sent successfully, False otherwise
         """
         try:
-            logging.info(f"Attempting to send custom email to {recipient_email}")
+            logging.info(f"Attempting to send email to {recipient_email}")
             
             message = self.create_email_message(
                 recipient_email=recipient_email,
@@ -158,11 +220,7 @@ class EmailService:
                 html_content=html_content
             )
             
-            poller = self.email_client.begin_send(message)
-            
-            result = self.monitor_send_operation(poller)
-            
-            if result:
+            if self.send_message(message, recipient_email, wait_for_delivery, on_complete):
                 logging.info(f"Custom email successfully sent to {recipient_email}")
                 return True
             else:
@@ -173,4 +231,18 @@ class EmailService:
             logging.error(f"Failed to send custom email: {str(e)}", exc_info=True)
             logging.error(f"Sender address: {self.sender_address}")
             logging.error(f"Recipient: {recipient_email}")
-            return False
\ No newline at end of file
+            return False
+
+_email_service_lock = threading.Lock()
+_email_service = None
+
+def get_email_service() -> EmailService:
+    """
+    Return the process-wide EmailService, creating it (and its EmailClient) on first use
+    """
+    global _email_service
+    if _email_service is None:
+        with _email_service_lock:
+            if _email_service is None:
+                _email_service = EmailService()
+    return _email_service
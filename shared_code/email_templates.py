@@ -0,0 +1,125 @@
+from html import escape as html_escape
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+_PLACEHOLDER = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+class CompiledTemplate:
+    """
+    A text template split once into literal pieces and {{ field }}
+    placeholders, rendered by joining the pieces with the values
+    """
+    def __init__(self, source: str, escape: Optional[Callable[[str], str]] = None):
+        self.source = source
+        self.escape = escape
+        self.literals: List[str] = []
+        self.fields: List[str] = []
+        position = 0
+        for match in _PLACEHOLDER.finditer(source):
+            self.literals.append(source[position:match.start()])
+            self.fields.append(match.group(1))
+            position = match.end()
+        self.literals.append(source[position:])
+
+    def render(self, values: Dict[str, str]) -> str:
+        pieces = [self.literals[0]]
+        for field, literal in zip(self.fields, self.literals[1:]):
+            value = str(values[field])
+            pieces.append(self.escape(value) if self.escape else value)
+            pieces.append(literal)
+        return ''.join(pieces)
+
+class EmailTemplate:
+    def __init__(self, name: str, subject: str, plain_text: str, html: str):
+        self.name = name
+        self.subject = CompiledTemplate(subject)
+        self.plain_text = CompiledTemplate(plain_text)
+        self.html = CompiledTemplate(html, escape=html_escape)
+
+    def render(self, **values) -> Tuple[str, str, str]:
+        """
+        Returns:
+            (subject, plain text, html)
+        """
+        return self.subject.render(values), self.plain_text.render(values), self.html.render(values)
+
+class TemplateNotFound(KeyError):
+    pass
+
+class TemplateRegistry:
+    def __init__(self):
+        self._templates: Dict[str, EmailTemplate] = {}
+
+    def register(self, name: str, subject: str, plain_text: str, html: str) -> EmailTemplate:
+        template = EmailTemplate(name, subject, plain_text, html)
+        self._templates[name] = template
+        return template
+
+    def get(self, name: str) -> EmailTemplate:
+        try:
+            return self._templates[name]
+        except KeyError:
+            raise TemplateNotFound(name)
+
+    def render(self, template_name: str, /, **values) -> Tuple[str, str, str]:
+        return self.get(template_name).render(**values)
+
+    def names(self) -> List[str]:
+        return list(self._templates)
+
+_FOOTER = """
+                <hr style="border: 1px solid #eee; margin: 20px 0;">
+                <p style="color: #666; font-size: 12px;">
+                    This is an automated message, please do not reply.
+                </p>"""
+
+def _html_page(body: str) -> str:
+    return f"""
+        <html>
+        <body style="font-family: Arial, sans-serif;">
+            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">{body}{_FOOTER}
+            </div>
+        </body>
+        </html>
+    """
+
+OTP_TEMPLATE = "otp"
+WELCOME_TEMPLATE = "welcome"
+PASSWORD_RESET_TEMPLATE = "password_reset"
+
+templates = TemplateRegistry()
+
+templates.register(
+    OTP_TEMPLATE,
+    subject="Your Verification Code",
+    plain_text="Your verification code is: {{ otp }}\nThis code will expire in {{ expires_minutes }} minutes.",
+    html=_html_page("""
+                <h2 style="color: #333;">Your Verification Code</h2>
+                <p>Your verification code is: <strong style="font-size: 18px;">{{ otp }}</strong></p>
+                <p>This code will expire in {{ expires_minutes }} minutes.</p>""")
+)
+
+templates.register(
+    WELCOME_TEMPLATE,
+    subject="Welcome to Culvana",
+    plain_text="Welcome to Culvana, {{ name }}!\nYour account is ready. Sign in with {{ email }} to get started.",
+    html=_html_page("""
+                <h2 style="color: #333;">Welcome to Culvana, {{ name }}!</h2>
+                <p>Your account is ready. Sign in with <strong>{{ email }}</strong> to get started.</p>""")
+)
+
+templates.register(
+    PASSWORD_RESET_TEMPLATE,
+    subject="Reset Your Password",
+    plain_text=(
+        "We received a request to reset your password.\n"
+        "Your reset code is: {{ code }}\nThis code will expire in {{ expires_minutes }} minutes.\n"
+        "If you did not request this, you can ignore this email."
+    ),
+    html=_html_page("""
+                <h2 style="color: #333;">Reset Your Password</h2>
+                <p>We received a request to reset your password.</p>
+                <p>Your reset code is: <strong style="font-size: 18px;">{{ code }}</strong></p>
+                <p>This code will expire in {{ expires_minutes }} minutes.</p>
+                <p>If you did not request this, you can ignore this email.</p>""")
+)
@@ -0,0 +1,27 @@
+INVENTORY_RESPONSE_FIELDS = (
+    "Supplier Name",
+    "Inventory Item Name",
+    "Inventory Unit of Measure",
+    "Brand",
+    "Item Name",
+    "Item Number",
+    "Quantity In a Case",
+    "Measurement Of Each Item",
+    "Measured In",
+    "Total Units",
+    "Case Price",
+    "Catch Weight",
+    "Priced By",
+    "Splitable",
+    "Split Price",
+    "Cost of a Unit",
+    "Category",
+    "Location",
+    "Active",
+    "timestamp",
+    "batchNumber"
+)
+
+def format_inventory_response(item, fields=INVENTORY_RESPONSE_FIELDS):
+    """Format invoice item for frontend inventory display"""
+    return {field: item.get(field, "") for field in fields}
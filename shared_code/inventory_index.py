@@ -0,0 +1,180 @@
+import bisect
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+INACTIVE_VALUES = {"no", "false", "inactive", "0"}
+
+SORT_FIELDS = {
+    "name": "Inventory Item Name",
+    "category": "Category",
+    "supplier": "Supplier Name",
+    "location": "Location",
+    "price": "Case Price",
+    "timestamp": "timestamp"
+}
+
+def _normalize(value: Any) -> str:
+    return str(value).strip().lower() if value is not None else ""
+
+def item_name(item: Dict[str, Any]) -> str:
+    return item.get("Inventory Item Name") or item.get("Item Name") or ""
+
+def item_locations(item: Dict[str, Any]) -> List[str]:
+    """The legacy Location string plus the names in Locations"""
+    names = [item.get("Location")]
+    names += [location.get("name") for location in item.get("Locations") or [] if isinstance(location, dict)]
+    return [name for name in names if name]
+
+def is_active(item: Dict[str, Any]) -> bool:
+    """Items are active unless Active says otherwise ("No", False, ...)"""
+    value = item.get("Active")
+    if value is False:
+        return False
+    return _normalize(value) not in INACTIVE_VALUES
+
+def _sort_key(value: Any) -> Tuple[int, Any]:
+    # numbers before strings, missing values last; mixed types never compare
+    if isinstance(value, bool) or value is None or value == "":
+        return (2, "")
+    if isinstance(value, (int, float)):
+        return (0, value)
+    return (1, _normalize(value))
+
+class InventoryIndex:
+    """
+    Inverted indexes over one version of a user's inventory items:
+    category, supplier and location -> ascending item positions, the
+    positions of active and inactive items, and (name, position) pairs
+    sorted by lower-cased name for prefix search. Sort orders are ranked
+    lazily, once per field. Read-only once built.
+    """
+    def __init__(self, items: List[Dict[str, Any]], etag: Optional[str] = None):
+        self.items = items
+        self.etag = etag
+        self.postings: Dict[str, Dict[str, List[int]]] = {"category": {}, "supplier": {}, "location": {}}
+        self.active: List[int] = []
+        self.inactive: List[int] = []
+        names = []
+        for position, item in enumerate(items):
+            self._post("category", item.get("Category"), position)
+            self._post("supplier", item.get("Supplier Name"), position)
+            for location in dict.fromkeys(_normalize(name) for name in item_locations(item)):
+                self._post("location", location, position)
+            (self.active if is_active(item) else self.inactive).append(position)
+            names.append((_normalize(item_name(item)), position))
+        names.sort()
+        self.names = [name for name, _ in names]
+        self.name_positions = [position for _, position in names]
+        self._ranks: Dict[str, List[int]] = {}
+        self._ranks_lock = threading.Lock()
+
+    def _post(self, facet: str, value: Any, position: int):
+        key = _normalize(value)
+        if key:
+            self.postings[facet].setdefault(key, []).append(position)
+
+    def with_prefix(self, prefix: str) -> List[int]:
+        prefix = _normalize(prefix)
+        start = bisect.bisect_left(self.names, prefix)
+        end = bisect.bisect_left(self.names, prefix + "\uffff", start)
+        return self.name_positions[start:end]
+
+    def ranks(self, sort: str) -> List[int]:
+        """rank[position] = the item's place when sorted by the given field"""
+        ranks = self._ranks.get(sort)
+        if ranks is None:
+            field = SORT_FIELDS[sort]
+            if sort == "name":
+                ordered = self.name_positions
+            else:
+                ordered = sorted(range(len(self.items)), key=lambda position: _sort_key(self.items[position].get(field)))
+            ranks = [0] * len(self.items)
+            for rank, position in enumerate(ordered):
+                ranks[position] = rank
+            with self._ranks_lock:
+                self._ranks[sort] = ranks
+        return ranks
+
+    def search(self, filters: Dict[str, List[str]], active: Optional[bool] = None,
+               prefix: Optional[str] = None, sort: Optional[str] = None,
+               descending: bool = False) -> List[int]:
+        """
+        Positions of the items matching every filter, in the requested order
+        (item order when sort is None)
+        Args:
+            filters: facet -> accepted values (any of them matches)
+        """
+        candidates: List[Iterable[int]] = []
+        for facet, values in filters.items():
+            postings = self.postings[facet]
+            if len(values) == 1:
+                candidates.append(postings.get(_normalize(values[0]), []))
+            else:
+                candidates.append(sorted({p for value in values for p in postings.get(_normalize(value), [])}))
+        if active is not None:
+            candidates.append(self.active if active else self.inactive)
+        if prefix:
+            candidates.append(self.with_prefix(prefix))
+
+        if not candidates:
+            matches = list(range(len(self.items)))
+        else:
+            # walk the shortest list and probe the others as sets
+            candidates.sort(key=len)
+            others = [set(positions) for positions in candidates[1:]]
+            matches = [p for p in candidates[0] if all(p in other for other in others)]
+            matches.sort()
+
+        if sort is not None:
+            ranks = self.ranks(sort)
+            matches.sort(key=ranks.__getitem__, reverse=descending)
+        elif descending:
+            matches.reverse()
+        return matches
+
+class InventoryIndexCache:
+    """
+    Per-user LRU of InventoryIndex entries. An entry is only served for
+    the document version (_etag) it was built from.
+    """
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, InventoryIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "builds": 0}
+
+    def get(self, email: str, etag: Optional[str]) -> Optional[InventoryIndex]:
+        if etag is None:
+            return None
+        with self._lock:
+            index = self._entries.get(email)
+            if index is None or index.etag != etag:
+                return None
+            self._entries.move_to_end(email)
+            self._stats["hits"] += 1
+            return index
+
+    def build(self, email: str, document: Dict[str, Any]) -> InventoryIndex:
+        index = InventoryIndex(document.get("items") or [], document.get("_etag"))
+        with self._lock:
+            self._stats["builds"] += 1
+            if index.etag is not None:
+                self._entries[email] = index
+                self._entries.move_to_end(email)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return index
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        return stats
+
+inventory_indexes = InventoryIndexCache(int(os.environ.get('INVENTORY_INDEX_CACHE_SIZE', 64)))
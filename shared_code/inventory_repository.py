@@ -0,0 +1,342 @@
+import logging
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import Optional, Dict, Any, List
+from shared_code.patch_operations import json_pointer, op_set
+from shared_code.projection import object_projection, select_fields
+
+STORAGE_MODE_DOCUMENT = "document"
+STORAGE_MODE_PER_ITEM = "per_item"
+INVENTORY_ITEM_DOC_TYPE = "inventoryItem"
+SYSTEM_FIELDS = ("id", "userId", "docType", "position", "_rid", "_self", "_etag", "_attachments", "_ts")
+
+class InventoryDocumentNotFound(Exception):
+    pass
+
+def get_inventory_storage_mode() -> str:
+    return os.environ.get('INVENTORY_STORAGE_MODE', STORAGE_MODE_DOCUMENT)
+
+LEGACY_ITEM_ID_PREFIX = "legacy-"
+
+def legacy_item_id(position: int) -> str:
+    """
+    Document id of the item at `position` in a user's legacy items array.
+    Ids are scoped to the user's partition, so the position alone is stable
+    across migration reruns and unique even when Item Numbers repeat.
+    """
+    return f"{LEGACY_ITEM_ID_PREFIX}{position}"
+
+def new_item_id() -> str:
+    return "item-" + uuid.uuid4().hex
+
+def to_item_document(email: str, item: Dict[str, Any], position: int, item_id: str) -> Dict[str, Any]:
+    return {
+        **item,
+        "id": item_id,
+        "userId": email,
+        "docType": INVENTORY_ITEM_DOC_TYPE,
+        "position": position
+    }
+
+def from_item_document(document: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in document.items() if key not in SYSTEM_FIELDS}
+
+class InventoryRepository:
+    """
+    Inventory storage for one container in either of two layouts:
+
+    - "document": all items in the user's document (id=email, items: [...])
+    - "per_item": one document per item in the user's partition, plus the
+      user's document as a small header holding supplier_name/timestamp/
+      last_updated and the batchCounter new items are numbered from. Items
+      are looked up by Item Number with a query, since Item Numbers are
+      optional and may repeat.
+
+    In per_item mode a header without storageMode="per_item" has not been
+    migrated yet; reads are served from its items array (dual read) and the
+    first write migrates it.
+    """
+    def __init__(self, db, container, storage_mode: Optional[str] = None):
+        self.db = db
+        self.container = container
+        self.storage_mode = storage_mode or get_inventory_storage_mode()
+
+    @staticmethod
+    def is_migrated(header: Optional[Dict[str, Any]]) -> bool:
+        return bool(header) and header.get('storageMode') == STORAGE_MODE_PER_ITEM
+
+    async def get_inventory(self, email: str, fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Args:
+            fields: Only return these item fields, selected server side.
+                Names must be whitelisted by the caller.
+        Returns:
+            A document-shaped dict with the user's items, or None if the user has no inventory
+        """
+        if fields:
+            return await self._get_projected_inventory(email, fields)
+        header = await self.db.read_item_cached(self.container, email)
+        if self.storage_mode != STORAGE_MODE_PER_ITEM or not self.is_migrated(header):
+            return header
+
+        items = await self.list_item_documents(email)
+        return {**header, "items": [from_item_document(document) for document in items]}
+
+    async def _get_projected_inventory(self, email: str, fields: List[str]) -> Optional[Dict[str, Any]]:
+        if self.storage_mode == STORAGE_MODE_PER_ITEM:
+            header = await self.db.read_item_cached(self.container, email)
+            if header is None:
+                return None
+            if not self.is_migrated(header):
+                return {**header, "items": [select_fields(item, fields) for item in header.get('items', [])]}
+            query = (
+                f"SELECT VALUE {object_projection('c', fields)} FROM c "
+                "WHERE c.userId = @email AND c.docType = @docType ORDER BY c.position"
+            )
+            parameters = [
+                {"name": "@email", "value": email},
+                {"name": "@docType", "value": INVENTORY_ITEM_DOC_TYPE}
+            ]
+            items = await self.db.query_items(self.container, query, parameters, partition_key=email)
+            return {**header, "items": items}
+
+        query = (
+            "SELECT c.id, c.supplier_name, c.timestamp, c._etag, "
+            f"ARRAY(SELECT VALUE {object_projection('i', fields)} FROM i IN c.items) AS items "
+            "FROM c WHERE c.id = @email"
+        )
+        parameters = [{"name": "@email", "value": email}]
+        results = await self.db.query_items(self.container, query, parameters, partition_key=email)
+        return results[0] if results else None
+
+    async def get_inventory_etag(self, email: str) -> Optional[str]:
+        """
+        Version of the user's inventory. Per-item writes also touch the
+        header, so its _etag covers both layouts.
+        """
+        return await self.db.read_etag(self.container, email)
+
+    async def list_item_documents(self, email: str) -> List[Dict[str, Any]]:
+        query = "SELECT * FROM c WHERE c.userId = @email AND c.docType = @docType ORDER BY c.position"
+        parameters = [
+            {"name": "@email", "value": email},
+            {"name": "@docType", "value": INVENTORY_ITEM_DOC_TYPE}
+        ]
+        return await self.db.query_items(self.container, query, parameters, partition_key=email)
+
+    async def count_items(self, email: str) -> int:
+        query = "SELECT VALUE COUNT(1) FROM c WHERE c.userId = @email AND c.docType = @docType"
+        parameters = [
+            {"name": "@email", "value": email},
+            {"name": "@docType", "value": INVENTORY_ITEM_DOC_TYPE}
+        ]
+        result = await self.db.query_items(self.container, query, parameters, partition_key=email)
+        return result[0] if result else 0
+
+    async def find_item_ids(self, email: str, item_number) -> List[str]:
+        """
+        Ids of the user's item documents with the given Item Number, in list order
+        """
+        query = (
+            "SELECT VALUE c.id FROM c WHERE c.userId = @email AND c.docType = @docType "
+            'AND c["Item Number"] = @itemNumber ORDER BY c.position'
+        )
+        parameters = [
+            {"name": "@email", "value": email},
+            {"name": "@docType", "value": INVENTORY_ITEM_DOC_TYPE},
+            {"name": "@itemNumber", "value": item_number}
+        ]
+        return await self.db.query_items(self.container, query, parameters, partition_key=email)
+
+    async def migrate_user(self, email: str, header: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Split a user's items array into per-item documents. Each item's id is
+        derived from its position in the array and item writes are upserts,
+        so rerunning an interrupted migration overwrites what the earlier run
+        wrote; legacy documents beyond the current array are removed. The
+        header is only flipped once every item is written.
+        Returns:
+            Number of item documents written
+        """
+        if header is None:
+            header = await self.db.read_item(self.container, email)
+        if header is None or self.is_migrated(header):
+            return 0
+
+        items = header.get('items', [])
+        written_ids = set()
+        for position, item in enumerate(items):
+            document = to_item_document(email, item, position, legacy_item_id(position))
+            await self.db.upsert_item(self.container, document)
+            written_ids.add(document['id'])
+        for document in await self.list_item_documents(email):
+            if document['id'].startswith(LEGACY_ITEM_ID_PREFIX) and document['id'] not in written_ids:
+                await self.db.delete_item(self.container, document['id'], email)
+
+        item_numbers = [item.get('Item Number') for item in items if item.get('Item Number')]
+        duplicates = len(item_numbers) - len(set(map(str, item_numbers)))
+        if duplicates:
+            logging.warning(f"{duplicates} inventory items for {email} repeat an Item Number; kept as separate documents")
+
+        migrated_header = {key: value for key, value in header.items() if key != 'items'}
+        migrated_header.update({
+            "userId": header.get('userId', email),
+            "storageMode": STORAGE_MODE_PER_ITEM,
+            "batchCounter": len(items),
+            "migratedAt": datetime.utcnow().isoformat()
+        })
+        # conditioned on the header we split, so a concurrent legacy write fails this run instead of being lost
+        await self.db.write_conditional(self.container, header, migrated_header)
+        logging.info(f"Migrated {len(items)} inventory items for {email} to per-item documents")
+        return len(items)
+
+    async def _prepare_per_item_write(self, email: str, create: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Load the user's header for a per-item write, migrating it first if needed
+        """
+        header = await self.db.read_item(self.container, email)
+        if header is None:
+            if not create:
+                return None
+            return {"id": email, "userId": email, "storageMode": STORAGE_MODE_PER_ITEM}
+        if not self.is_migrated(header):
+            await self.migrate_user(email, header)
+            header = await self.db.read_item(self.container, email)
+        return header
+
+    async def _touch_header(self, email: str, current_date: str, **fields) -> Dict[str, Any]:
+        """
+        Stamp last_updated (and any extra fields) on an existing header with one patch
+        Returns:
+            The written header
+        """
+        fields['last_updated'] = current_date
+        operations = [op_set(json_pointer(key), value) for key, value in fields.items()]
+        return await self.db.patch_item(self.container, email, operations, email)
+
+    async def add_item(self, email: str, item: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Append an item, assigning its batchNumber
+        """
+        current_date = item.get('timestamp') or datetime.utcnow().isoformat()
+        if self.storage_mode != STORAGE_MODE_PER_ITEM:
+            def append(user_doc):
+                items = user_doc.get('items') or []
+                item['batchNumber'] = len(items) + 1
+                user_doc['items'] = items + [item]
+                user_doc['last_updated'] = current_date
+
+            await self.db.read_modify_write(self.container, email, append, default=lambda: {
+                "id": email,
+                "userId": email,
+                "items": [],
+                "last_updated": ""
+            })
+            return item
+
+        header = await self._prepare_per_item_write(email, create=True)
+        _, item['batchNumber'] = await self._allocate_batch_number(email, header, current_date)
+        await self.db.upsert_item(self.container, to_item_document(email, item, time.time_ns(), new_item_id()))
+        return item
+
+    async def _allocate_batch_number(self, email: str, header: Dict[str, Any], current_date: str):
+        """
+        Take the next batchNumber from the header's counter with an
+        _etag-conditioned write, so concurrent adds never share one. The
+        same write stamps last_updated, making it the add's only header write.
+        Headers migrated before the counter existed start from the item count.
+        Returns:
+            (written header, allocated batchNumber)
+        """
+        start = 0 if header.get('batchCounter') is not None else await self.count_items(email)
+
+        def allocate(draft):
+            counter = draft.get('batchCounter')
+            draft['batchCounter'] = (start if counter is None else counter) + 1
+            draft['last_updated'] = current_date
+            return draft['batchCounter']
+
+        return await self.db.read_modify_write(self.container, email, allocate, default=lambda: dict(header))
+
+    async def update_item(self, email: str, item_number, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Update the item with the given Item Number (the first, if several share it),
+        patching only the changed fields
+        Returns:
+            The user's inventory as a document-shaped dict in either layout,
+            or None if no such item exists
+        Raises:
+            InventoryDocumentNotFound: the user has no inventory
+        """
+        current_date = fields.get('timestamp') or datetime.utcnow().isoformat()
+        if self.storage_mode != STORAGE_MODE_PER_ITEM:
+            def update(user_doc):
+                items = user_doc.get('items', [])
+                for index, item in enumerate(items):
+                    if item.get('Item Number') == item_number:
+                        user_doc['items'] = items[:index] + [{**item, **fields}] + items[index + 1:]
+                        user_doc['last_updated'] = current_date
+                        return True
+                return False
+
+            written, found = await self.db.read_modify_write(self.container, email, update)
+            if written is None:
+                raise InventoryDocumentNotFound(email)
+            return written if found else None
+
+        header = await self._prepare_per_item_write(email)
+        if header is None:
+            raise InventoryDocumentNotFound(email)
+        item_ids = await self.find_item_ids(email, item_number)
+        if not item_ids:
+            return None
+        result, _ = await self.db.read_modify_write(
+            self.container, item_ids[0], lambda document: document.update(fields), email
+        )
+        if result is None:
+            return None
+        header = await self._touch_header(email, current_date)
+        items = await self.list_item_documents(email)
+        return {**header, "items": [from_item_document(document) for document in items]}
+
+    async def delete_item(self, email: str, item_number) -> Optional[int]:
+        """
+        Delete every item with the given Item Number
+        Returns:
+            The remaining item count, or None if no such item exists
+        Raises:
+            InventoryDocumentNotFound: the user has no inventory
+        """
+        if self.storage_mode != STORAGE_MODE_PER_ITEM:
+            def remove(document):
+                if 'items' not in document:
+                    raise ValueError("Invalid document structure - missing items array")
+                remaining = [
+                    item for item in document['items']
+                    if item.get('Item Number') != item_number
+                ]
+                if len(remaining) == len(document['items']):
+                    return None
+                document['items'] = remaining
+                document['itemCount'] = len(remaining)
+                return len(remaining)
+
+            written, item_count = await self.db.read_modify_write(self.container, email, remove)
+            if written is None:
+                raise InventoryDocumentNotFound(email)
+            return item_count
+
+        header = await self._prepare_per_item_write(email)
+        if header is None:
+            raise InventoryDocumentNotFound(email)
+        deleted = [
+            await self.db.delete_item(self.container, item_id, email)
+            for item_id in await self.find_item_ids(email, item_number)
+        ]
+        if not any(deleted):
+            return None
+        item_count = await self.count_items(email)
+        await self._touch_header(email, datetime.utcnow().isoformat(), itemCount=item_count)
+        return item_count
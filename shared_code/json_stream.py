@@ -0,0 +1,62 @@
+from typing import Any, Iterable, Iterator
+from shared_code.serialization import dumps, separators
+
+class StreamedArray:
+    """
+    Marks an iterable to be encoded lazily as a JSON array, one element at a time
+    """
+    def __init__(self, iterable: Iterable[Any]):
+        self.iterable = iterable
+
+def _contains_stream(value: Any) -> bool:
+    if isinstance(value, StreamedArray):
+        return True
+    if isinstance(value, dict):
+        return any(_contains_stream(item) for item in value.values())
+    return False
+
+def iter_json(value: Any) -> Iterator[bytes]:
+    """
+    Encode value as UTF-8 JSON in pieces. The concatenated output is identical
+    to serialization.dumps(value) with StreamedArray values replaced by lists.
+    Values without a StreamedArray inside are encoded in one call.
+    """
+    item_separator, key_separator = separators()
+    if isinstance(value, StreamedArray):
+        yield b'['
+        first = True
+        for item in value.iterable:
+            if not first:
+                yield item_separator
+            first = False
+            yield from iter_json(item)
+        yield b']'
+    elif _contains_stream(value) and all(isinstance(key, str) for key in value):
+        yield b'{'
+        first = True
+        for key, item in value.items():
+            if not first:
+                yield item_separator
+            first = False
+            yield dumps(key)
+            yield key_separator
+            yield from iter_json(item)
+        yield b'}'
+    else:
+        yield dumps(value)
+
+def iter_json_chunks(value: Any, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """
+    Group the encoded pieces into byte chunks of roughly chunk_size
+    """
+    buffer = []
+    size = 0
+    for piece in iter_json(value):
+        buffer.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield b''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b''.join(buffer)
@@ -0,0 +1,149 @@
+import bcrypt
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Optional
+
+DEFAULT_ROUNDS = int(os.environ.get('PASSWORD_HASH_ROUNDS', 12))
+DEFAULT_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1)))
+DEFAULT_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', DEFAULT_WORKERS * 4))
+HASH_TIMEOUT_SECONDS = 10
+RETRY_AFTER_SECONDS = 1
+# bcrypt only reads the first 72 bytes; bcrypt 5 refuses longer input
+MAX_PASSWORD_BYTES = 72
+
+class HasherSaturatedError(Exception):
+    """Raised when too many hashing jobs are already queued or one timed out; callers answer 503"""
+    pass
+
+class PasswordTooLongError(Exception):
+    """Raised for passwords over MAX_PASSWORD_BYTES; callers answer 400"""
+    pass
+
+def _encode_password(password: str) -> bytes:
+    encoded = password.encode('utf-8')
+    if len(encoded) > MAX_PASSWORD_BYTES:
+        raise PasswordTooLongError(f"Password must be at most {MAX_PASSWORD_BYTES} bytes long")
+    return encoded
+
+def hash_rounds(stored_hash: str) -> Optional[int]:
+    """
+    Read the cost factor out of a bcrypt hash ($2b$12$...)
+    """
+    try:
+        return int(stored_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+class PasswordHasher:
+    """
+    bcrypt behind a bounded worker pool. At most `workers` hashes run at
+    once (bcrypt releases the GIL, so threads run them in parallel) and at
+    most `max_pending` may be running or queued; beyond that calls fail
+    fast with HasherSaturatedError instead of piling up behind the CPU.
+    """
+    def __init__(self, rounds: int = DEFAULT_ROUNDS, workers: int = DEFAULT_WORKERS,
+                 max_pending: int = DEFAULT_MAX_PENDING):
+        self.rounds = rounds
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._stats_lock = threading.Lock()
+        self._stats = {"hashed": 0, "verified": 0, "rehashed": 0, "rejected": 0}
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self._stats[key] += 1
+
+    def _run(self, function, *args):
+        if not self._slots.acquire(blocking=False):
+            self._count("rejected")
+            raise HasherSaturatedError(f"{self.max_pending} password hashing jobs already pending")
+        try:
+            future = self._executor.submit(function, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=HASH_TIMEOUT_SECONDS)
+        except FutureTimeoutError:
+            # the job keeps its slot until it finishes, so the pool stays bounded
+            self._count("rejected")
+            raise HasherSaturatedError(f"Password hashing took longer than {HASH_TIMEOUT_SECONDS}s")
+
+    def hash_password(self, password: str) -> str:
+        """
+        Returns:
+            bcrypt hash at the configured cost factor
+        Raises:
+            HasherSaturatedError: the pool is saturated or the job timed out
+            PasswordTooLongError: the password is over MAX_PASSWORD_BYTES
+        """
+        return self._hash(_encode_password(password))
+
+    def _hash(self, encoded: bytes) -> str:
+        hashed = self._run(bcrypt.hashpw, encoded, bcrypt.gensalt(self.rounds))
+        self._count("hashed")
+        return hashed.decode('utf-8')
+
+    def verify_password(self, password: str, stored_hash: str) -> bool:
+        """
+        Passwords over MAX_PASSWORD_BYTES are compared on their first 72
+        bytes, which is what bcrypt before 5.0 hashed when they were set.
+        Raises:
+            HasherSaturatedError: the pool is saturated or the job timed out
+        """
+        encoded = password.encode('utf-8')[:MAX_PASSWORD_BYTES]
+        if not stored_hash:
+            return False
+        try:
+            matches = self._run(bcrypt.checkpw, encoded, stored_hash.encode('utf-8'))
+        except ValueError as e:
+            if 'Invalid salt' not in str(e):
+                raise
+            logging.error("Stored password hash is not a valid bcrypt hash")
+            return False
+        self._count("verified")
+        return matches
+
+    def needs_rehash(self, stored_hash: str) -> bool:
+        return hash_rounds(stored_hash) != self.rounds
+
+    def rehash_if_needed(self, password: str, stored_hash: str) -> Optional[str]:
+        """
+        Call after a successful verify_password. Returns a hash at the
+        current cost factor if the stored one is outdated, else None.
+        Rehashing is an optimisation, so a saturated pool just skips it.
+        Long passwords are rehashed from the same 72 bytes verify_password compares.
+        """
+        if not self.needs_rehash(stored_hash):
+            return None
+        try:
+            new_hash = self._hash(password.encode('utf-8')[:MAX_PASSWORD_BYTES])
+        except HasherSaturatedError:
+            return None
+        self._count("rehashed")
+        return new_hash
+
+    def get_stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats.update({"rounds": self.rounds, "workers": self.workers, "max_pending": self.max_pending})
+        return stats
+
+_hasher_lock = threading.Lock()
+_hasher = None
+
+def get_password_hasher() -> PasswordHasher:
+    """
+    Return the process-wide PasswordHasher, creating it on first use
+    """
+    global _hasher
+    if _hasher is None:
+        with _hasher_lock:
+            if _hasher is None:
+                _hasher = PasswordHasher()
+    return _hasher
@@ -0,0 +1,84 @@
+from typing import Optional, Dict, Any, List
+
+# Cosmos DB accepts at most 10 operations in one patch request
+MAX_PATCH_OPERATIONS = 10
+
+def json_pointer(*parts) -> str:
+    """
+    Build a JSON Pointer path (RFC 6901) from raw keys/indexes
+    """
+    return ''.join('/' + str(part).replace('~', '~0').replace('/', '~1') for part in parts)
+
+def op_set(path: str, value: Any) -> Dict[str, Any]:
+    return {"op": "set", "path": path, "value": value}
+
+def op_append(path: str, value: Any) -> Dict[str, Any]:
+    """Add value to the end of the array at path"""
+    return {"op": "add", "path": path + "/-", "value": value}
+
+def op_remove(path: str) -> Dict[str, Any]:
+    return {"op": "remove", "path": path}
+
+def _diff_list(original: List[Any], updated: List[Any], path: str) -> List[Dict[str, Any]]:
+    if len(updated) >= len(original) and updated[:len(original)] == original:
+        return [op_append(path, value) for value in updated[len(original):]]
+
+    if len(updated) == len(original):
+        operations = []
+        for index, (before, after) in enumerate(zip(original, updated)):
+            if before != after:
+                operations.extend(diff_operations(before, after, path + f"/{index}"))
+        return operations
+
+    if len(updated) < len(original):
+        removed = []
+        position = 0
+        for index, value in enumerate(original):
+            if position < len(updated) and updated[position] == value:
+                position += 1
+            else:
+                removed.append(index)
+        if position == len(updated):
+            # remove from the end first so earlier indexes stay valid
+            return [op_remove(path + f"/{index}") for index in reversed(removed)]
+
+    return [op_set(path, updated)]
+
+def diff_operations(original: Any, updated: Any, path: str = "") -> List[Dict[str, Any]]:
+    """
+    Compute patch operations that turn original into updated.
+
+    Dicts are diffed key by key and lists are expressed as appends, removals
+    or element-wise changes where possible. A nested dict whose changes would
+    take more operations than replacing it outright is set as a whole.
+    Cosmos system properties (_rid, _etag, ...) are ignored.
+    """
+    if original == updated:
+        return []
+    if not path and not (isinstance(original, dict) and isinstance(updated, dict)):
+        raise ValueError("Documents must be dicts")
+
+    if isinstance(original, dict) and isinstance(updated, dict):
+        operations = []
+        for key, value in updated.items():
+            if not path and key.startswith('_'):
+                continue
+            key_path = path + json_pointer(key)
+            if key not in original:
+                operations.append(op_set(key_path, value))
+            elif original[key] != value:
+                operations.extend(diff_operations(original[key], value, key_path))
+        for key in original:
+            if key not in updated and not (not path and key.startswith('_')):
+                operations.append(op_remove(path + json_pointer(key)))
+        if path and len(operations) > 1 and len(operations) >= len(updated):
+            return [op_set(path, updated)]
+        return operations
+
+    if isinstance(original, list) and isinstance(updated, list):
+        return _diff_list(original, updated, path)
+
+    return [op_set(path, updated)]
+
+def fits_single_patch(operations: Optional[List[Dict[str, Any]]]) -> bool:
+    return operations is not None and len(operations) <= MAX_PATCH_OPERATIONS
@@ -0,0 +1,45 @@
+import json
+from typing import Any, Dict, Iterable, List, Optional
+
+def parse_fields(value: Any, allowed: Iterable[str]) -> Optional[List[str]]:
+    """
+    Validate a client's `fields` selection, given as a list of names or a
+    comma-separated string
+    Returns:
+        The selected names in request order without duplicates, or None
+        when the client did not ask for a selection
+    Raises:
+        ValueError: the selection is malformed or names an unknown field
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        names = value.split(',')
+    elif isinstance(value, list) and all(isinstance(name, str) for name in value):
+        names = value
+    else:
+        raise ValueError("fields must be a list of field names or a comma-separated string")
+
+    names = [name.strip() for name in names if name.strip()]
+    allowed = set(allowed)
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return list(dict.fromkeys(names)) or None
+
+def object_projection(alias: str, fields: Iterable[str], extra: Optional[Dict[str, str]] = None) -> str:
+    """
+    Cosmos SQL object constructor selecting the given properties of alias,
+    e.g. {"Item Name": i["Item Name"]}. Properties missing from a document
+    are left out of its result. Field names are written into the query
+    text, so they must come from a whitelist (see parse_fields).
+    Args:
+        extra: Additional output property -> SQL expression pairs
+    """
+    parts = [f"{json.dumps(field)}: {alias}[{json.dumps(field)}]" for field in fields]
+    parts += [f"{json.dumps(name)}: {expression}" for name, expression in (extra or {}).items()]
+    return "{" + ", ".join(parts) + "}"
+
+def select_fields(document: Dict[str, Any], fields: Iterable[str]) -> Dict[str, Any]:
+    """In-memory equivalent of object_projection"""
+    return {field: document[field] for field in fields if field in document}
@@ -0,0 +1,252 @@
+import azure.functions as func
+import functools
+import ipaddress
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from shared_code.responses import json_response
+from shared_code.serialization import get_json_body
+
+class RateLimit:
+    """
+    Token bucket: up to `capacity` requests in a burst, refilled at
+    `capacity` tokens per `period_seconds`
+    """
+    def __init__(self, capacity: int, period_seconds: float):
+        self.capacity = capacity
+        self.period_seconds = period_seconds
+        self.refill_per_second = capacity / period_seconds
+
+class LocalRateLimitBackend:
+    """
+    In-process buckets, one (tokens, updated) pair per key in an LRU capped
+    at max_keys. An evicted key starts again with a full bucket, so the cap
+    should comfortably exceed the number of clients active per period.
+    Limits are per instance; use a shared backend when scaled out.
+    """
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key: str, limit: RateLimit, cost: float = 1) -> Tuple[bool, float]:
+        """
+        Returns:
+            (allowed, seconds until enough tokens are available)
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (limit.capacity, now))
+            tokens = min(limit.capacity, tokens + (now - updated) * limit.refill_per_second)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (cost - tokens) / limit.refill_per_second
+
+    def size(self) -> int:
+        return len(self._buckets)
+
+_REDIS_TOKEN_BUCKET = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 't', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 't', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return {allowed, tostring(tokens)}
+"""
+
+class RedisRateLimitBackend:
+    """
+    Buckets shared by every instance, kept in Redis hashes that expire once
+    they would have refilled. Each check is one atomic script call.
+    Requires the redis package.
+    """
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        import redis
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url, socket_timeout=0.25)
+        self._script = self._client.register_script(_REDIS_TOKEN_BUCKET)
+
+    def consume(self, key: str, limit: RateLimit, cost: float = 1) -> Tuple[bool, float]:
+        allowed, tokens = self._script(
+            keys=[self.prefix + key],
+            args=[limit.capacity, limit.refill_per_second, time.time(), cost]
+        )
+        if allowed:
+            return True, 0.0
+        return False, (cost - float(tokens)) / limit.refill_per_second
+
+class RateLimiter:
+    """
+    Applies per-endpoint limits keyed by client IP and by email. If the
+    shared backend fails, the local one is used so a cache outage does not
+    take sign-in down with it.
+    """
+    def __init__(self, backend=None, fallback: Optional[LocalRateLimitBackend] = None):
+        self.fallback = fallback or LocalRateLimitBackend(int(os.environ.get('RATE_LIMIT_MAX_KEYS', 10000)))
+        self.backend = backend or self.fallback
+        self.policies: Dict[str, Dict[str, RateLimit]] = {}
+        self._stats = {"allowed": 0, "rejected": 0, "backend_errors": 0}
+
+    def configure(self, endpoint: str, per_ip: Optional[RateLimit] = None, per_email: Optional[RateLimit] = None):
+        self.policies[endpoint] = {"ip": per_ip, "email": per_email}
+
+    def _consume(self, key: str, limit: RateLimit) -> Tuple[bool, float]:
+        if self.backend is not self.fallback:
+            try:
+                return self.backend.consume(key, limit)
+            except Exception as e:
+                self._stats["backend_errors"] += 1
+                logging.error(f"Rate limit backend failed, using local limits: {str(e)}")
+        return self.fallback.consume(key, limit)
+
+    def check(self, endpoint: str, client_ip: Optional[str], email: Optional[str]) -> Tuple[bool, float]:
+        """
+        Returns:
+            (allowed, seconds the client should wait before retrying)
+        """
+        policy = self.policies.get(endpoint, {})
+        for scope, value in (("ip", client_ip), ("email", email)):
+            limit = policy.get(scope)
+            if limit is None or not value:
+                continue
+            allowed, retry_after = self._consume(f"{endpoint}:{scope}:{value.lower()}", limit)
+            if not allowed:
+                self._stats["rejected"] += 1
+                return False, retry_after
+        self._stats["allowed"] += 1
+        return True, 0.0
+
+    def get_stats(self):
+        stats = dict(self._stats)
+        stats["local_keys"] = self.fallback.size()
+        return stats
+
+def _limit_from_env(name: str, capacity: int, period_seconds: float) -> RateLimit:
+    """RATE_LIMIT_<NAME>=<capacity>/<seconds> overrides the default"""
+    value = os.environ.get(f'RATE_LIMIT_{name}')
+    if value:
+        capacity_text, _, period_text = value.partition('/')
+        capacity, period_seconds = int(capacity_text), float(period_text or period_seconds)
+    return RateLimit(capacity, period_seconds)
+
+def create_rate_limiter() -> RateLimiter:
+    backend = None
+    redis_url = os.environ.get('RATE_LIMIT_REDIS_URL')
+    if redis_url:
+        try:
+            backend = RedisRateLimitBackend(redis_url)
+        except Exception as e:
+            logging.error(f"Rate limit Redis backend unavailable, using local limits: {str(e)}")
+
+    limiter = RateLimiter(backend)
+    limiter.configure(
+        "login",
+        per_ip=_limit_from_env('LOGIN_IP', 30, 60),
+        per_email=_limit_from_env('LOGIN_EMAIL', 5, 60)
+    )
+    limiter.configure(
+        "signup",
+        per_ip=_limit_from_env('SIGNUP_IP', 10, 3600),
+        per_email=_limit_from_env('SIGNUP_EMAIL', 3, 600)
+    )
+    limiter.configure(
+        "resend_otp",
+        per_ip=_limit_from_env('RESEND_OTP_IP', 20, 3600),
+        per_email=_limit_from_env('RESEND_OTP_EMAIL', 3, 600)
+    )
+    limiter.configure(
+        "verify-signup",
+        per_ip=_limit_from_env('VERIFY_SIGNUP_IP', 30, 60),
+        per_email=_limit_from_env('VERIFY_SIGNUP_EMAIL', 5, 600)
+    )
+    limiter.configure(
+        "refresh",
+        per_ip=_limit_from_env('REFRESH_IP', 60, 60)
+    )
+    return limiter
+
+_limiter_lock = threading.Lock()
+_limiter = None
+
+def get_rate_limiter() -> RateLimiter:
+    """
+    Return the process-wide RateLimiter, creating it on first use
+    """
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = create_rate_limiter()
+    return _limiter
+
+def _parse_address(value: str) -> Optional[str]:
+    """
+    The IP in an X-Forwarded-For entry, without the port the front end
+    may append ("1.2.3.4:5678", "[2001:db8::1]:5678"); None if malformed
+    """
+    value = value.strip()
+    if value.startswith('['):
+        value = value[1:value.find(']')] if ']' in value else ''
+    elif value.count(':') == 1:
+        value = value.split(':')[0]
+    try:
+        return str(ipaddress.ip_address(value))
+    except ValueError:
+        return None
+
+def get_client_ip(req: func.HttpRequest) -> Optional[str]:
+    """
+    The caller's address as appended by the Functions front end: the last
+    X-Forwarded-For entry. Earlier entries and X-Client-IP are sent by the
+    client and cannot be trusted as a rate limit key.
+    """
+    forwarded = req.headers.get('X-Forwarded-For')
+    if not forwarded:
+        return None
+    return _parse_address(forwarded.split(',')[-1])
+
+def rate_limited(endpoint: str):
+    """
+    Decorator for sync HTTP handlers: answers 429 with Retry-After when the
+    client IP or the email in the body is over the endpoint's limit, before
+    the handler does any work
+    """
+    def decorate(handler):
+        @functools.wraps(handler)
+        def wrapper(req: func.HttpRequest, *args, **kwargs):
+            try:
+                body = get_json_body(req)
+            except ValueError:
+                body = None
+            email = body.get('email') if isinstance(body, dict) else None
+            allowed, retry_after = get_rate_limiter().check(
+                endpoint, get_client_ip(req), email if isinstance(email, str) else None
+            )
+            if not allowed:
+                return json_response(
+                    req,
+                    {"error": {"message": "Too many requests, please try again later"}},
+                    status_code=429,
+                    headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+                )
+            return handler(req, *args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,157 @@
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import time
+from typing import Optional, Dict, Any, Tuple
+from azure.cosmos.exceptions import CosmosHttpResponseError, CosmosResourceNotFoundError
+from shared_code.auth import AuthenticationError
+from shared_code.patch_operations import MAX_PATCH_OPERATIONS, json_pointer, op_remove, op_set
+
+REFRESH_TOKEN_TTL_SECONDS = int(os.environ.get('REFRESH_TOKEN_DAYS', 60)) * 24 * 3600
+MAX_REFRESH_FAMILIES = int(os.environ.get('MAX_REFRESH_TOKENS_PER_USER', 5))
+
+ROTATED = "rotated"
+REUSED = "reused"
+EXPIRED = "expired"
+UNKNOWN = "unknown"
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+def _unb64(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+def secret_digest(secret: str) -> str:
+    """Stored form of a refresh secret: 128 bits of its SHA-256, base64url"""
+    return _b64(hashlib.sha256(secret.encode('utf-8')).digest()[:16])
+
+def format_refresh_token(user_id: str, family: str, secret: str) -> str:
+    return f"{_b64(user_id.encode('utf-8'))}.{family}.{secret}"
+
+def parse_refresh_token(token: str) -> Tuple[str, str, str]:
+    """
+    Returns:
+        (user id, family id, secret)
+    Raises:
+        AuthenticationError: the token is malformed
+    """
+    try:
+        encoded_user, family, secret = token.split('.')
+        user_id = _unb64(encoded_user).decode('utf-8')
+    except (AttributeError, ValueError):
+        raise AuthenticationError("Invalid refresh token")
+    if not user_id or not family or not secret:
+        raise AuthenticationError("Invalid refresh token")
+    return user_id, family, secret
+
+def _new_secret(now: float) -> Tuple[str, Dict[str, Any]]:
+    secret = secrets.token_urlsafe(32)
+    return secret, {"h": secret_digest(secret), "e": int(now + REFRESH_TOKEN_TTL_SECONDS)}
+
+def _live_families(user: Dict[str, Any], now: float) -> Dict[str, Dict[str, Any]]:
+    return {
+        family: record for family, record in (user.get('refreshTokens') or {}).items()
+        if record.get('e', 0) > now
+    }
+
+def _prune(families: Dict[str, Dict[str, Any]], now: float, room: int = 0):
+    """Names of the families to drop: expired ones, then the oldest beyond MAX_REFRESH_FAMILIES - room"""
+    live = {family: record for family, record in families.items() if record.get('e', 0) > now}
+    oldest = sorted(live, key=lambda name: live[name]['e'])
+    return [family for family in families if family not in live] + oldest[:max(0, len(live) + room - MAX_REFRESH_FAMILIES)]
+
+def issue_refresh_token(db, container, user: Dict[str, Any],
+                        fields: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """
+    Start a new refresh token family (one per signed-in device) on the
+    user's document. Only a digest and expiry are stored; expired families
+    are pruned and the oldest are dropped beyond MAX_REFRESH_FAMILIES.
+
+    The family is added with a single patch, pruning what the caller's copy
+    of the user shows, so sign-in does not replace the user document. If
+    that copy is stale and a pruned family is already gone, the patch is
+    rejected and the family is added with a read-modify-write instead.
+    Args:
+        fields: Other top-level fields to set in the same write, so sign-in
+            costs one write to the user document
+    Returns:
+        The refresh token, or None if the user does not exist
+    """
+    now = time.time()
+    user_id = user['id']
+    family = secrets.token_urlsafe(9)
+    secret, record = _new_secret(now)
+
+    fields = fields or {}
+    operations = [op_set(json_pointer(name), value) for name, value in fields.items()]
+    families = user.get('refreshTokens')
+    if isinstance(families, dict):
+        operations.append(op_set(json_pointer('refreshTokens', family), record))
+        operations += [
+            op_remove(json_pointer('refreshTokens', name)) for name in _prune(families, now, room=1)
+        ][:MAX_PATCH_OPERATIONS - len(operations)]
+    else:
+        operations.append(op_set('/refreshTokens', {family: record}))
+    try:
+        db.patch_item(container, user_id, operations)
+        return format_refresh_token(user_id, family, secret)
+    except CosmosResourceNotFoundError:
+        return None
+    except CosmosHttpResponseError as e:
+        logging.info(f"Refresh token patch for {user_id} rejected, retrying as a full write: {str(e)}")
+
+    def add_family(current):
+        current_families = dict(current.get('refreshTokens') or {})
+        current_families[family] = record
+        for name in _prune(current_families, now):
+            del current_families[name]
+        current['refreshTokens'] = current_families
+        current.update(fields)
+
+    written, _ = db.read_modify_write(container, user_id, add_family)
+    if written is None:
+        return None
+    return format_refresh_token(user_id, family, secret)
+
+def rotate_refresh_token(db, container, token: str) -> Tuple[Dict[str, Any], str]:
+    """
+    Exchange a refresh token for its successor. Each token works once:
+    presenting an already-rotated token revokes its whole family, since
+    it means the token was copied.
+    Returns:
+        (user document, new refresh token)
+    Raises:
+        AuthenticationError: the token is invalid, expired, reused or revoked
+    """
+    user_id, family, secret = parse_refresh_token(token)
+    now = time.time()
+    new_secret, new_record = _new_secret(now)
+
+    def rotate(user):
+        families = _live_families(user, now)
+        record = (user.get('refreshTokens') or {}).get(family)
+        if record is None:
+            return UNKNOWN
+        if family not in families:
+            outcome = EXPIRED
+        elif not hmac.compare_digest(record['h'], secret_digest(secret)):
+            outcome = REUSED
+            del families[family]
+        else:
+            outcome = ROTATED
+            families[family] = new_record
+        user['refreshTokens'] = families
+        return outcome
+
+    written, outcome = db.read_modify_write(container, user_id, rotate)
+    if written is None or outcome == UNKNOWN:
+        raise AuthenticationError("Invalid refresh token")
+    if outcome == EXPIRED:
+        raise AuthenticationError("Refresh token has expired")
+    if outcome == REUSED:
+        logging.warning(f"Refresh token reuse detected for {user_id}; revoked token family {family}")
+        raise AuthenticationError("Refresh token has been revoked")
+    return written, format_refresh_token(user_id, family, new_secret)
@@ -0,0 +1,180 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+from typing import Dict, Any, Tuple
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+REGISTRATION_MODE_STORED = "stored"
+REGISTRATION_MODE_TOKEN = "token"
+REGISTRATION_TTL_SECONDS = 600
+MAX_VERIFY_ATTEMPTS = 3
+
+LEDGER_OK = "ok"
+LEDGER_INVALID = "invalid"
+LEDGER_LOCKED = "locked"
+LEDGER_CONSUMED = "consumed"
+LEDGER_SUPERSEDED = "superseded"
+
+class InvalidRegistrationToken(Exception):
+    pass
+
+def get_registration_mode() -> str:
+    """
+    stored: pending registrations live in temp_registrations (default)
+    token: they travel with the client in a registration token
+    """
+    return os.environ.get('REGISTRATION_MODE', REGISTRATION_MODE_STORED)
+
+def _derive_key(info: bytes) -> bytes:
+    secret = os.environ.get('REGISTRATION_TOKEN_SECRET') or os.environ['JWT_SECRET']
+    return HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=info).derive(secret.encode('utf-8'))
+
+_fernet = None
+_otp_key = None
+
+def _keys():
+    global _fernet, _otp_key
+    if _fernet is None:
+        _otp_key = _derive_key(b"culvana registration otp")
+        _fernet = Fernet(base64.urlsafe_b64encode(_derive_key(b"culvana registration token")))
+    return _fernet, _otp_key
+
+def otp_hmac(nonce: str, otp: str) -> str:
+    _, otp_key = _keys()
+    return hmac.new(otp_key, f"{nonce}:{otp}".encode('utf-8'), hashlib.sha256).hexdigest()
+
+def _seal(email: str, password_hash: str, otp: str, reg_id: str) -> Tuple[str, Dict[str, Any]]:
+    fernet, _ = _keys()
+    nonce = secrets.token_urlsafe(16)
+    payload = {
+        "e": email,
+        "p": password_hash,
+        "o": otp_hmac(nonce, otp),
+        "n": nonce,
+        "r": reg_id,
+        "x": int(time.time()) + REGISTRATION_TTL_SECONDS
+    }
+    token = fernet.encrypt(json.dumps(payload, separators=(',', ':')).encode('utf-8')).decode('ascii')
+    return token, payload
+
+def issue_registration_token(email: str, password_hash: str, otp: str) -> str:
+    """
+    Seal a pending registration into an encrypted, authenticated token
+    (Fernet: AES-128-CBC + HMAC-SHA256). The OTP is only present as an
+    HMAC bound to the token's nonce. The registration id keys the attempt
+    ledger and stays the same when the token is resealed.
+    """
+    token, _ = _seal(email, password_hash, otp, secrets.token_urlsafe(16))
+    return token
+
+def reseal_registration_token(registration: Dict[str, Any], otp: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    Seal the same registration with a new code and nonce
+    Returns:
+        (token, its payload)
+    """
+    return _seal(registration['e'], registration['p'], otp, registration['r'])
+
+def open_registration_token(token: str) -> Dict[str, Any]:
+    """
+    Returns:
+        The registration payload (e: email, p: password hash, o: OTP HMAC,
+        n: nonce, r: registration id, x: expiry)
+    Raises:
+        InvalidRegistrationToken: the token was tampered with or has expired
+    """
+    fernet, _ = _keys()
+    try:
+        payload = json.loads(fernet.decrypt(token.encode('ascii'), ttl=REGISTRATION_TTL_SECONDS))
+    except (InvalidToken, UnicodeEncodeError, ValueError, AttributeError):
+        raise InvalidRegistrationToken("Registration has expired or is invalid")
+    return payload
+
+def otp_matches(registration: Dict[str, Any], otp: str) -> bool:
+    return hmac.compare_digest(registration['o'], otp_hmac(registration['n'], str(otp)))
+
+class AttemptLedger:
+    """
+    Per-registration verification attempts in a small container whose
+    documents expire through Cosmos TTL (the container needs a default TTL
+    of -1 so per-document ttl applies). A document exists once a
+    registration has been tried or resealed; it counts failed attempts
+    across all of the registration's tokens, records the nonce of the
+    latest token, so earlier tokens stop working, and marks the
+    registration consumed once it has been used.
+    """
+    def __init__(self, db, container):
+        self.db = db
+        self.container = container
+
+    @staticmethod
+    def _entry(registration: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "id": registration['r'],
+            "nonce": registration['n'],
+            "attempts": 0,
+            "consumed": False,
+            "ttl": max(1, registration['x'] - int(time.time()))
+        }
+
+    def record_attempt(self, registration: Dict[str, Any], matched: bool) -> str:
+        """
+        A matching code does not consume the registration; see mark_consumed.
+        Returns:
+            LEDGER_OK, LEDGER_INVALID, LEDGER_LOCKED, LEDGER_CONSUMED or LEDGER_SUPERSEDED
+        """
+        def attempt(entry):
+            if entry.get('consumed'):
+                return LEDGER_CONSUMED
+            if entry.get('nonce', registration['n']) != registration['n']:
+                return LEDGER_SUPERSEDED
+            if entry.get('attempts', 0) >= MAX_VERIFY_ATTEMPTS:
+                return LEDGER_LOCKED
+            if matched:
+                return LEDGER_OK
+            entry['attempts'] = entry.get('attempts', 0) + 1
+            return LEDGER_LOCKED if entry['attempts'] >= MAX_VERIFY_ATTEMPTS else LEDGER_INVALID
+
+        _, outcome = self.db.read_modify_write(
+            self.container, registration['r'], attempt,
+            default=lambda: self._entry(registration)
+        )
+        return outcome
+
+    def mark_consumed(self, registration: Dict[str, Any]):
+        """
+        Call once the verified user exists, so a failure creating it leaves
+        the registration verifiable
+        """
+        self.db.read_modify_write(
+            self.container, registration['r'], lambda entry: entry.update(consumed=True),
+            default=lambda: self._entry(registration)
+        )
+
+    def reseal(self, resealed: Dict[str, Any]) -> str:
+        """
+        Make a resealed token the only one that verifies. The attempt count
+        carries over, so resending does not buy more guesses; a locked
+        registration has to sign up again.
+        Returns:
+            LEDGER_OK, LEDGER_LOCKED, or LEDGER_CONSUMED if the registration was already verified
+        """
+        def supersede(entry):
+            if entry.get('consumed'):
+                return LEDGER_CONSUMED
+            if entry.get('attempts', 0) >= MAX_VERIFY_ATTEMPTS:
+                return LEDGER_LOCKED
+            entry.update({"nonce": resealed['n'], "ttl": self._entry(resealed)['ttl']})
+            return LEDGER_OK
+
+        _, outcome = self.db.read_modify_write(
+            self.container, resealed['r'], supersede,
+            default=lambda: self._entry(resealed)
+        )
+        return outcome
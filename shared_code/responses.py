@@ -0,0 +1,152 @@
+import azure.functions as func
+import hashlib
+import os
+import zlib
+from typing import Any, Dict, Iterator, Optional
+from shared_code.json_stream import iter_json_chunks
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION_MIN_BYTES = int(os.environ.get('RESPONSE_COMPRESSION_MIN_BYTES', 1024))
+GZIP_LEVEL = int(os.environ.get('RESPONSE_GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.environ.get('RESPONSE_BROTLI_QUALITY', 5))
+
+def parse_accept_encoding(header: Optional[str]) -> Dict[str, float]:
+    """
+    Map each coding in an Accept-Encoding header to its q-value
+    """
+    codings = {}
+    for part in (header or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        codings[coding] = quality
+    return codings
+
+def choose_encoding(req: Optional[func.HttpRequest]) -> Optional[str]:
+    """
+    Pick the best coding the client accepts: br (when brotli is installed), then gzip
+    """
+    if req is None:
+        return None
+    codings = parse_accept_encoding(req.headers.get('Accept-Encoding'))
+    wildcard = codings.get('*', 0.0)
+    candidates = ['br', 'gzip'] if brotli is not None else ['gzip']
+    best = None
+    best_quality = 0.0
+    for coding in candidates:
+        quality = codings.get(coding, wildcard)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+def _compressor(encoding: str, level: Optional[int]):
+    if encoding == 'br':
+        return brotli.Compressor(quality=BROTLI_QUALITY if level is None else level)
+    # wbits=31: zlib stream with a gzip header and trailer
+    return zlib.compressobj(GZIP_LEVEL if level is None else level, zlib.DEFLATED, 31)
+
+def compress_chunks(chunks: Iterator[bytes], encoding: str, level: Optional[int] = None) -> bytes:
+    """
+    Compress an iterable of byte chunks incrementally
+    """
+    compressor = _compressor(encoding, level)
+    if encoding == 'br':
+        pieces = [compressor.process(chunk) for chunk in chunks]
+        pieces.append(compressor.finish())
+    else:
+        pieces = [compressor.compress(chunk) for chunk in chunks]
+        pieces.append(compressor.flush())
+    return b''.join(pieces)
+
+def make_etag(document_etag: Optional[str], *versions: Any) -> Optional[str]:
+    """
+    Weak validator over everything a response body depends on: the _etag
+    of the source document, any other documents' _etags and the request
+    parameters that shape it. Weak because the same body may be sent with
+    different encodings.
+    Returns:
+        None when the source document does not exist, so a missing document
+        is never answered with 304
+    """
+    if document_etag is None:
+        return None
+    digest = hashlib.sha256('\x1f'.join(str(version) for version in (document_etag,) + versions).encode('utf-8'))
+    return f'W/"{digest.hexdigest()[:32]}"'
+
+def etag_matches(req: Optional[func.HttpRequest], etag: Optional[str]) -> bool:
+    """
+    Weak comparison of etag against the request's If-None-Match header.
+    "*" only matches when there is a current representation (etag is set).
+    """
+    header = req.headers.get('If-None-Match') if req is not None else None
+    if not header or etag is None:
+        return False
+    if header.strip() == '*':
+        return True
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    for candidate in header.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+def _validator_headers(etag: str) -> Dict[str, str]:
+    # private: bodies are per user; no-cache: clients must revalidate each poll
+    return {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Accept-Encoding"}
+
+def not_modified_response(etag: str) -> func.HttpResponse:
+    return func.HttpResponse(status_code=304, headers=_validator_headers(etag))
+
+def json_response(req: Optional[func.HttpRequest], payload: Any, status_code: int = 200,
+                  headers: Optional[Dict[str, str]] = None, etag: Optional[str] = None) -> func.HttpResponse:
+    """
+    Build a JSON response, compressed per the request's Accept-Encoding
+    once the body reaches COMPRESSION_MIN_BYTES. Pass etag to let clients
+    revalidate with If-None-Match.
+
+    Payloads may contain StreamedArray values; they are encoded and
+    compressed chunk by chunk, so the uncompressed body of a large
+    response is never held as one string.
+    """
+    headers = dict(headers or {})
+    headers['Vary'] = 'Accept-Encoding'
+    if etag is not None:
+        headers.update(_validator_headers(etag))
+    chunks = iter_json_chunks(payload)
+    first = next(chunks, b'')
+    second = next(chunks, None)
+    encoding = choose_encoding(req)
+
+    if encoding is None or (second is None and len(first) < COMPRESSION_MIN_BYTES):
+        body = first if second is None else b''.join([first, second, *chunks])
+    else:
+        def all_chunks():
+            yield first
+            if second is not None:
+                yield second
+                yield from chunks
+
+        body = compress_chunks(all_chunks(), encoding)
+        headers['Content-Encoding'] = encoding
+
+    return func.HttpResponse(
+        body,
+        status_code=status_code,
+        headers=headers,
+        mimetype="application/json"
+    )
@@ -0,0 +1,144 @@
+import datetime
+import decimal
+import json
+import logging
+import math
+import os
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKEND_ORJSON = "orjson"
+BACKEND_STDLIB = "json"
+
+def to_json_compatible(value: Any) -> Any:
+    """
+    Fallback for values neither backend encodes the same way: datetimes
+    become ISO 8601 strings and Decimals become numbers
+    """
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def without_non_finite(value: Any) -> Any:
+    """Copy of value with NaN and infinite floats replaced by None, as orjson encodes them"""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: without_non_finite(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [without_non_finite(item) for item in value]
+    return value
+
+def _reject_constant(name: str):
+    raise ValueError(f"{name} is not valid JSON")
+
+class StdlibBackend:
+    """
+    Output is byte-identical to json.dumps with its default separators and
+    ASCII escaping, except that NaN and infinities are encoded as null, not
+    as the non-standard NaN and Infinity tokens, and rejected when decoding,
+    as orjson does
+    """
+    name = BACKEND_STDLIB
+    item_separator = b', '
+    key_separator = b': '
+
+    def __init__(self):
+        self._encoder = json.JSONEncoder(allow_nan=False, default=to_json_compatible)
+
+    def dumps(self, value: Any) -> bytes:
+        try:
+            return self._encoder.encode(value).encode('utf-8')
+        except ValueError:
+            # only out-of-range floats raise ValueError; clean them up on this rare path
+            return self._encoder.encode(without_non_finite(value)).encode('utf-8')
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return json.loads(data, parse_constant=_reject_constant)
+
+class OrjsonBackend:
+    """
+    Datetimes and dataclasses are passed through to to_json_compatible, as
+    in the stdlib backend. Integers beyond 64 bits, which orjson cannot
+    encode, are handed to the stdlib backend.
+
+    Output is equivalent to the stdlib backend's but not byte-identical: it
+    is compact, non-ASCII text is sent as raw UTF-8 and floats use the
+    shortest exponent form (1e16, not 1e+16). JSON_BACKEND=json keeps the
+    bytes json.dumps produced.
+    """
+    name = BACKEND_ORJSON
+    item_separator = b','
+    key_separator = b':'
+
+    def __init__(self):
+        self._options = (
+            orjson.OPT_NON_STR_KEYS
+            | orjson.OPT_PASSTHROUGH_DATETIME
+            | orjson.OPT_PASSTHROUGH_DATACLASS
+        )
+        self._fallback = StdlibBackend()
+
+    def dumps(self, value: Any) -> bytes:
+        try:
+            return orjson.dumps(value, default=to_json_compatible, option=self._options)
+        except TypeError:
+            # the stdlib backend encodes big integers and raises the same TypeError for anything else
+            return self._fallback.dumps(value)
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return orjson.loads(data)
+
+def create_backend(name: str = None):
+    """
+    JSON_BACKEND=orjson (default when installed) or json
+    """
+    name = name or os.environ.get('JSON_BACKEND', BACKEND_ORJSON)
+    if name == BACKEND_ORJSON:
+        if orjson is not None:
+            return OrjsonBackend()
+        logging.warning("orjson is not installed; using the stdlib json backend")
+    return StdlibBackend()
+
+backend = create_backend()
+
+def dumps(value: Any) -> bytes:
+    """Encode value as UTF-8 JSON"""
+    return backend.dumps(value)
+
+def separators():
+    """(item separator, key separator) that dumps puts between encoded values"""
+    return backend.item_separator, backend.key_separator
+
+def loads(data: Union[bytes, str]) -> Any:
+    """
+    Raises:
+        ValueError: data is not valid JSON
+    """
+    return backend.loads(data)
+
+def get_json_body(req) -> Any:
+    """
+    Decode the request body once; the auth and rate-limit checks and the
+    handler all share the parsed value. Like HttpRequest.get_json, raises
+    ValueError when the body is not valid JSON.
+    """
+    cached = getattr(req, '_parsed_json_body', None)
+    if cached is None:
+        try:
+            cached = (loads(req.get_body() or b''), None)
+        except ValueError as e:
+            cached = (None, e)
+        req._parsed_json_body = cached
+    body, error = cached
+    if error is not None:
+        raise error
+    return body
@@ -0,0 +1,201 @@
+import math
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+GROUP_DIMENSIONS = ("supplier", "category", "month")
+UNKNOWN = "Unknown"
+MAX_MEMOIZED_ROLLUPS = 32
+
+_US_DATE = re.compile(r"^(\d{1,2})/\d{1,2}/(\d{4})")
+_ISO_MONTH = re.compile(r"^(\d{4})-(\d{2})")
+
+def order_month(order_date: Any) -> str:
+    """YYYY-MM of an invoice's Order Date (ISO or MM/DD/YYYY), or Unknown"""
+    text = str(order_date or "").strip()
+    match = _ISO_MONTH.match(text)
+    if match:
+        return f"{match.group(1)}-{match.group(2)}"
+    match = _US_DATE.match(text)
+    if match:
+        return f"{match.group(2)}-{int(match.group(1)):02d}"
+    return UNKNOWN
+
+def parse_amount(value: Any) -> float:
+    """Extended Price as a float; NaN when it is missing or not a number"""
+    if isinstance(value, bool) or value is None:
+        return math.nan
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).replace("$", "").replace(",", "").strip())
+    except ValueError:
+        return math.nan
+
+def _factorize(values: Sequence[str]) -> Tuple[List[str], np.ndarray]:
+    """
+    Returns:
+        (sorted distinct labels, int32 code of each value into them)
+    """
+    codes_by_label: Dict[str, int] = {}
+    codes = np.fromiter(
+        (codes_by_label.setdefault(value, len(codes_by_label)) for value in values),
+        dtype=np.int32, count=len(values)
+    )
+    labels = sorted(codes_by_label, key=codes_by_label.get)
+    order = sorted(range(len(labels)), key=labels.__getitem__)
+    remap = np.empty(len(labels), dtype=np.int32)
+    remap[order] = np.arange(len(labels), dtype=np.int32)
+    return [labels[i] for i in order], remap[codes] if len(codes) else codes
+
+class LineItemColumns:
+    """
+    One version of a user's invoice line items as parallel NumPy columns:
+    supplier, category and month codes (into sorted label lists, so month
+    codes are chronological) and the Extended Price. Built once per
+    invoice document _etag and read-only afterwards.
+    """
+    def __init__(self, invoices: List[Dict[str, Any]], etag: Optional[str] = None):
+        self.etag = etag
+        items_per_invoice = [len(invoice.get("Items") or []) for invoice in invoices]
+        self.supplier_labels, supplier_codes = _factorize(
+            [invoice.get("Supplier Name") or UNKNOWN for invoice in invoices]
+        )
+        self.month_labels, month_codes = _factorize([order_month(invoice.get("Order Date")) for invoice in invoices])
+        self.category_labels, self.category = _factorize([
+            item.get("Product Category") or UNKNOWN
+            for invoice in invoices for item in invoice.get("Items") or []
+        ])
+        self.supplier = np.repeat(supplier_codes, items_per_invoice)
+        self.month = np.repeat(month_codes, items_per_invoice)
+        self.amount = np.fromiter(
+            (parse_amount(item.get("Extended Price")) for invoice in invoices for item in invoice.get("Items") or []),
+            dtype=np.float64, count=int(sum(items_per_invoice))
+        )
+        self._rollups: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.amount)
+
+    def labels(self, dimension: str) -> List[str]:
+        return getattr(self, f"{dimension}_labels")
+
+    def _month_mask(self, from_month: Optional[str], to_month: Optional[str]) -> Optional[np.ndarray]:
+        if not from_month and not to_month:
+            return None
+        labels = np.array(self.month_labels, dtype=object)
+        allowed = labels != UNKNOWN
+        if from_month:
+            allowed &= labels >= from_month
+        if to_month:
+            allowed &= labels <= to_month
+        return allowed[self.month]
+
+    def rollup(self, group_by: Sequence[str], from_month: Optional[str] = None,
+               to_month: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Grouped totals, line counts and averages of Extended Price, largest
+        total first. Lines without a numeric price are counted as skipped.
+        Results are memoized per parameters for the life of this version.
+        """
+        key = (tuple(group_by), from_month, to_month)
+        with self._lock:
+            cached = self._rollups.get(key)
+            if cached is not None:
+                self._rollups.move_to_end(key)
+                return cached
+
+        priced = ~np.isnan(self.amount)
+        in_range = self._month_mask(from_month, to_month)
+        selected = priced if in_range is None else priced & in_range
+        skipped = int(np.count_nonzero(~priced if in_range is None else ~priced & in_range))
+
+        group_key = np.zeros(len(self.amount), dtype=np.int64)
+        radices = []
+        for dimension in group_by:
+            radix = max(len(self.labels(dimension)), 1)
+            group_key = group_key * radix + getattr(self, dimension)
+            radices.append(radix)
+        amounts = self.amount[selected]
+        groups, inverse = np.unique(group_key[selected], return_inverse=True)
+        totals = np.bincount(inverse, weights=amounts, minlength=len(groups))
+        counts = np.bincount(inverse, minlength=len(groups))
+
+        decoded = {}
+        remainder = groups
+        for dimension, radix in reversed(list(zip(group_by, radices))):
+            remainder, decoded[dimension] = np.divmod(remainder, radix)
+
+        rows = []
+        for position in np.argsort(-totals, kind="stable"):
+            row = {dimension: self.labels(dimension)[decoded[dimension][position]] for dimension in group_by}
+            row["total"] = round(float(totals[position]), 2)
+            row["count"] = int(counts[position])
+            row["average"] = round(float(totals[position] / counts[position]), 2)
+            rows.append(row)
+
+        total = float(amounts.sum())
+        count = int(len(amounts))
+        result = {
+            "rows": rows,
+            "totals": {
+                "total": round(total, 2),
+                "count": count,
+                "average": round(total / count, 2) if count else 0,
+                "skipped": skipped
+            }
+        }
+        with self._lock:
+            self._rollups[key] = result
+            while len(self._rollups) > MAX_MEMOIZED_ROLLUPS:
+                self._rollups.popitem(last=False)
+        return result
+
+class SpendColumnsCache:
+    """
+    Per-user LRU of LineItemColumns, each served only for the invoice
+    document version (_etag) it was built from
+    """
+    def __init__(self, max_entries: int = 32):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, LineItemColumns]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "builds": 0}
+
+    def get(self, email: str, etag: Optional[str]) -> Optional[LineItemColumns]:
+        if etag is None:
+            return None
+        with self._lock:
+            columns = self._entries.get(email)
+            if columns is None or columns.etag != etag:
+                return None
+            self._entries.move_to_end(email)
+            self._stats["hits"] += 1
+            return columns
+
+    def build(self, email: str, document: Dict[str, Any]) -> LineItemColumns:
+        columns = LineItemColumns(document.get("invoices") or [], document.get("_etag"))
+        with self._lock:
+            self._stats["builds"] += 1
+            if columns.etag is not None:
+                self._entries[email] = columns
+                self._entries.move_to_end(email)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return columns
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        return stats
+
+spend_columns = SpendColumnsCache(int(os.environ.get('SPEND_ANALYTICS_CACHE_SIZE', 32)))
@@ -0,0 +1,146 @@
+import atexit
+import logging
+import os
+import threading
+from typing import Callable, Dict, Any, Optional
+from azure.cosmos.exceptions import CosmosResourceNotFoundError
+from shared_code.patch_operations import MAX_PATCH_OPERATIONS, json_pointer, op_set
+
+class WriteBehindBuffer:
+    """
+    Collects field updates per document in memory and writes them out
+    periodically, so repeated updates to the same document inside one flush
+    interval collapse into a single write of the latest values.
+
+    writer(key, fields) persists one document's fields. Once the buffer holds
+    max_entries documents, recording a new one wakes the background flusher
+    instead of waiting for the interval; the caller never writes, so the
+    buffer can run briefly over max_entries while that flush is under way.
+    Pending updates are flushed at interpreter exit.
+    """
+    def __init__(self, writer: Callable[[str, Dict[str, Any]], None], flush_interval: float = 30.0,
+                 max_entries: int = 1000, name: str = "write-behind"):
+        self.writer = writer
+        self.flush_interval = flush_interval
+        self.max_entries = max_entries
+        self.name = name
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {"recorded": 0, "coalesced": 0, "writes": 0, "failed": 0, "flushes": 0}
+        atexit.register(self.close)
+
+    def record(self, key: str, **fields):
+        """
+        Queue fields to be set on the document with the given key
+        """
+        with self._lock:
+            self._stats["recorded"] += 1
+            existing = self._pending.get(key)
+            if existing is not None:
+                self._stats["coalesced"] += 1
+                existing.update(fields)
+                return
+            self._pending[key] = dict(fields)
+            full = len(self._pending) >= self.max_entries
+        if full:
+            self._wake.set()
+        self._ensure_flusher(full)
+
+    def _ensure_flusher(self, full: bool = False):
+        """
+        Start the background flusher; without a flush interval it only runs
+        to drain a full buffer
+        """
+        if self._thread is not None or (self.flush_interval <= 0 and not full):
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        timeout = self.flush_interval if self.flush_interval > 0 else None
+        while True:
+            self._wake.wait(timeout)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        Write every pending document now
+        Returns:
+            Number of documents written
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+
+            written = 0
+            for key, fields in pending.items():
+                try:
+                    self.writer(key, fields)
+                    written += 1
+                except Exception as e:
+                    logging.error(f"{self.name} flush of {key} failed: {str(e)}")
+                    with self._lock:
+                        self._stats["failed"] += 1
+                        # retry with the next flush; newer values recorded meanwhile win
+                        if key in self._pending or len(self._pending) < self.max_entries:
+                            self._pending[key] = {**fields, **self._pending.get(key, {})}
+            with self._lock:
+                self._stats["writes"] += written
+                self._stats["flushes"] += 1
+            return written
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        try:
+            self.flush()
+        except Exception as e:
+            logging.error(f"{self.name} final flush failed: {str(e)}")
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pending"] = len(self._pending)
+        return stats
+
+_login_activity_lock = threading.Lock()
+_login_activity = None
+
+def _patch_user(key: str, fields: Dict[str, Any]):
+    from shared_code.db_operations import CosmosOperator
+    db = CosmosOperator()
+    operations = [op_set(json_pointer(field), value) for field, value in fields.items()]
+    container = db.get_culvana_container("users")
+    try:
+        for start in range(0, len(operations), MAX_PATCH_OPERATIONS):
+            db.patch_item(container, key, operations[start:start + MAX_PATCH_OPERATIONS])
+    except CosmosResourceNotFoundError:
+        logging.info(f"Dropping buffered login activity for deleted user {key}")
+
+def get_login_activity_buffer() -> WriteBehindBuffer:
+    """
+    Return the process-wide buffer for user login activity (lastLogin),
+    flushed every LOGIN_ACTIVITY_FLUSH_SECONDS as patches to the users container
+    """
+    global _login_activity
+    if _login_activity is None:
+        with _login_activity_lock:
+            if _login_activity is None:
+                _login_activity = WriteBehindBuffer(
+                    _patch_user,
+                    flush_interval=float(os.environ.get('LOGIN_ACTIVITY_FLUSH_SECONDS', 30)),
+                    max_entries=int(os.environ.get('LOGIN_ACTIVITY_MAX_PENDING', 1000)),
+                    name="login-activity"
+                )
+    return _login_activity
@@ -1,10 +1,18 @@
 import azure.functions as func
 import logging
-import json
 from datetime import datetime, timedelta
 from shared_code.db_operations import CosmosOperator
-from shared_code.email_service import EmailService
-import bcrypt
+from shared_code.email_outbox import enqueue_otp_email
+from shared_code.password_hasher import (
+   HasherSaturatedError,
+   MAX_PASSWORD_BYTES,
+   RETRY_AFTER_SECONDS,
+   get_password_hasher
+)
+from shared_code.rate_limiter import rate_limited
+from shared_code.registration_tokens import REGISTRATION_MODE_TOKEN, get_registration_mode, issue_registration_token
+from shared_code.responses import json_response
+from shared_code.serialization import get_json_body
 import random
 import hashlib
 
@@ -16,79 +24,105 @@ def create_otp_hash(otp: str):
    """Create a hash of the OTP"""
    return hashlib.sha256(otp.encode()).hexdigest()
 
+@rate_limited("signup")
 def main(req: func.HttpRequest) -> func.HttpResponse:
    logging.info('Processing signup request.')
    
    try:
-       req_body = req.get_json()
+       req_body = get_json_body(req)
        email = req_body.get('email')
        password = req_body.get('password')
        
        if not email or not password:
-           return func.HttpResponse(
-               json.dumps({"error": {"message": "Email and password are required"}}),
-               status_code=400,
-               mimetype="application/json"
+           return json_response(
+               req,
+               {"error": {"message": "Email and password are required"}},
+               status_code=400
            )
 
        if len(password) < 8:
-           return func.HttpResponse(
-               json.dumps({"error": {"message": "Password must be at least 8 characters long"}}),
-               status_code=400,
-               mimetype="application/json"
+           return json_response(
+               req,
+               {"error": {"message": "Password must be at least 8 characters long"}},
+               status_code=400
+           )
+
+       if len(password.encode('utf-8')) > MAX_PASSWORD_BYTES:
+           return json_response(
+               req,
+               {"error": {"message": f"Password must be at most {MAX_PASSWORD_BYTES} bytes long"}},
+               status_code=400
            )
 
        db = CosmosOperator()
        
        if db.check_user_exists(email):
-           return func.HttpResponse(
-               json.dumps({"error": {"message": "Email already registered"}}),
-               status_code=409,
-               mimetype="application/json"
+           return json_response(
+               req,
+               {"error": {"message": "Email already registered"}},
+               status_code=409
            )
 
-       salt = bcrypt.gensalt()
-       hashed_password = bcrypt.hashpw(password.encode('utf-8'), salt)
+       try:
+           hashed_password = get_password_hasher().hash_password(password)
+       except HasherSaturatedError:
+           return json_response(
+               req,
+               {"error": {"message": "Too many signups in progress, please retry"}},
+               status_code=503,
+               headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+           )
 
        otp = generate_otp()
-       otp_hash = create_otp_hash(otp)
-       expiry_time = datetime.utcnow() + timedelta(minutes=10)
+       registration_token = None
 
-       temp_container = db.get_culvana_container("temp_registrations")
-       temp_registration = {
-           "id": email,
-           "email": email,
-           "passwordHash": hashed_password.decode('utf-8'),
-           "otpHash": otp_hash,
-           "expiresAt": expiry_time.isoformat(),
-           "attempts": 0,
-           "status": "pending"
-       }
-       
-       temp_container.upsert_item(temp_registration)
+       if get_registration_mode() == REGISTRATION_MODE_TOKEN:
+           registration_token = issue_registration_token(email, hashed_password, otp)
+       else:
+           otp_hash = create_otp_hash(otp)
+           expiry_time = datetime.utcnow() + timedelta(minutes=10)
+
+           temp_container = db.get_culvana_container("temp_registrations")
+           temp_registration = {
+               "id": email,
+               "email": email,
+               "passwordHash": hashed_password,
+               "otpHash": otp_hash,
+               "expiresAt": expiry_time.isoformat(),
+               "attempts": 0,
+               "status": "pending"
+           }
+           
+           temp_container.upsert_item(temp_registration)
 
-       email_service = EmailService()
-       if not email_service.send_otp_email(email, otp):
-           return func.HttpResponse(
-               json.dumps({"error": {"message": "Failed to send verification code"}}),
-               status_code=500,
-               mimetype="application/json"
+       try:
+           enqueue_otp_email(email, otp)
+       except Exception as e:
+           logging.error(f"Failed to queue verification code: {str(e)}")
+           return json_response(
+               req,
+               {"error": {"message": "Failed to send verification code"}},
+               status_code=500
            )
 
-       return func.HttpResponse(
-           json.dumps({
-               "status": "success",
-               "message": "Verification code sent successfully",
-               "email": email
-           }),
-           status_code=200,
-           mimetype="application/json"
+       response = {
+           "status": "success",
+           "message": "Verification code sent successfully",
+           "email": email
+       }
+       if registration_token:
+           response["registrationToken"] = registration_token
+
+       return json_response(
+           req,
+           response,
+           status_code=200
        )
 
    except Exception as e:
        logging.error(f"Signup error: {str(e)}")
-       return func.HttpResponse(
-           json.dumps({"error": {"message": f"An unexpected error occurred: {str(e)}"}}),
-           status_code=500,
-           mimetype="application/json"
+       return json_response(
+           req,
+           {"error": {"message": f"An unexpected error occurred: {str(e)}"}},
+           status_code=500
        )
\ No newline at end of file
@@ -0,0 +1,76 @@
+"""
+Split legacy Inventory documents (id=email, items: [...]) into one document
+per item, as read by InventoryRepository in "per_item" storage mode.
+
+Run from the repository root with AzureCosmosDBConnectionString set:
+    python -m tools.migrate_inventory [--email user@example.com ...] [--dry-run]
+
+The migration is resumable: each user's item documents are upserted, under
+ids taken from their position in the items array, before their header is
+flagged as migrated, and migrated headers are skipped, so an
+interrupted run can be started again. Deploy the handlers with
+INVENTORY_STORAGE_MODE=per_item before or during the run; they dual-read
+unmigrated users from the legacy document.
+"""
+import argparse
+import asyncio
+import logging
+from shared_code.async_db_operations import AsyncCosmosOperator, close_async_pool
+from shared_code.inventory_repository import INVENTORY_ITEM_DOC_TYPE, STORAGE_MODE_PER_ITEM
+
+PENDING_QUERY = (
+    "SELECT c.id, ARRAY_LENGTH(c.items) AS itemCount FROM c "
+    "WHERE IS_DEFINED(c.items) AND (NOT IS_DEFINED(c.docType) OR c.docType != @docType) "
+    "AND (NOT IS_DEFINED(c.storageMode) OR c.storageMode != @storageMode)"
+)
+
+async def find_pending_users(db, container):
+    parameters = [
+        {"name": "@docType", "value": INVENTORY_ITEM_DOC_TYPE},
+        {"name": "@storageMode", "value": STORAGE_MODE_PER_ITEM}
+    ]
+    return await db.query_items(container, PENDING_QUERY, parameters)
+
+async def migrate(emails=None, dry_run=False):
+    db = AsyncCosmosOperator()
+    repository = db.get_inventory_repository(STORAGE_MODE_PER_ITEM)
+    try:
+        if emails:
+            pending = [{"id": email, "itemCount": None} for email in emails]
+        else:
+            pending = await find_pending_users(db, repository.container)
+        logging.info(f"{len(pending)} inventory documents to migrate")
+
+        migrated_users = 0
+        migrated_items = 0
+        for entry in pending:
+            email = entry['id']
+            if dry_run:
+                logging.info(f"[dry run] would migrate {email} ({entry['itemCount']} items)")
+                continue
+            try:
+                count = await repository.migrate_user(email)
+            except Exception as e:
+                logging.error(f"Failed to migrate {email}: {str(e)}")
+                continue
+            migrated_users += 1
+            migrated_items += count
+
+        logging.info(
+            f"Migrated {migrated_users} users / {migrated_items} items "
+            f"using {db.total_request_charge:.1f} RU"
+        )
+    finally:
+        await close_async_pool()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--email', action='append', help="Only migrate this user (repeatable)")
+    parser.add_argument('--dry-run', action='store_true', help="List pending users without writing")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    asyncio.run(migrate(args.email, args.dry_run))
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,19 @@
 import azure.functions as func
-import json
 import logging
-from shared_code.db_operations import CosmosOperator
+from shared_code.auth import require_auth
+from shared_code.async_db_operations import AsyncCosmosOperator
+from shared_code.db_operations import ConcurrencyConflictError
+from shared_code.inventory_repository import InventoryDocumentNotFound
+from shared_code.responses import json_response
+from shared_code.serialization import get_json_body
 from datetime import datetime
 
+@require_auth
 async def main(req: func.HttpRequest) -> func.HttpResponse:
     try:
         # Get request body
         try:
-            req_body = req.get_json()
+            req_body = get_json_body(req)
             print("req_body = ", req_body)
             email = req_body.get('email')
             inventory_item = req_body.get('inventoryItem')
@@ -25,81 +30,77 @@ async def main(req: func.HttpRequest) -> func.HttpResponse:
 
             logging.info(f"Processing update inventory request for email: {email}")
         except ValueError:
-            return func.HttpResponse(
-                json.dumps({"error": "Invalid request body"}),
-                mimetype="application/json",
+            return json_response(
+                req,
+                {"error": "Invalid request body"},
                 status_code=400
             )
 
         if not all([email, inventory_item, item_number]):
-            return func.HttpResponse(
-                json.dumps({"error": "Missing required fields"}),
-                mimetype="application/json",
+            return json_response(
+                req,
+                {"error": "Missing required fields"},
                 status_code=400
             )
 
-        db = CosmosOperator()
-        container = db.get_container("InvoicesDB", "Inventory")
+        db = AsyncCosmosOperator()
+        repository = db.get_inventory_repository()
+        current_date = datetime.utcnow().isoformat()
 
         try:
-            user_doc = container.read_item(item=email, partition_key=email)
-        except Exception as e:
-            return func.HttpResponse(
-                json.dumps({"error": "User document not found"}),
-                mimetype="application/json",
+            result = await repository.update_item(email, item_number, {
+                "Inventory Item Name": inventory_item,
+                "Item Type": item_type,
+                "Nutritional Label": nutritional_label or "",
+                "UPC": upc or "",
+                "Active": active,
+                "Category": inventory_category,
+                "Inventory Count By": inventory_count_by,
+                "Inventory Unit of Measure": unit_of_measure,
+                "Locations": [{"name": loc.get("name", ""), "status": loc.get("status", "active")} for loc in locations],
+                "Image": image,
+                "timestamp": current_date,
+                "Item Number": item_number
+            })
+        except InventoryDocumentNotFound:
+            return json_response(
+                req,
+                {"error": "User document not found"},
                 status_code=404
             )
 
-        item_found = False
-        current_date = datetime.utcnow().isoformat()
-
-        for item in user_doc.get('items', []):
-            if item.get('Item Number') == item_number:
-                item.update({
-                    "Inventory Item Name": inventory_item,
-                    "Item Type": item_type,
-                    "Nutritional Label": nutritional_label or "",
-                    "UPC": upc or "",
-                    "Active": active,
-                    "Category": inventory_category,
-                    "Inventory Count By": inventory_count_by,
-                    "Inventory Unit of Measure": unit_of_measure,
-                    "Locations": [{"name": loc.get("name", ""), "status": loc.get("status", "active")} for loc in locations],
-                    "Image": image,
-                    "timestamp": current_date,
-                    "Item Number": item_number
-                })
-                item_found = True
-                break
-
-        if not item_found:
-            return func.HttpResponse(
-                json.dumps({"error": "Inventory item not found"}),
-                mimetype="application/json",
+        if result is None:
+            return json_response(
+                req,
+                {"error": "Inventory item not found"},
                 status_code=404
             )
 
-        user_doc['last_updated'] = current_date
-
-        result = container.upsert_item(body=user_doc)
-
-        return func.HttpResponse(
-            json.dumps({
+        return json_response(
+            req,
+            {
                 "status": "success",
                 "message": "Inventory item updated successfully",
                 "data": result
-            }),
-            mimetype="application/json",
+            },
             status_code=200
         )
 
+    except ConcurrencyConflictError as e:
+        logging.warning(f"Write conflict: {str(e)}")
+        return json_response(
+            req,
+            {"error": "The document was modified concurrently, please retry"},
+            status_code=409
+        )
+
     except Exception as e:
         logging.error(f"Error updating inventory item: {str(e)}")
-        return func.HttpResponse(
-            json.dumps({
+        return json_response(
+            req,
+            {
                 "error": "Failed to update inventory item",
                 "details": str(e)
-            }),
-            mimetype="application/json",
+            },
             status_code=500
         ) 
\ No newline at end of file
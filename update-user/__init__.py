@@ -1,14 +1,17 @@
 import azure.functions as func
 import logging
-import json
 from datetime import datetime
+from shared_code.auth import require_auth
 from shared_code.db_operations import CosmosOperator
+from shared_code.responses import json_response
+from shared_code.serialization import get_json_body
 
+@require_auth
 def main(req: func.HttpRequest) -> func.HttpResponse:
    logging.info('Processing update user request.')
    
    try:
-       req_body = req.get_json()
+       req_body = get_json_body(req)
        logging.info(f"Request body: {req_body}")
        
        email = req_body.get('email')
@@ -19,10 +22,10 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
        country = req_body.get('country')
        
        if not all([email, first_name, last_name, company_name, phone_number, country]):
-           return func.HttpResponse(
-               json.dumps({"error": {"message": "All fields are required"}}),
-               status_code=400,
-               mimetype="application/json"
+           return json_response(
+               req,
+               {"error": {"message": "All fields are required"}},
+               status_code=400
            )
 
        db = CosmosOperator()
@@ -32,13 +35,14 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
            user = db.get_user_by_email(email)
            
            if not user:
-               return func.HttpResponse(
-                   json.dumps({"error": {"message": "User not found"}}),
-                   status_code=404,
-                   mimetype="application/json"
+               return json_response(
+                   req,
+                   {"error": {"message": "User not found"}},
+                   status_code=404
                )
 
-           user.update({
+           updated_user = {**user}
+           updated_user.update({
                "first_name": first_name,
                "last_name": last_name,
                "company_name": company_name,
@@ -48,10 +52,11 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
                "profileComplete": True
            })
 
-           container.upsert_item(user)
+           db.save_changes(container, user, updated_user)
 
-           return func.HttpResponse(
-               json.dumps({
+           return json_response(
+               req,
+               {
                    "status": "success",
                    "message": "User information updated successfully",
                    "user": {
@@ -62,21 +67,20 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
                        "phone_number": phone_number,
                        "country": country
                    }
-               }),
-               status_code=200,
-               mimetype="application/json"
+               },
+               status_code=200
            )
            
-       return func.HttpResponse(
-           json.dumps({"error": {"message": "User not found"}}),
-           status_code=404,
-           mimetype="application/json"
+       return json_response(
+           req,
+           {"error": {"message": "User not found"}},
+           status_code=404
        )
 
    except Exception as e:
        logging.error(f"Update user error: {str(e)}")
-       return func.HttpResponse(
-           json.dumps({"error": {"message": f"An unexpected error occurred: {str(e)}"}}),
-           status_code=500,
-           mimetype="application/json"
+       return json_response(
+           req,
+           {"error": {"message": f"An unexpected error occurred: {str(e)}"}},
+           status_code=500
        )
\ No newline at end of file
@@ -1,64 +1,133 @@
 import azure.functions as func
 import logging
-import json
-import jwt
-import os
-from datetime import datetime, timedelta
+from azure.cosmos.exceptions import CosmosResourceExistsError
+from datetime import datetime
+from shared_code.auth import issue_access_token
 from shared_code.db_operations import CosmosOperator
 from shared_code.otp_utils import create_otp_hash
+from shared_code.rate_limiter import rate_limited
+from shared_code.refresh_tokens import issue_refresh_token
+from shared_code.registration_tokens import (
+   AttemptLedger,
+   InvalidRegistrationToken,
+   LEDGER_CONSUMED,
+   LEDGER_INVALID,
+   LEDGER_LOCKED,
+   LEDGER_SUPERSEDED,
+   open_registration_token,
+   otp_matches
+)
+from shared_code.responses import json_response
+from shared_code.serialization import get_json_body
 
-JWT_SECRET = os.environ['JWT_SECRET']
-REGULAR_TOKEN_EXPIRY = timedelta(hours=24)
+def error_response(req, message, status_code=400):
+   return json_response(
+       req,
+       {"error": {"message": message}},
+       status_code=status_code
+   )
 
-def generate_token(user_id):
-   expiry = datetime.utcnow() + REGULAR_TOKEN_EXPIRY
-   return jwt.encode({
-       'user_id': user_id,
-       'exp': expiry,
-       'iat': datetime.utcnow()
-   }, JWT_SECRET, algorithm='HS256')
+def create_verified_user(req, db, email, password_hash):
+   users_container = db.get_culvana_container("users")
+   new_user = {
+       "id": email,
+       "email": email,
+       "passwordHash": password_hash,
+       "createdAt": datetime.utcnow().isoformat(),
+       "verified": True,
+       "status": "active",
+       "profileComplete": False
+   }
+   
+   users_container.create_item(new_user)
+
+   token = issue_access_token(new_user['id'])
+   refresh_token = issue_refresh_token(db, users_container, new_user)
+
+   return json_response(
+       req,
+       {
+           "status": "success",
+           "message": "Email verified successfully",
+           "token": token,
+           "refreshToken": refresh_token,
+           "user": {
+               "email": new_user['email'],
+               "verified": new_user['verified']
+           }
+       },
+       status_code=200
+   )
+
+def verify_registration_token(req, db, registration_token, email, otp):
+   """
+   Token mode: the pending registration comes from the client's sealed
+   token and only the attempt ledger is read and written
+   """
+   try:
+       registration = open_registration_token(registration_token)
+   except InvalidRegistrationToken as e:
+       return error_response(req, str(e))
+
+   if registration['e'].lower() != email.lower():
+       return error_response(req, "Registration token does not match email")
 
+   ledger = AttemptLedger(db, db.get_culvana_container("registration_attempts"))
+   outcome = ledger.record_attempt(registration, otp_matches(registration, otp))
+   if outcome == LEDGER_CONSUMED:
+       return error_response(req, "Registration has already been verified")
+   if outcome == LEDGER_SUPERSEDED:
+       return error_response(req, "A newer verification code has been sent")
+   if outcome == LEDGER_LOCKED:
+       return error_response(req, "Too many failed attempts")
+   if outcome == LEDGER_INVALID:
+       return error_response(req, "Invalid verification code")
+
+   try:
+       response = create_verified_user(req, db, registration['e'], registration['p'])
+   except CosmosResourceExistsError:
+       return error_response(req, "Email already registered", 409)
+   ledger.mark_consumed(registration)
+   return response
+
+@rate_limited("verify-signup")
 def main(req: func.HttpRequest) -> func.HttpResponse:
    logging.info('Processing signup verification.')
    
    try:
-       req_body = req.get_json()
+       req_body = get_json_body(req)
        email = req_body.get('email')
        otp = req_body.get('otp')
        
        if not email or not otp:
-           return func.HttpResponse(
-               json.dumps({"error": {"message": "Email and OTP are required"}}),
-               status_code=400,
-               mimetype="application/json"
+           return json_response(
+               req,
+               {"error": {"message": "Email and OTP are required"}},
+               status_code=400
            )
 
        db = CosmosOperator()
 
+       registration_token = req_body.get('registrationToken')
+       if registration_token:
+           return verify_registration_token(req, db, registration_token, email, otp)
+
        temp_container = db.get_culvana_container("temp_registrations")
-       query = "SELECT * FROM c WHERE c.email = @email"
-       parameters = [{"name": "@email", "value": email}]
-       
-       items = list(temp_container.query_items(
-           query=query,
-           parameters=parameters,
-           enable_cross_partition_query=True
-       ))
+       registration = db.read_item(temp_container, email)
        
-       if not items:
-           return func.HttpResponse(
-               json.dumps({"error": {"message": "No pending registration found"}}),
-               status_code=404,
-               mimetype="application/json"
+       if not registration:
+           return json_response(
+               req,
+               {"error": {"message": "No pending registration found"}},
+               status_code=404
            )
 
-       registration = items[0]
        
        if datetime.utcnow() > datetime.fromisoformat(registration['expiresAt']):
-           return func.HttpResponse(
-               json.dumps({"error": {"message": "Verification code has expired"}}),
-               status_code=400,
-               mimetype="application/json"
+           return json_response(
+               req,
+               {"error": {"message": "Verification code has expired"}},
+               status_code=400
            )
 
        if create_otp_hash(otp) != registration['otpHash']:
@@ -66,53 +135,28 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
            temp_container.upsert_item(registration)
            
            if registration['attempts'] >= 3:
-               return func.HttpResponse(
-                   json.dumps({"error": {"message": "Too many failed attempts"}}),
-                   status_code=400,
-                   mimetype="application/json"
+               return json_response(
+                   req,
+                   {"error": {"message": "Too many failed attempts"}},
+                   status_code=400
                )
            
-           return func.HttpResponse(
-               json.dumps({"error": {"message": "Invalid verification code"}}),
-               status_code=400,
-               mimetype="application/json"
+           return json_response(
+               req,
+               {"error": {"message": "Invalid verification code"}},
+               status_code=400
            )
 
-       users_container = db.get_culvana_container("users")
-       new_user = {
-           "id": email,
-           "email": email,
-           "passwordHash": registration['passwordHash'],
-           "createdAt": datetime.utcnow().isoformat(),
-           "verified": True,
-           "status": "active",
-           "profileComplete": False
-       }
-       
-       users_container.create_item(new_user)
+       response = create_verified_user(req, db, email, registration['passwordHash'])
        
        temp_container.delete_item(registration['id'], partition_key=registration['id'])
 
-       token = generate_token(new_user['id'])
-
-       return func.HttpResponse(
-           json.dumps({
-               "status": "success",
-               "message": "Email verified successfully",
-               "token": token,
-               "user": {
-                   "email": new_user['email'],
-                   "verified": new_user['verified']
-               }
-           }),
-           status_code=200,
-           mimetype="application/json"
-       )
+       return response
 
    except Exception as e:
        logging.error(f"Verification error: {str(e)}")
-       return func.HttpResponse(
-           json.dumps({"error": {"message": "An unexpected error occurred"}}),
-           status_code=500,
-           mimetype="application/json"
+       return json_response(
+           req,
+           {"error": {"message": "An unexpected error occurred"}},
+           status_code=500
        )
\ No newline at end of file